@@ -0,0 +1,179 @@
+# adhocvec61.py
+# Array form of calculate_adhoc for jobs with thousands of lines (framework agreements).
+#
+# Every per-line figure (unit costs, line totals, working days available / needed) is one numpy
+# expression over all lines, and the totals are running sums in line order, so the results are
+# the same floats calculate_adhoc produces, not just close to them:
+#   res = calculate_adhoc_arrays(lines_or_frame, output_pct, **same_kwargs_as_calculate_adhoc)
+#   res["lines"]                       -> numeric DataFrame, one row per line (ADHOC_LINE_COLUMNS)
+#   adhoc_display_table(res["lines"])  -> the rounded table newapp shows and exports
+#   to_adhoc_result(res)               -> exactly what calculate_adhoc returns
+from datetime import date
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from production61 import _adhoc_rates, _adhoc_summary
+
+ADHOC_LINE_COLUMNS = [
+    "name", "units", "unit_cost_ex_vat", "unit_cost_inc_vat",
+    "line_total_ex_vat", "line_total_inc_vat", "wd_available", "wd_needed_line_alone",
+]
+ADHOC_TABLE_COLUMNS = [
+    "Item", "Units", "Unit Cost (ex VAT £)", "Unit Cost (inc VAT £)",
+    "Line Total (ex VAT £)", "Line Total (inc VAT £)",
+]
+Lines = Union[List[Dict], pd.DataFrame]
+
+
+def _line_arrays(lines: Lines) -> Dict[str, np.ndarray]:
+    """Input columns as arrays, from line dicts or a DataFrame with the same keys."""
+    if isinstance(lines, pd.DataFrame):
+        deadline = pd.to_datetime(lines["deadline"]).to_numpy().astype("datetime64[D]")
+        return {
+            "name": lines["name"].to_numpy(dtype=object),
+            "units": lines["units"].to_numpy().astype(np.int64),
+            "deadline": deadline,
+            "pris_per_item": lines["pris_per_item"].to_numpy().astype(np.int64),
+            "mins_per_item": lines["mins_per_item"].to_numpy(dtype=float),
+        }
+    return {
+        "name": np.array([ln["name"] for ln in lines], dtype=object),
+        "units": np.array([int(ln["units"]) for ln in lines], dtype=np.int64),
+        "deadline": np.array([ln["deadline"] for ln in lines], dtype="datetime64[D]"),
+        "pris_per_item": np.array([int(ln["pris_per_item"]) for ln in lines], dtype=np.int64),
+        "mins_per_item": np.array([float(ln["mins_per_item"]) for ln in lines], dtype=float),
+    }
+
+
+def _running_total(a: np.ndarray) -> float:
+    """Left-to-right sum (cumsum is sequential, unlike np.sum), so it matches a Python += loop bit for bit."""
+    return float(np.cumsum(a)[-1]) if len(a) else 0.0
+
+
+def calculate_adhoc_arrays(
+    lines: Lines,
+    output_pct: int,
+    *,
+    workshop_hours: float,
+    num_prisoners: int,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    customer_covers_supervisors: bool,
+    region: str,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    today: date,
+    employment_support: str = "None",
+    contracts: int = 1,
+    timeline=None,
+    tariff=None,
+) -> Dict:
+    """
+    calculate_adhoc in whole-array operations. Same keys, except the per-line results come back
+    as a numeric DataFrame under "lines" (wd_needed_line_alone is float there, inf if never).
+    """
+    rates = _adhoc_rates(
+        output_pct, workshop_hours=workshop_hours, num_prisoners=num_prisoners, prisoner_salary=prisoner_salary,
+        supervisor_salaries=supervisor_salaries, customer_covers_supervisors=customer_covers_supervisors,
+        region=region, employment_support=employment_support, contracts=contracts, tariff=tariff,
+    )
+    a = _line_arrays(lines)
+    units = a["units"]
+    mins_per_unit = a["mins_per_item"] * a["pris_per_item"]
+    unit_ex = rates["cost_per_minute"] * mins_per_unit
+    if customer_type == "Commercial" and apply_vat:
+        unit_inc = unit_ex * (1 + (float(vat_rate) / 100.0))
+    else:
+        unit_inc = unit_ex
+    line_minutes = units * mins_per_unit
+
+    deadline = a["deadline"]
+    if timeline is not None:
+        timeline = timeline.at_capacity(num_prisoners=num_prisoners, workshop_hours=workshop_hours, output_pct=output_pct)
+        wd_available = timeline.working_days_between_many(today, deadline)
+        offset = timeline.first_offset_with_many(line_minutes, today)
+        found = ~np.isnan(offset)
+        done_by = np.datetime64(timeline.start, "D") + np.where(found, offset, 0).astype(np.int64)
+        wd_needed = np.where(found, timeline.working_days_between_many(today, done_by), np.inf)
+    else:
+        day0 = np.datetime64(today, "D")
+        wd_available = np.where(deadline < day0, 0, np.busday_count(day0, deadline + 1))
+        cap = rates["current_daily_capacity"]
+        wd_needed = np.ceil(line_minutes / cap) if cap > 0 else np.full(len(units), np.inf)
+
+    frame = pd.DataFrame({
+        "name": a["name"],
+        "units": units,
+        "unit_cost_ex_vat": unit_ex,
+        "unit_cost_inc_vat": unit_inc,
+        "line_total_ex_vat": unit_ex * units,
+        "line_total_inc_vat": unit_inc * units,
+        "wd_available": wd_available.astype(np.int64),
+        "wd_needed_line_alone": wd_needed.astype(float),
+    }, columns=ADHOC_LINE_COLUMNS)
+
+    n = len(frame)
+    earliest_wd = int(wd_available.min()) if n else 0
+    earliest_deadline = deadline.min().astype(object) if n else None
+    summary = _adhoc_summary(
+        rates,
+        _running_total(frame["line_total_ex_vat"].to_numpy()),
+        _running_total(frame["line_total_inc_vat"].to_numpy()),
+        _running_total(line_minutes),
+        earliest_wd, earliest_deadline, today=today, timeline=timeline,
+    )
+    return {"lines": frame, **summary}
+
+
+def to_adhoc_result(res: Dict) -> Dict:
+    """The calculate_adhoc dict (per_line as a list of row dicts) from calculate_adhoc_arrays output."""
+    frame = res["lines"]
+    cols = [frame[c].tolist() for c in ADHOC_LINE_COLUMNS]
+    cols[-1] = [int(v) if v != float("inf") else v for v in cols[-1]]
+    per_line = [dict(zip(ADHOC_LINE_COLUMNS, row)) for row in zip(*cols)]
+    return {"per_line": per_line, **{k: v for k, v in res.items() if k != "lines"}}
+
+
+def calculate_adhoc_fast(lines: Lines, output_pct: int, **kwargs) -> Dict:
+    """Drop-in for calculate_adhoc (same result), computed with calculate_adhoc_arrays."""
+    return to_adhoc_result(calculate_adhoc_arrays(lines, output_pct, **kwargs))
+
+
+def difftest_candidate(case: Dict) -> Dict:
+    """For difftest61: python difftest61.py --kind adhoc --candidate adhocvec61:difftest_candidate"""
+    case = dict(case)
+    return calculate_adhoc_fast(case.pop("lines"), case.pop("output_pct"), **case)
+
+
+# -------------------------------
+# Display table
+# -------------------------------
+def round_like_python(a: np.ndarray, ndigits: int = 2) -> np.ndarray:
+    """
+    Same values as Python's round(x, ndigits) per element. np.round scales by 10**ndigits first,
+    which can tip values sitting on a half; those few are re-rounded with round() itself.
+    """
+    a = np.asarray(a, dtype=float)
+    out = np.round(a, ndigits)
+    scaled = a * (10.0 ** ndigits)
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) <= 1e-6 + 1e-12 * np.abs(scaled)
+    if near_half.any():
+        idx = np.flatnonzero(near_half)
+        out[idx] = [round(float(v), ndigits) for v in a[idx]]
+    return out
+
+
+def adhoc_display_table(frame: pd.DataFrame) -> pd.DataFrame:
+    """The Ad-hoc results table (ADHOC_TABLE_COLUMNS) with money rounded to pence, as build_adhoc_table."""
+    return pd.DataFrame({
+        "Item": frame["name"].to_numpy(dtype=object),
+        "Units": frame["units"].to_numpy(),
+        "Unit Cost (ex VAT £)": round_like_python(frame["unit_cost_ex_vat"].to_numpy()),
+        "Unit Cost (inc VAT £)": round_like_python(frame["unit_cost_inc_vat"].to_numpy()),
+        "Line Total (ex VAT £)": round_like_python(frame["line_total_ex_vat"].to_numpy()),
+        "Line Total (inc VAT £)": round_like_python(frame["line_total_inc_vat"].to_numpy()),
+    }, columns=ADHOC_TABLE_COLUMNS)
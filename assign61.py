@@ -0,0 +1,186 @@
+# assign61.py
+# Assign (and split) ad-hoc lines across all the workshops of a prison.
+#
+# Each workshop prices labour at its own ad-hoc rate (calculate_adhoc's cost per labour minute)
+# and has its own capacity up to each deadline. Lines may be split across workshops; every line
+# must be finished by its deadline and the total price is minimised:
+#   plan = assign_adhoc(lines, [Workshop("Textiles", 12, 27, prisoner_salary=11, supervisor_salaries=[42000]), ...],
+#                       today=date.today())
+#   plan["per_line"], plan["per_workshop"], plan["assignments"], plan["feasibility"]
+#
+# Capacity is bucketed by the distinct deadlines. A line due by bucket k can use any workshop's
+# capacity in buckets <= k, so the options of later lines always include those of earlier ones.
+# Serving lines in deadline order, each from the cheapest capacity still open to it, is then
+# optimal: it meets every deadline that can be met and no exchange of capacity lowers the price.
+# One heap of (cost, workshop, bucket) offers makes that O((lines + workshops x buckets) log).
+import heapq
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from adhocvec61 import Lines, _line_arrays
+from production61 import _adhoc_rates
+
+
+@dataclass
+class Workshop:
+    name: str
+    num_prisoners: int
+    workshop_hours: float
+    output_pct: int = 100
+    prisoner_salary: float = 0.0
+    supervisor_salaries: Optional[List[float]] = None
+    customer_covers_supervisors: bool = False
+    region: str = "National"
+    employment_support: str = "None"
+    contracts: int = 1
+    timeline: object = None     # timeline61.WorkshopTimeline: closures, reduced regime, work already booked
+
+    def rates(self) -> Dict:
+        return _adhoc_rates(
+            self.output_pct,
+            workshop_hours=float(self.workshop_hours),
+            num_prisoners=int(self.num_prisoners),
+            prisoner_salary=float(self.prisoner_salary),
+            supervisor_salaries=list(self.supervisor_salaries or []),
+            customer_covers_supervisors=self.customer_covers_supervisors,
+            region=self.region,
+            employment_support=self.employment_support,
+            contracts=self.contracts,
+        )
+
+    def minutes_by(self, today: date, deadlines: np.ndarray) -> np.ndarray:
+        """Labour minutes available from today to each deadline (inclusive), same rule as calculate_adhoc."""
+        if self.timeline is not None:
+            timeline = self.timeline.at_capacity(
+                num_prisoners=int(self.num_prisoners), workshop_hours=float(self.workshop_hours), output_pct=self.output_pct,
+            )
+            return np.array([timeline.minutes_between(today, d) for d in deadlines.astype(object)], dtype=float)
+        day0 = np.datetime64(today, "D")
+        days = np.where(deadlines < day0, 0, np.busday_count(day0, deadlines + 1))
+        return self.rates()["current_daily_capacity"] * days
+
+
+def assign_adhoc(
+    lines: Lines,
+    workshops: List[Workshop],
+    *,
+    today: date,
+    customer_type: str = "Commercial",
+    apply_vat: bool = True,
+    vat_rate: float = 20.0,
+) -> Dict:
+    """
+    Cheapest deadline-feasible split of `lines` (calculate_adhoc line dicts or a DataFrame) over
+    `workshops`. Returns DataFrames per_line, per_workshop and assignments (one row per line
+    part), plus totals and feasibility. Parts are in labour minutes, so a part's units can be
+    fractional. Lines that can't be finished in time are assigned as far as capacity allows and
+    the rest is reported as unassigned.
+    """
+    if not workshops:
+        raise ValueError("assign_adhoc needs at least one workshop")
+    a = _line_arrays(lines)
+    n, w_count = len(a["units"]), len(workshops)
+    mins_per_unit = a["mins_per_item"] * a["pris_per_item"]
+    need = a["units"] * mins_per_unit
+    cost = np.array([ws.rates()["cost_per_minute"] for ws in workshops])
+
+    # Capacity buckets: the distinct deadlines, in order
+    buckets, bucket_of = np.unique(a["deadline"], return_inverse=True)
+    cum = np.stack([ws.minutes_by(today, buckets) for ws in workshops]) if n else np.zeros((w_count, 0))
+    cap = np.diff(np.maximum.accumulate(cum, axis=1), axis=1, prepend=0.0)
+
+    order = np.lexsort((np.arange(n), bucket_of))
+    offers: List = []
+    remaining = cap.copy()
+    parts = []      # (line, workshop, minutes)
+    unassigned = need.astype(float).copy()
+    next_bucket = 0
+    for i in order:
+        k = bucket_of[i]
+        while next_bucket <= k:
+            for w in range(w_count):
+                if remaining[w, next_bucket] > 0:
+                    heapq.heappush(offers, (cost[w], w, next_bucket))
+            next_bucket += 1
+        left = unassigned[i]
+        while left > 1e-9 and offers:
+            c, w, b = offers[0]
+            take = min(left, remaining[w, b])
+            remaining[w, b] -= take
+            left -= take
+            parts.append((i, w, take))
+            if remaining[w, b] <= 1e-9:
+                heapq.heappop(offers)
+        unassigned[i] = max(0.0, left)
+
+    vat = (1 + float(vat_rate) / 100.0) if (customer_type == "Commercial" and apply_vat) else 1.0
+    names = [ws.name for ws in workshops]
+    arr = np.array(parts, dtype=float).reshape(-1, 3)
+    p = pd.DataFrame({"line": arr[:, 0].astype(np.int64), "w": arr[:, 1].astype(np.int64), "minutes": arr[:, 2]})
+    p = p.groupby(["line", "w"], as_index=False, sort=True)["minutes"].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        part_units = np.where(mins_per_unit[p["line"]] > 0, p["minutes"] / mins_per_unit[p["line"]], 0.0)
+    part_cost = p["minutes"].to_numpy() * cost[p["w"].to_numpy()]
+    assignments = pd.DataFrame({
+        "line": p["line"],
+        "Item": a["name"][p["line"]],
+        "Workshop": np.array(names, dtype=object)[p["w"]],
+        "Minutes": p["minutes"],
+        "Units": part_units,
+        "Cost ex VAT (£)": part_cost,
+        "Cost inc VAT (£)": part_cost * vat,
+    })
+
+    line_cost = np.bincount(p["line"], weights=part_cost, minlength=n)
+    split_into = np.bincount(p["line"], minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_ex = np.where(a["units"] > 0, line_cost / a["units"], 0.0)
+    done = unassigned <= 1e-6 * np.maximum(1.0, need)
+    per_line = pd.DataFrame({
+        "Item": a["name"],
+        "Units": a["units"],
+        "Deadline": a["deadline"].astype(object),
+        "Labour minutes": need,
+        "Unassigned minutes": np.where(done, 0.0, unassigned),
+        "Workshops": split_into,
+        "Unit Cost (ex VAT £)": unit_ex,
+        "Unit Cost (inc VAT £)": unit_ex * vat,
+        "Line Total (ex VAT £)": line_cost,
+        "Line Total (inc VAT £)": line_cost * vat,
+        "Meets deadline": done,
+    })
+
+    used = np.bincount(p["w"], weights=p["minutes"], minlength=w_count)
+    available = cum[:, -1] if n else np.zeros(w_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilisation = np.where(available > 0, used / available, 0.0)
+    per_workshop = pd.DataFrame({
+        "Workshop": names,
+        "Cost per minute (£)": cost,
+        "Minutes available": available,
+        "Minutes assigned": used,
+        "Utilisation": utilisation,
+        "Lines": np.bincount(p["w"], minlength=w_count),
+        "Cost ex VAT (£)": used * cost,
+    })
+
+    short = float(unassigned[~done].sum())
+    reason = None
+    if short > 0:
+        late = per_line.loc[~per_line["Meets deadline"], "Item"].tolist()
+        reason = (
+            f"{short:,.0f} labour minutes can't be finished by their deadlines in any workshop "
+            f"({len(late)} line(s): {', '.join(map(str, late[:5]))}{', ...' if len(late) > 5 else ''}). "
+            f"Add prisoners or hours, extend deadlines or lower the units."
+        )
+    return {
+        "per_line": per_line,
+        "per_workshop": per_workshop,
+        "assignments": assignments.drop(columns="line"),
+        "totals": {"ex_vat": float(line_cost.sum()), "inc_vat": float(line_cost.sum() * vat)},
+        "feasibility": {"hard_block": short > 0, "unassigned_minutes": short, "reason": reason},
+    }
@@ -0,0 +1,336 @@
+# cache61.py
+# Content-addressed on-disk cache of calculator results, shared by every worker process.
+#
+# Key   = sha256(calculator name + canonical JSON of its inputs + tariff version + calculator version)
+#         The calculator version is CALC_VERSION plus a hash of the pricing modules' source
+#         (rules61 constants included), so a deploy that changes a rule or a calculator
+#         invalidates every entry it priced; bump CALC_VERSION for changes outside those modules.
+# Value = zlib-compressed tagged JSON of the calculator's return value (DataFrames as Arrow IPC);
+#         nothing executable is stored, and an entry that can't be read back is dropped as a miss
+# Store = one SQLite file in WAL mode (many concurrent readers, serialised writers, across processes),
+#         size-bounded with least-recently-used eviction against a running byte total.
+#
+#   host_df, ctx = cached_host_quote(**host_kwargs)
+#   rows = cached_production_contractual(items, output_pct, **kwargs)
+# The app prices through these wrappers, and so can nightly re-pricing: only quotes whose inputs
+# or tariff changed are recomputed.
+import base64
+import hashlib
+import inspect
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+import adhocvec61
+import host61
+import production61
+import rules61
+import utils61
+from adhocvec61 import calculate_adhoc_arrays
+from production61 import calculate_production_contractual, calculate_adhoc
+from tariff61 import current_version
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "QUOTE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "cost-price-calculator", "quotes.sqlite"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("QUOTE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_TOUCH_EVERY_S = 60.0     # don't rewrite last_access on every hit
+_FORMAT = b"J1"           # value blob prefix; entries in any other format (e.g. older pickles) read as misses
+_EVICT_BATCH = 256
+
+CALC_VERSION = "1"        # bump when pricing changes outside the modules hashed below
+_PRICING_MODULES = (rules61, host61, production61, adhocvec61, utils61)
+
+
+def _calc_version() -> str:
+    h = hashlib.sha256(CALC_VERSION.encode("utf-8"))
+    for mod in _PRICING_MODULES:
+        h.update(inspect.getsource(mod).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+CALC_FINGERPRINT = _calc_version()
+
+
+def _canonical(obj):
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, float):
+        return repr(obj)            # exact, and distinguishes 1 from 1.0 only where the inputs do
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    raise TypeError(f"cannot build a cache key from {type(obj).__name__}")
+
+
+def cache_key(kind: str, inputs: Dict, tariff_version: Optional[str] = None) -> str:
+    payload = {
+        "kind": kind,
+        "tariff": tariff_version or current_version(),
+        "calc": CALC_FINGERPRINT,
+        "inputs": _canonical(inputs),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _tag(obj):
+    """obj as plain JSON values, with tuples / dates / DataFrames tagged so they decode to themselves."""
+    if isinstance(obj, dict):
+        if "__t__" in obj or not all(isinstance(k, str) for k in obj):
+            raise TypeError("cannot cache a dict with non-string or reserved keys")
+        return {k: _tag(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_tag(v) for v in obj]
+    if isinstance(obj, tuple):
+        return {"__t__": "tuple", "v": [_tag(v) for v in obj]}
+    if isinstance(obj, datetime):
+        return {"__t__": "datetime", "v": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"__t__": "date", "v": obj.isoformat()}
+    if isinstance(obj, pd.DataFrame):
+        import pyarrow as pa
+        buf = io.BytesIO()
+        table = pa.Table.from_pandas(obj)
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+            writer.write_table(table)
+        return {"__t__": "frame", "v": base64.b64encode(buf.getvalue()).decode("ascii")}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj                  # floats round-trip exactly through json (inf / nan included)
+    raise TypeError(f"cannot cache a {type(obj).__name__}")
+
+
+def _untag(d: Dict):
+    t = d.get("__t__")
+    if t is None:
+        return d
+    if t == "tuple":
+        return tuple(d["v"])
+    if t == "datetime":
+        return datetime.fromisoformat(d["v"])
+    if t == "date":
+        return date.fromisoformat(d["v"])
+    if t == "frame":
+        import pyarrow as pa
+        return pa.ipc.open_stream(base64.b64decode(d["v"])).read_all().to_pandas()
+    raise ValueError(f"unknown cache value tag {t!r}")
+
+
+def _encode(value: Any) -> bytes:
+    return _FORMAT + zlib.compress(json.dumps(_tag(value), separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _decode(blob: bytes) -> Any:
+    if not blob.startswith(_FORMAT):
+        raise ValueError("cache entry is not in the current format")
+    return json.loads(zlib.decompress(blob[len(_FORMAT):]).decode("utf-8"), object_hook=_untag)
+
+
+class QuoteCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS results_lru ON results(last_access)")
+            # running byte total, kept in step with results by every write
+            con.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            con.execute(
+                "INSERT OR IGNORE INTO meta(name, value)"
+                " SELECT 'bytes', COALESCE(SUM(size), 0) FROM results"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread (sqlite3 connections are not shared across threads)
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def get(self, key: str, default=None):
+        row = self._conn().execute("SELECT value, last_access FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        try:
+            value = _decode(row[0])
+        except (zlib.error, ValueError, TypeError, KeyError, OSError):
+            # corrupt, or written by another version: drop it and recompute
+            self.misses += 1
+            self.delete(key)
+            return default
+        self.hits += 1
+        now = time.time()
+        if now - row[1] > _TOUCH_EVERY_S:
+            self._conn().execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        return value
+
+    def put(self, key: str, value: Any) -> bool:
+        """Store value; False (nothing stored) if it holds a type the cache can't encode."""
+        try:
+            blob = _encode(value)
+        except (TypeError, ValueError, NotImplementedError):
+            return False
+        now = time.time()
+        with self._write() as con:
+            old = con.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            con.execute(
+                "INSERT OR REPLACE INTO results(key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            total = self._add_bytes(con, len(blob) - (old[0] if old else 0))
+            if total > self.max_bytes:
+                self._evict(con, total - int(self.max_bytes * 0.9))
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._write() as con:
+            old = con.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                con.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._add_bytes(con, -old[0])
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """One write transaction (serialised across processes by BEGIN IMMEDIATE)."""
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+
+    @staticmethod
+    def _add_bytes(con: sqlite3.Connection, delta: int) -> int:
+        con.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'", (int(delta),))
+        return con.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, con: sqlite3.Connection, excess: int) -> None:
+        """Delete least-recently-used entries until `excess` bytes are freed (inside the caller's transaction)."""
+        freed = 0
+        while freed < excess:
+            batch = con.execute(
+                "SELECT key, size FROM results ORDER BY last_access LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not batch:
+                break
+            for key, size in batch:
+                if freed >= excess:
+                    break
+                con.execute("DELETE FROM results WHERE key = ?", (key,))
+                freed += size
+        self._add_bytes(con, -freed)
+
+    def get_or_compute(self, kind: str, inputs: Dict, compute: Callable[[], Any], tariff_version: Optional[str] = None):
+        try:
+            key = cache_key(kind, inputs, tariff_version)
+        except TypeError:
+            return compute()          # inputs we can't hash canonically (e.g. a timeline object)
+        try:
+            hit = self.get(key, _MISSING)
+        except sqlite3.Error:
+            return compute()          # cache file unavailable (locked, disk full): price without it
+        if hit is not _MISSING:
+            return hit
+        value = compute()
+        try:
+            self.put(key, value)
+        except sqlite3.Error:
+            pass
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        con = self._conn()
+        n = con.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        size = con.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        return {"entries": n, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._write() as con:
+            con.execute("DELETE FROM results")
+            con.execute("UPDATE meta SET value = 0 WHERE name = 'bytes'")
+
+
+_MISSING = object()
+_default: Optional[QuoteCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> QuoteCache:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = QuoteCache()
+    return _default
+
+
+# -------------------------------
+# Cached calculators
+# -------------------------------
+def _get_or_compute(cache: Optional[QuoteCache], kind: str, inputs: Dict, compute: Callable[[], Any]):
+    # a tariff= snapshot is keyed by its version (progress= never reaches the key: it isn't an input)
+    tariff = inputs.pop("tariff", None)
+    return (cache or default_cache()).get_or_compute(
+        kind, inputs, compute, tariff.version if tariff is not None else None
+    )
+
+
+def cached_host_quote(*, cache: Optional[QuoteCache] = None, **kwargs):
+    host_df, ctx = _get_or_compute(
+        cache, "host61.generate_host_quote", dict(kwargs), lambda: host61.generate_host_quote(**kwargs)
+    )
+    # the quote date is not an input; stamp today's date on cached results
+    return host_df.copy(), {**ctx, "date": date.today().isoformat()}
+
+
+def cached_production_contractual(items, output_pct, *, cache: Optional[QuoteCache] = None, progress=None, **kwargs):
+    inputs = {"items": items, "output_pct": output_pct, **kwargs}
+    return _get_or_compute(
+        cache, "production61.calculate_production_contractual", inputs,
+        lambda: calculate_production_contractual(items, output_pct, progress=progress, **kwargs),
+    )
+
+
+def cached_adhoc(lines, output_pct, *, cache: Optional[QuoteCache] = None, **kwargs):
+    inputs = {"lines": lines, "output_pct": output_pct, **kwargs}
+    return _get_or_compute(
+        cache, "production61.calculate_adhoc", inputs,
+        lambda: calculate_adhoc(lines, output_pct, **kwargs),
+    )
+
+
+def cached_adhoc_arrays(lines, output_pct, *, cache: Optional[QuoteCache] = None, **kwargs):
+    inputs = {"lines": lines, "output_pct": output_pct, **kwargs}
+    return _get_or_compute(
+        cache, "adhocvec61.calculate_adhoc_arrays", inputs,
+        lambda: calculate_adhoc_arrays(lines, output_pct, **kwargs),
+    )
@@ -0,0 +1,293 @@
+# calibrate61.py
+# Calibrate minutes-per-item (and observed output %) from workshop production logs.
+#
+# A log record is one crew run: `prisoners` worked `minutes` each and produced `units` of `item`
+# on `date`, i.e. prisoners * minutes labour minutes. Per item we keep running statistics that
+# update in O(1) per record and merge exactly, so CSVs of any length are streamed in chunks:
+#   cal = LogCalibrator(half_life_days=56, date_format="%d/%m/%Y")     # or DATE_FORMAT_ISO
+#   cal.ingest_csv("workshop_log.csv")
+#   cal.rows_bad_date, cal.rows_invalid                                # records skipped, by cause
+#   items, output_pct = cal.calibrated_defaults(items, output_pct)   # -> calculate_production_contractual
+#   cal.observed_output_pct(items)                                     # vs the typed-in minutes
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOG_COLUMNS = ["item", "prisoners", "minutes", "units", "date"]
+_LOG_ALIASES = {
+    "item name": "item", "product": "item", "name": "item",
+    "prisoners working": "prisoners", "crew": "prisoners",
+    "minutes worked": "minutes", "mins": "minutes",
+    "units produced": "units", "quantity": "units", "qty": "units",
+    "day": "date", "log date": "date",
+}
+_EPOCH = date(1970, 1, 1).toordinal()
+
+DATE_FORMAT_UK = "%d/%m/%Y"
+DATE_FORMAT_ISO = "ISO8601"     # YYYY-MM-DD, optionally with a time
+
+
+@dataclass
+class ItemStats:
+    """
+    Running statistics for one item.
+      labour_minutes / units       -> pooled labour minutes per unit (the calibrated figure)
+      mean_rate, m2                -> Welford mean / sum of squares of per-record minutes per unit
+      decayed_labour/units at ref  -> exponentially time-decayed sums (recent rate), ref = latest day seen
+    """
+    records: int = 0
+    units: float = 0.0
+    labour_minutes: float = 0.0
+    mean_rate: float = 0.0
+    m2: float = 0.0
+    first_day: Optional[int] = None
+    last_day: Optional[int] = None
+    decayed_labour: float = 0.0
+    decayed_units: float = 0.0
+
+    def update(self, prisoners: float, minutes: float, units: float, day: int, tau_days: float) -> None:
+        labour = float(prisoners) * float(minutes)
+        rate = labour / float(units)
+        self.records += 1
+        self.units += units
+        self.labour_minutes += labour
+        delta = rate - self.mean_rate
+        self.mean_rate += delta / self.records
+        self.m2 += delta * (rate - self.mean_rate)
+        self._add_decayed(labour, float(units), day, tau_days)
+        self.first_day = day if self.first_day is None else min(self.first_day, day)
+
+    def _add_decayed(self, labour: float, units: float, day: int, tau_days: float) -> None:
+        if self.last_day is None or day >= self.last_day:
+            k = math.exp(-(day - self.last_day) / tau_days) if self.last_day is not None else 0.0
+            self.decayed_labour = self.decayed_labour * k + labour
+            self.decayed_units = self.decayed_units * k + units
+            self.last_day = day
+        else:
+            k = math.exp(-(self.last_day - day) / tau_days)
+            self.decayed_labour += labour * k
+            self.decayed_units += units * k
+
+    def merge(self, other: "ItemStats", tau_days: float) -> None:
+        """Fold in statistics gathered elsewhere (another chunk or worker); exact, order-independent."""
+        if other.records == 0:
+            return
+        n = self.records + other.records
+        delta = other.mean_rate - self.mean_rate
+        self.mean_rate += delta * other.records / n
+        self.m2 += other.m2 + delta * delta * self.records * other.records / n
+        self.records = n
+        self.units += other.units
+        self.labour_minutes += other.labour_minutes
+        self._add_decayed(other.decayed_labour, other.decayed_units, other.last_day, tau_days)
+        self.first_day = other.first_day if self.first_day is None else min(self.first_day, other.first_day)
+
+    @property
+    def minutes_per_unit(self) -> float:
+        return self.labour_minutes / self.units if self.units else float("nan")
+
+    @property
+    def recent_minutes_per_unit(self) -> float:
+        return self.decayed_labour / self.decayed_units if self.decayed_units else float("nan")
+
+    @property
+    def rate_std(self) -> float:
+        return math.sqrt(self.m2 / (self.records - 1)) if self.records > 1 else float("nan")
+
+
+class LogCalibrator:
+    """
+    `date_format` is applied to every chunk's date column (a strptime format, or DATE_FORMAT_ISO),
+    so one log is never read day-first in one chunk and month-first in the next.
+    """
+
+    def __init__(self, half_life_days: float = 56.0, date_format: str = DATE_FORMAT_UK):
+        self.half_life_days = float(half_life_days)
+        self.date_format = date_format
+        self._tau = self.half_life_days / math.log(2.0)
+        self.stats: Dict[str, ItemStats] = {}
+        self.rows_read = 0
+        self.rows_bad_date = 0      # date missing or not in date_format
+        self.rows_invalid = 0       # readable date, but no item or a non-positive / non-numeric count
+
+    @property
+    def rows_skipped(self) -> int:
+        return self.rows_bad_date + self.rows_invalid
+
+    # -------------------------------
+    # Ingestion
+    # -------------------------------
+    def update(self, item: str, prisoners: float, minutes: float, units: float, on: date) -> bool:
+        """Add one record; returns False (and counts it skipped, by cause) if it can't be used."""
+        self.rows_read += 1
+        if not isinstance(on, date):
+            self.rows_bad_date += 1
+            return False
+        try:
+            ok = float(prisoners) > 0 and float(minutes) > 0 and float(units) > 0 and str(item).strip() != ""
+        except (TypeError, ValueError):
+            ok = False
+        if not ok:
+            self.rows_invalid += 1
+            return False
+        key = str(item).strip()
+        self.stats.setdefault(key, ItemStats()).update(prisoners, minutes, units, on.toordinal() - _EPOCH, self._tau)
+        return True
+
+    def ingest_frame(self, df: pd.DataFrame) -> None:
+        """
+        Add a chunk of records. Equivalent to update() per row, but aggregated per item with
+        column operations first and then merged, so a chunk costs one pass in pandas.
+        """
+        df = normalise_log_frame(df)
+        self.rows_read += len(df)
+        day = _parse_dates(df["date"], self.date_format)
+        prisoners = pd.to_numeric(df["prisoners"], errors="coerce")
+        minutes = pd.to_numeric(df["minutes"], errors="coerce")
+        units = pd.to_numeric(df["units"], errors="coerce")
+        item = df["item"].astype("string").str.strip()
+        dated = day.notna()
+        ok = (prisoners > 0) & (minutes > 0) & (units > 0) & dated & item.notna() & (item != "")
+        self.rows_bad_date += int((~dated).sum())
+        self.rows_invalid += int((dated & ~ok).sum())
+        if not ok.any():
+            return
+
+        labour = (prisoners * minutes)[ok]
+        units = units[ok]
+        d = pd.DataFrame({
+            "item": item[ok],
+            "labour": labour,
+            "units": units,
+            "rate": labour / units,
+            "day": (day[ok].dt.normalize() - pd.Timestamp("1970-01-01")).dt.days,
+        })
+        g = d.groupby("item", sort=False)
+        agg = g.agg(records=("rate", "size"), labour=("labour", "sum"), units=("units", "sum"),
+                    mean_rate=("rate", "mean"), first_day=("day", "min"), last_day=("day", "max"))
+        agg["m2"] = g["rate"].var(ddof=0) * agg["records"]
+        decay = np.exp(-(d["item"].map(agg["last_day"]) - d["day"]) / self._tau)
+        agg["decayed_labour"] = (d["labour"] * decay).groupby(d["item"], sort=False).sum()
+        agg["decayed_units"] = (d["units"] * decay).groupby(d["item"], sort=False).sum()
+
+        for key, r in zip(agg.index, agg.itertuples(index=False)):
+            part = ItemStats(
+                records=int(r.records), units=float(r.units), labour_minutes=float(r.labour),
+                mean_rate=float(r.mean_rate), m2=float(r.m2),
+                first_day=int(r.first_day), last_day=int(r.last_day),
+                decayed_labour=float(r.decayed_labour), decayed_units=float(r.decayed_units),
+            )
+            mine = self.stats.get(key)
+            if mine is None:
+                self.stats[key] = part
+            else:
+                mine.merge(part, self._tau)
+
+    def ingest_csv(self, path_or_buf, *, chunksize: int = 250_000, **read_csv_kwargs) -> "LogCalibrator":
+        """Stream a log CSV in chunks; memory is bounded by one chunk plus one ItemStats per item."""
+        for chunk in pd.read_csv(path_or_buf, chunksize=chunksize, **read_csv_kwargs):
+            self.ingest_frame(chunk)
+        return self
+
+    def ingest_csvs(self, paths: Iterable[str], **kwargs) -> "LogCalibrator":
+        for p in paths:
+            self.ingest_csv(p, **kwargs)
+        return self
+
+    # -------------------------------
+    # Results
+    # -------------------------------
+    def summary(self, min_records: int = 1) -> pd.DataFrame:
+        rows = []
+        for item, s in sorted(self.stats.items()):
+            if s.records < min_records:
+                continue
+            rows.append({
+                "Item": item,
+                "Records": s.records,
+                "Units": s.units,
+                "Labour minutes": s.labour_minutes,
+                "Minutes per unit": s.minutes_per_unit,
+                "Recent minutes per unit": s.recent_minutes_per_unit,
+                "Per-run mean": s.mean_rate,
+                "Per-run std": s.rate_std,
+                "First": date.fromordinal(s.first_day + _EPOCH),
+                "Last": date.fromordinal(s.last_day + _EPOCH),
+            })
+        return pd.DataFrame(rows)
+
+    def labour_minutes_per_unit(self, item: str, *, recent: bool = True, min_records: int = 5) -> Optional[float]:
+        s = self.stats.get(str(item).strip())
+        if s is None or s.records < min_records:
+            return None
+        v = s.recent_minutes_per_unit if recent else s.minutes_per_unit
+        return None if math.isnan(v) else v
+
+    def calibrated_minutes(self, item: str, required: int = 1, **kwargs) -> Optional[float]:
+        """Minutes to make one item in the calculator's terms (per prisoner of the `required` crew)."""
+        v = self.labour_minutes_per_unit(item, **kwargs)
+        return None if v is None else v / max(1, int(required))
+
+    def observed_output_pct(self, items: List[Dict], *, recent: bool = True, min_records: int = 5) -> Optional[float]:
+        """
+        Output % the logs show against the quoted standard times: standard labour minutes for the
+        units actually made, over the labour minutes actually spent (labour-weighted over items).
+        """
+        std, actual = 0.0, 0.0
+        for it in items:
+            s = self.stats.get((it.get("name") or "").strip())
+            if s is None or s.records < min_records or float(it.get("minutes", 0)) <= 0:
+                continue
+            observed = s.recent_minutes_per_unit if recent else s.minutes_per_unit
+            standard = float(it["minutes"]) * int(it.get("required", 1))
+            weight = s.decayed_labour if recent else s.labour_minutes
+            std += weight * standard / observed
+            actual += weight
+        return (100.0 * std / actual) if actual else None
+
+    def calibrated_defaults(
+        self, items: List[Dict], output_pct: int, *, use: str = "minutes", recent: bool = True, min_records: int = 5,
+    ) -> Tuple[List[Dict], int]:
+        """
+        Defaults for calculate_production_contractual, from one of two views of the same evidence:
+          use="minutes": items get their calibrated minutes (where the logs have enough records);
+                         output_pct is left as given, since observed times already include lost output.
+          use="output":  items keep their typed-in minutes; output_pct becomes the observed output %.
+        """
+        if use == "output":
+            observed = self.observed_output_pct(items, recent=recent, min_records=min_records)
+            return list(items), (output_pct if observed is None else int(round(min(100.0, observed))))
+        if use != "minutes":
+            raise ValueError('use must be "minutes" or "output"')
+        out = []
+        for it in items:
+            m = self.calibrated_minutes(it.get("name") or "", int(it.get("required", 1)), recent=recent, min_records=min_records)
+            out.append(it if m is None else {**it, "minutes": m})
+        return out, output_pct
+
+
+def _parse_dates(col: pd.Series, date_format: str) -> pd.Series:
+    """Dates in one explicit format; anything else (including blanks) becomes NaT."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    return pd.to_datetime(col.astype("string").str.strip(), format=date_format, errors="coerce")
+
+
+def normalise_log_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Map common header spellings onto LOG_COLUMNS (case-insensitive)."""
+    rename = {}
+    for c in df.columns:
+        key = str(c).strip().lower()
+        if key in LOG_COLUMNS:
+            rename[c] = key
+        elif key in _LOG_ALIASES:
+            rename[c] = _LOG_ALIASES[key]
+    df = df.rename(columns=rename)
+    missing = [c for c in LOG_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"production log is missing column(s): {', '.join(missing)}")
+    return df
@@ -3,5 +3,8 @@ from dataclasses import dataclass
 @dataclass(frozen=True)
 class AppConfig:
     GLOBAL_OUTPUT_DEFAULT: int = 100   # prisoner labour output slider default
+    BACKGROUND_JOB_MIN_ROWS: int = 200  # items/lines at which a quote runs as a background job
+    JOB_WORKERS: int = 4               # background worker threads per server process
+    JOB_POLL_SECONDS: float = 1.0      # progress refresh interval while a job runs
 
 CFG = AppConfig()
\ No newline at end of file
@@ -0,0 +1,312 @@
+# difftest61.py
+# Differential testing harness: run a candidate engine side by side with the
+# reference calculators (host61 / production61) and check that the money agrees.
+#
+#   python difftest61.py --kind production --n 500
+#   python difftest61.py --kind adhoc --candidate mymodule:calculate_adhoc_fast
+import argparse
+import importlib
+import math
+import random
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+import host61
+from production61 import calculate_production_contractual, calculate_adhoc
+from rules61 import EMPLOYMENT_SUPPORT_OPTIONS
+from tariff61 import SUPERVISOR_PAY
+from utils61 import _to_float
+
+REGIONS = list(SUPERVISOR_PAY.keys())
+
+
+# -------------------------------
+# Reference engines (all take one kwargs dict)
+# -------------------------------
+def reference_host(case: Dict):
+    return host61.generate_host_quote(**case)
+
+
+def reference_production(case: Dict):
+    case = dict(case)
+    items = case.pop("items")
+    output_pct = case.pop("output_pct")
+    return calculate_production_contractual(items, output_pct, **case)
+
+
+def reference_adhoc(case: Dict):
+    case = dict(case)
+    lines = case.pop("lines")
+    output_pct = case.pop("output_pct")
+    return calculate_adhoc(lines, output_pct, **case)
+
+
+REFERENCES: Dict[str, Callable] = {
+    "host": reference_host,
+    "production": reference_production,
+    "adhoc": reference_adhoc,
+}
+
+
+# -------------------------------
+# Case generators
+# -------------------------------
+def _salaries(rng: random.Random, region: str, n: int) -> List[float]:
+    bands = SUPERVISOR_PAY.get(region, SUPERVISOR_PAY["National"])
+    return [float(rng.choice(bands)["avg_total"]) for _ in range(n)]
+
+
+def _common(rng: random.Random) -> Dict:
+    region = rng.choice(REGIONS)
+    n_sup = rng.randint(1, 4)
+    covers = rng.random() < 0.2
+    return {
+        "workshop_hours": round(rng.uniform(0.0, 40.0), 2),
+        "prisoner_salary": round(rng.uniform(0.0, 30.0), 2),
+        "supervisor_salaries": [] if covers else _salaries(rng, region, n_sup),
+        "customer_covers_supervisors": covers,
+        "region": region,
+        "employment_support": rng.choice(EMPLOYMENT_SUPPORT_OPTIONS),
+        "contracts": rng.randint(1, 4),
+    }
+
+
+def random_host_case(rng: random.Random) -> Dict:
+    c = _common(rng)
+    return {
+        **c,
+        "num_prisoners": rng.randint(0, 60),
+        "num_supervisors": max(1, len(c["supervisor_salaries"])),
+        "additional_benefits": rng.random() < 0.5,
+    }
+
+
+def random_production_case(rng: random.Random) -> Dict:
+    c = _common(rng)
+    num_prisoners = rng.randint(0, 60)
+    n_items = rng.randint(1, 12)
+    remaining = num_prisoners
+    items = []
+    for i in range(n_items):
+        assigned = rng.randint(0, remaining) if remaining > 0 else 0
+        remaining -= assigned
+        items.append({
+            "name": f"Item {i+1}",
+            "required": rng.randint(1, 3),
+            "minutes": round(rng.choice([0.0, rng.uniform(0.05, 120.0)]), 4),
+            "assigned": assigned,
+        })
+    pricing_mode = rng.choice(["as-is", "target"])
+    return {
+        **c,
+        "items": items,
+        "output_pct": rng.randint(0, 100),
+        "customer_type": rng.choice(["Commercial", "Another Government Department"]),
+        "apply_vat": rng.random() < 0.8,
+        "vat_rate": 20.0,
+        "num_prisoners": num_prisoners,
+        "num_supervisors": max(1, len(c["supervisor_salaries"])),
+        "pricing_mode": pricing_mode,
+        "targets": [rng.randint(0, 5000) for _ in items] if pricing_mode == "target" else None,
+        "additional_benefits": rng.random() < 0.5,
+    }
+
+
+def random_adhoc_case(rng: random.Random, today: Optional[date] = None) -> Dict:
+    c = _common(rng)
+    today = today or date.today()
+    lines = [{
+        "name": f"Line {i+1}",
+        "units": rng.randint(1, 20000),
+        "deadline": today + timedelta(days=rng.randint(-3, 120)),
+        "pris_per_item": rng.randint(1, 3),
+        "mins_per_item": round(rng.uniform(0.0, 60.0), 4),
+    } for i in range(rng.randint(1, 20))]
+    return {
+        **c,
+        "lines": lines,
+        "output_pct": rng.randint(0, 100),
+        "num_prisoners": rng.randint(0, 60),
+        "customer_type": rng.choice(["Commercial", "Another Government Department"]),
+        "apply_vat": rng.random() < 0.8,
+        "vat_rate": 20.0,
+        "today": today,
+    }
+
+
+def boundary_cases(kind: str, rng: Optional[random.Random] = None) -> List[Dict]:
+    """Hand-picked edge cases: zero hours/assigned, customer instructors, every ES option, target over capacity."""
+    rng = rng or random.Random(0)
+    gen = {"host": random_host_case, "production": random_production_case, "adhoc": random_adhoc_case}[kind]
+    cases = []
+    for es in EMPLOYMENT_SUPPORT_OPTIONS:
+        for covers in (False, True):
+            for benefits in (False, True):
+                c = gen(rng)
+                c["employment_support"] = es
+                c["customer_covers_supervisors"] = covers
+                if covers:
+                    c["supervisor_salaries"] = []
+                if "additional_benefits" in c:
+                    c["additional_benefits"] = benefits
+                cases.append(c)
+
+    zero_hours = gen(rng)
+    zero_hours["workshop_hours"] = 0.0
+    cases.append(zero_hours)
+
+    if kind in ("host", "adhoc"):
+        zero_pris = gen(rng)
+        zero_pris["num_prisoners"] = 0
+        cases.append(zero_pris)
+
+    if kind == "production":
+        zero_assigned = gen(rng)
+        for it in zero_assigned["items"]:
+            it["assigned"] = 0
+        cases.append(zero_assigned)
+
+        beyond = gen(rng)
+        beyond["workshop_hours"] = max(1.0, beyond["workshop_hours"])
+        beyond["items"] = [{"name": "Big", "required": 1, "minutes": 30.0, "assigned": 2}]
+        beyond["pricing_mode"] = "target"
+        beyond["targets"] = [10_000_000]
+        cases.append(beyond)
+
+        zero_output = gen(rng)
+        zero_output["output_pct"] = 0
+        cases.append(zero_output)
+    return cases
+
+
+# -------------------------------
+# Comparison
+# -------------------------------
+def _numeric(v):
+    if isinstance(v, bool) or v is None:
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    if isinstance(v, str):
+        f = _to_float(v)
+        return f if f is not None else v
+    return v
+
+
+def compare_results(ref, cand, *, rel_tol: float = 1e-9, abs_tol: float = 0.005, path: str = "") -> List[str]:
+    """Return a list of human-readable mismatches between two engine outputs (empty list == agree)."""
+    if isinstance(ref, pd.DataFrame):
+        ref = ref.to_dict(orient="records")
+    if isinstance(cand, pd.DataFrame):
+        cand = cand.to_dict(orient="records")
+
+    if isinstance(ref, dict) and isinstance(cand, dict):
+        out = []
+        for k in ref.keys() | cand.keys():
+            if k not in cand:
+                out.append(f"{path}.{k}: missing in candidate")
+            elif k not in ref:
+                out.append(f"{path}.{k}: unexpected in candidate")
+            else:
+                out.extend(compare_results(ref[k], cand[k], rel_tol=rel_tol, abs_tol=abs_tol, path=f"{path}.{k}"))
+        return out
+
+    if isinstance(ref, (list, tuple)) and isinstance(cand, (list, tuple)):
+        if len(ref) != len(cand):
+            return [f"{path}: length {len(ref)} != {len(cand)}"]
+        out = []
+        for i, (a, b) in enumerate(zip(ref, cand)):
+            out.extend(compare_results(a, b, rel_tol=rel_tol, abs_tol=abs_tol, path=f"{path}[{i}]"))
+        return out
+
+    a, b = _numeric(ref), _numeric(cand)
+    if isinstance(a, float) and isinstance(b, float):
+        if math.isinf(a) or math.isinf(b) or math.isnan(a) or math.isnan(b):
+            same = (a == b) or (math.isnan(a) and math.isnan(b))
+        else:
+            same = math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+        return [] if same else [f"{path}: {a!r} != {b!r}"]
+    return [] if a == b else [f"{path}: {a!r} != {b!r}"]
+
+
+# -------------------------------
+# Runner
+# -------------------------------
+def _timed(fn: Callable, case: Dict, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn(case)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def run_differential(
+    kind: str,
+    candidate: Callable,
+    cases: List[Dict],
+    *,
+    reference: Optional[Callable] = None,
+    rel_tol: float = 1e-9,
+    abs_tol: float = 0.005,
+    repeat: int = 1,
+) -> pd.DataFrame:
+    """
+    Run reference and candidate on every case.
+    Returns one row per case: ok flag, first mismatches, reference/candidate seconds and speed-up.
+    """
+    reference = reference or REFERENCES[kind]
+    rows = []
+    for i, case in enumerate(cases):
+        ref_out, ref_s = _timed(reference, case, repeat)
+        try:
+            cand_out, cand_s = _timed(candidate, case, repeat)
+            diffs = compare_results(ref_out, cand_out, rel_tol=rel_tol, abs_tol=abs_tol)
+        except Exception as e:
+            cand_s, diffs = float("nan"), [f"candidate raised {type(e).__name__}: {e}"]
+        rows.append({
+            "case": i,
+            "ok": not diffs,
+            "mismatches": "; ".join(diffs[:5]),
+            "reference_s": ref_s,
+            "candidate_s": cand_s,
+            "speedup": (ref_s / cand_s) if cand_s and cand_s > 0 else float("nan"),
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_cases(kind: str, n: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    gen = {"host": random_host_case, "production": random_production_case, "adhoc": random_adhoc_case}[kind]
+    return boundary_cases(kind, rng) + [gen(rng) for _ in range(n)]
+
+
+def _load_callable(spec: str) -> Callable:
+    mod_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(mod_name), attr)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare a candidate pricing engine against the reference calculators.")
+    ap.add_argument("--kind", choices=sorted(REFERENCES), required=True)
+    ap.add_argument("--candidate", help="module:function taking one case dict (default: the reference itself)")
+    ap.add_argument("--n", type=int, default=200, help="number of random cases (boundary cases are always added)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    candidate = _load_callable(args.candidate) if args.candidate else REFERENCES[args.kind]
+    report = run_differential(args.kind, candidate, generate_cases(args.kind, args.n, args.seed), repeat=args.repeat)
+    failed = report[~report["ok"]]
+    print(f"{args.kind}: {len(report) - len(failed)}/{len(report)} cases agree; "
+          f"median speed-up x{report['speedup'].median():.2f}")
+    if not failed.empty:
+        print(failed[["case", "mismatches"]].to_string(index=False))
+    return 0 if failed.empty else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+# estate61.py
+# Cheapest-site search: price one ad-hoc job at every prison workshop in a capacity register.
+#
+# The register has one row per workshop (REGISTER_COLUMNS; OPTIONAL_COLUMNS take defaults):
+#   prison,workshop,num_prisoners,workshop_hours,prisoner_salary,instructors
+#   Belmarsh,Textiles,12,27,11,Production Instructor: Band 3
+# Regions and instructor salaries come from the tariff, so the register only holds capacity.
+#
+#   reg = EstateRegister.load("register.csv")
+#   shortlist = search_estate(lines, reg, today=date.today(), top=10)
+#
+# Every workshop's cost per labour minute is one array expression over the register (the
+# _adhoc_rates rule), and every line is priced at every workshop in one (workshops x lines)
+# pass, with totals summed in line order, so a site's figures are the same floats
+# calculate_adhoc gives for it. Feasibility is calculate_adhoc's: all of the job's minutes
+# by the earliest deadline.
+import argparse
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from adhocvec61 import Lines, _line_arrays
+from rules61 import FULL_TIME_HOURS, OVERHEAD_RATE, dev_rate_production, dev_rates
+from tariff61 import current_tariff
+
+REGISTER_COLUMNS = ["prison", "workshop", "num_prisoners", "workshop_hours", "prisoner_salary"]
+OPTIONAL_COLUMNS = {
+    "instructors": "",                  # instructor titles, ";"-separated
+    "output_pct": 100,
+    "customer_covers_supervisors": False,
+    "employment_support": "None",
+    "contracts": 1,
+}
+SHORTLIST_COLUMNS = [
+    "Prison", "Workshop", "Region", "Cost per minute (£)",
+    "Unit Price (ex VAT £)", "Unit Price (inc VAT £)", "Total (ex VAT £)", "Total (inc VAT £)",
+    "Days available", "Days needed", "Spare minutes by deadline", "Feasible",
+]
+
+
+class EstateRegister:
+    """Workshop capacity register, with the per-workshop ad-hoc rates cached per tariff version."""
+
+    def __init__(self, frame: pd.DataFrame):
+        missing = [c for c in REGISTER_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError(f"capacity register is missing column(s): {', '.join(missing)}")
+        frame = frame.copy()
+        for col, default in OPTIONAL_COLUMNS.items():
+            frame[col] = frame[col].fillna(default) if col in frame.columns else default
+        self.frame = frame.reset_index(drop=True)
+        self._rates: Optional[Dict] = None
+
+    @classmethod
+    def load(cls, source) -> "EstateRegister":
+        """From a CSV path or a DataFrame."""
+        return cls(source if isinstance(source, pd.DataFrame) else pd.read_csv(source))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _salaries(self, tariff, regions: np.ndarray) -> List[List[float]]:
+        out, unknown = [], set()
+        for region, titles in zip(regions, self.frame["instructors"].astype(str)):
+            pay = {b["title"]: b["avg_total"] for b in tariff.supervisor_pay.get(region, ())}
+            row = []
+            for t in filter(None, (t.strip() for t in titles.split(";"))):
+                if t in pay:
+                    row.append(float(pay[t]))
+                else:
+                    unknown.add(f"{t} ({region})")
+            out.append(row)
+        if unknown:
+            raise ValueError(f"unknown instructor title(s) in register: {', '.join(sorted(unknown))}")
+        return out
+
+    def rates(self) -> Dict[str, np.ndarray]:
+        """
+        region, supervisor_salaries and _adhoc_rates' cost_per_minute / current_daily_capacity for
+        every workshop, computed with the same operations in the same order.
+        """
+        tariff = current_tariff()
+        if self._rates is not None and self._rates["tariff_version"] == tariff.version:
+            return self._rates
+        f = self.frame
+        regions = f["prison"].map(dict(tariff.prison_to_region))
+        if regions.isna().any():
+            bad = sorted(set(f.loc[regions.isna(), "prison"].astype(str)))
+            raise ValueError(f"unknown prison(s) in register: {', '.join(bad)}")
+        regions = regions.to_numpy(dtype=object)
+        salaries = self._salaries(tariff, regions)
+
+        num = f["num_prisoners"].to_numpy().astype(np.int64)
+        hours = f["workshop_hours"].to_numpy(dtype=float)
+        scale = f["output_pct"].to_numpy(dtype=float) / 100.0
+        covers = f["customer_covers_supervisors"].to_numpy().astype(bool)
+        contracts = np.maximum(1, f["contracts"].to_numpy().astype(np.int64))
+
+        daily = num * ((hours / 5.0) * 60.0 * scale)
+        per_week = np.maximum(1e-9, num * hours * 60.0 * scale)
+        hours_frac = np.where(hours > 0, hours / FULL_TIME_HOURS, 0.0)
+
+        # Instructor weekly total: sequential sum over each row's salaries (zero-padded)
+        width = max((len(s) for s in salaries), default=0)
+        pay = np.zeros((len(f), max(1, width)))
+        for i, s in enumerate(salaries):
+            pay[i, :len(s)] = s
+        terms = np.where(pay > 0, (pay / 52.0) * hours_frac[:, None] / contracts[:, None], 0.0)
+        inst = np.where(covers, 0.0, np.cumsum(terms, axis=1)[:, -1])
+
+        shadow = np.array([tariff.band3_shadow(r) for r in regions], dtype=float)
+        overhead_base = np.where(covers, (shadow / 52.0) * hours_frac / contracts, inst)
+        overheads = overhead_base * OVERHEAD_RATE
+        dev = (inst + overheads) * dev_rates(f["employment_support"].to_numpy(), dev_rate_production)
+        weekly = num * f["prisoner_salary"].to_numpy(dtype=float) + inst + overheads + dev
+        self._rates = {
+            "tariff_version": tariff.version,
+            "region": regions,
+            "supervisor_salaries": salaries,
+            "cost_per_minute": weekly / per_week,
+            "current_daily_capacity": daily,
+        }
+        return self._rates
+
+    def quote_kwargs(self, i: int) -> Dict:
+        """calculate_adhoc keyword arguments for register row i (to quote a shortlisted site in full)."""
+        row, r = self.frame.iloc[i], self.rates()
+        return {
+            "output_pct": int(row["output_pct"]),
+            "workshop_hours": float(row["workshop_hours"]),
+            "num_prisoners": int(row["num_prisoners"]),
+            "prisoner_salary": float(row["prisoner_salary"]),
+            "supervisor_salaries": list(r["supervisor_salaries"][i]),
+            "customer_covers_supervisors": bool(row["customer_covers_supervisors"]),
+            "region": r["region"][i],
+            "employment_support": str(row["employment_support"]),
+            "contracts": int(row["contracts"]),
+        }
+
+
+def search_estate(
+    lines: Lines,
+    register: EstateRegister,
+    *,
+    today: date,
+    customer_type: str = "Commercial",
+    apply_vat: bool = True,
+    vat_rate: float = 20.0,
+    prisons: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    feasible_only: bool = True,
+    top: Optional[int] = 10,
+) -> pd.DataFrame:
+    """
+    The job (`lines`, as for calculate_adhoc) priced at every workshop in `register`, ranked by
+    unit price (job total / job units). Workshops with no capacity are dropped; so are those that
+    can't do the job's minutes by its earliest deadline, unless feasible_only=False.
+    Columns SHORTLIST_COLUMNS; the index is the register row (for register.quote_kwargs).
+    """
+    r = register.rates()
+    f = register.frame
+    a = _line_arrays(lines)
+    if not len(a["units"]):
+        raise ValueError("search_estate needs at least one job line")
+    units = a["units"]
+    mins_per_unit = a["mins_per_item"] * a["pris_per_item"]
+    cost = r["cost_per_minute"]
+
+    # Workshops x lines, in calculate_adhoc's operation order; running totals along each row
+    unit_ex = cost[:, None] * mins_per_unit[None, :]
+    total_ex = np.cumsum(unit_ex * units, axis=1)[:, -1]
+    if customer_type == "Commercial" and apply_vat:
+        total_inc = np.cumsum(unit_ex * (1 + (float(vat_rate) / 100.0)) * units, axis=1)[:, -1]
+    else:
+        total_inc = total_ex
+
+    job_minutes = float(np.cumsum(units * mins_per_unit)[-1])
+    day0 = np.datetime64(today, "D")
+    earliest = a["deadline"].min()
+    days_available = int(np.busday_count(day0, earliest + 1)) if earliest >= day0 else 0
+    daily = r["current_daily_capacity"]
+    with np.errstate(divide="ignore"):
+        days_needed = np.where(daily > 0, np.ceil(job_minutes / daily), np.inf)
+    spare = daily * days_available - job_minutes
+    job_units = int(units.sum())
+
+    out = pd.DataFrame({
+        "Prison": f["prison"].to_numpy(dtype=object),
+        "Workshop": f["workshop"].to_numpy(dtype=object),
+        "Region": r["region"],
+        "Cost per minute (£)": cost,
+        "Unit Price (ex VAT £)": total_ex / job_units if job_units else 0.0,
+        "Unit Price (inc VAT £)": total_inc / job_units if job_units else 0.0,
+        "Total (ex VAT £)": total_ex,
+        "Total (inc VAT £)": total_inc,
+        "Days available": days_available,
+        "Days needed": days_needed,
+        "Spare minutes by deadline": spare,
+        "Feasible": spare >= 0,
+    }, columns=SHORTLIST_COLUMNS)
+
+    keep = daily > 0
+    if feasible_only:
+        keep &= spare >= 0
+    if prisons is not None:
+        keep &= f["prison"].isin(list(prisons)).to_numpy()
+    if regions is not None:
+        keep &= np.isin(r["region"], list(regions))
+    out = out[keep].sort_values(["Unit Price (ex VAT £)", "Prison", "Workshop"], kind="stable")
+    return out.head(top) if top is not None else out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rank the prison workshops in a capacity register by price for one job.")
+    ap.add_argument("register", help="capacity register CSV")
+    ap.add_argument("--units", type=int, required=True)
+    ap.add_argument("--mins-per-item", type=float, required=True)
+    ap.add_argument("--prisoners-per-item", type=int, default=1)
+    ap.add_argument("--deadline", type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--all", action="store_true", help="include sites that can't meet the deadline")
+    args = ap.parse_args(argv)
+    job = [{"name": "Job", "units": args.units, "mins_per_item": args.mins_per_item,
+            "pris_per_item": args.prisoners_per_item, "deadline": args.deadline}]
+    shortlist = search_estate(job, EstateRegister.load(args.register), today=date.today(),
+                              top=args.top, feasible_only=not args.all)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(shortlist.round(2).to_string() if len(shortlist) else "No workshop can take this job by the deadline.")
+
+
+if __name__ == "__main__":
+    main()
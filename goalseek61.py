@@ -0,0 +1,221 @@
+# goalseek61.py
+# Goal seek: find the input value that makes a quote hit a target figure.
+#
+#   "What Output % does each item need to sell at £2.50?"
+#       production_output_pct_for_price(items, output_pct, 2.50, **production_kwargs)
+#   "How many prisoners must work on each item to get it to £2.50?"
+#       production_assigned_for_price(items, output_pct, 2.50, **production_kwargs)
+#   "How many instructors can each of these Host contracts carry at £9,000/month?"
+#       host_max_instructors(scenarios_df, 9000, title="Production Instructor: Band 3")
+#
+# Where the metric is linear in the input (Host totals in prisoners, pay, hours or instructors)
+# the answer comes from two evaluations; a production unit price is inversely proportional to
+# Output %, so that inverts in closed form too. Anything else uses bracketed bisection.
+# All solvers work on arrays: one answer per item / scenario from a single batch of evaluations.
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from lazy61 import LazyProductionResult
+from ratecard61 import batch_fixed_costs
+from rules61 import MONTHLY
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+HOST_VAT = 0.20
+
+
+# -------------------------------
+# Generic solvers
+# -------------------------------
+def _meets(value: np.ndarray, target: np.ndarray, meet: str) -> np.ndarray:
+    if meet == "at_most":
+        return value <= target + 1e-9 * np.maximum(1.0, np.abs(target))
+    if meet == "at_least":
+        return value >= target - 1e-9 * np.maximum(1.0, np.abs(target))
+    raise ValueError('meet must be "at_most" or "at_least"')
+
+
+def goal_seek(
+    fn: Callable[[np.ndarray], np.ndarray],
+    target: ArrayLike,
+    lo: ArrayLike,
+    hi: ArrayLike,
+    *,
+    integer: bool = False,
+    meet: str = "at_most",
+    linear: bool = False,
+    tol: float = 1e-9,
+    max_iter: int = 200,
+) -> np.ndarray:
+    """
+    Solve fn(x) = target for every element at once, with x in [lo, hi] and fn monotone on that range.
+    fn takes an array of candidate inputs (one per problem) and returns the metric for each.
+
+    Continuous answers are the crossing point. Integer answers are the best integer on the
+    `meet` side of the target ("at_most": metric <= target, "at_least": metric >= target),
+    i.e. the largest such x if the metric moves away from the target as x grows, else the smallest.
+    NaN where no x in [lo, hi] meets the target.
+
+    linear=True inverts from the two end points (exact when fn is affine in x).
+    """
+    target = np.asarray(target, dtype=float)
+    lo = np.asarray(lo, dtype=float)
+    hi = np.asarray(hi, dtype=float)
+    target, lo, hi = np.broadcast_arrays(target, lo, hi)
+    target, lo, hi = target.astype(float), lo.astype(float), hi.astype(float)
+    if integer:
+        lo, hi = np.ceil(lo), np.floor(hi)
+
+    f_lo, f_hi = np.asarray(fn(lo), dtype=float), np.asarray(fn(hi), dtype=float)
+    rising = f_hi > f_lo
+    # "prefix": the x values meeting the target sit at the low end of the range
+    prefix = rising if meet == "at_most" else ~rising
+    m_lo, m_hi = _meets(f_lo, target, meet), _meets(f_hi, target, meet)
+
+    if linear:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = lo + (target - f_lo) * (hi - lo) / (f_hi - f_lo)
+        x = np.where(f_hi == f_lo, np.where(m_lo, lo, np.nan), x)
+        if integer:
+            x = np.where(prefix, np.floor(x + tol), np.ceil(x - tol))
+        x = np.where(m_lo & m_hi, np.where(prefix, hi, lo), x)
+        return np.where((x >= lo) & (x <= hi) & (m_lo | m_hi), x, np.nan)
+
+    # Bisection on the bracket [a, b]: `a` keeps the endpoint's side of the target at lo
+    a, b = lo.copy(), hi.copy()
+    active = m_lo != m_hi
+    for _ in range(max_iter):
+        if integer:
+            active &= (b - a) > 1
+        else:
+            active &= (b - a) > tol * np.maximum(1.0, np.abs(b))
+        if not active.any():
+            break
+        mid = np.where(active, (a + b) / 2.0, a)
+        if integer:
+            mid = np.floor(mid)
+        m_mid = _meets(np.asarray(fn(mid), dtype=float), target, meet)
+        same_as_lo = m_mid == m_lo
+        a = np.where(active & same_as_lo, mid, a)
+        b = np.where(active & ~same_as_lo, mid, b)
+
+    if integer:
+        x = np.where(m_lo, a, b)        # the meeting integer next to the crossing
+    else:
+        x = (a + b) / 2.0
+    x = np.where(m_lo & m_hi, np.where(prefix, hi, lo), x)
+    return np.where(m_lo | m_hi, x, np.nan)
+
+
+# -------------------------------
+# Production (contractual, per item)
+# -------------------------------
+def _ex_vat_target(res: LazyProductionResult, target_price: ArrayLike, inc_vat: bool) -> np.ndarray:
+    t = np.broadcast_to(np.asarray(target_price, dtype=float), (res.n,))
+    if inc_vat and res.customer_type == "Commercial" and res.apply_vat:
+        t = t / (1 + float(res.vat_rate) / 100.0)
+    return t
+
+
+def production_output_pct_for_price(
+    items: List[Dict], output_pct: int, target_price: ArrayLike, *, inc_vat: bool = False, **kwargs,
+) -> np.ndarray:
+    """
+    Output % at which each item's unit price equals target_price (scalar or one per item).
+    Weekly cost does not depend on Output % and units scale with it, so
+      output % = 100 * weekly cost / (capacity @ 100% * availability * target).
+    Values above 100 mean the price can't be reached by output alone. NaN in target-units mode
+    (units are fixed there, so Output % doesn't move the price) and for items with no capacity.
+    """
+    res = LazyProductionResult(items, output_pct, **kwargs)
+    if res.pricing_mode == "target":
+        return np.full(res.n, np.nan)
+    availability = res.output_scale / (float(output_pct) / 100.0) if float(output_pct) > 0 else 1.0
+    t = _ex_vat_target(res, target_price, inc_vat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 * res.weekly_cost_total / (res.cap_100 * availability * t)
+    return np.where((res.cap_100 > 0) & (t > 0), out, np.nan)
+
+
+def production_assigned_for_price(
+    items: List[Dict], output_pct: int, target_price: ArrayLike, *,
+    inc_vat: bool = False, max_assigned: Optional[int] = None, **kwargs,
+) -> np.ndarray:
+    """
+    Fewest prisoners assigned to each item (others unchanged) for its unit price to be at most
+    target_price. Each extra prisoner adds wages and output but also takes a bigger share of the
+    instructor / overhead / development pools, so the price is not linear in the count and is
+    solved by integer bisection over 1..(num_prisoners - prisoners on the other items), capped at
+    max_assigned if given. NaN if unreachable or if no prisoner is free for the item.
+    """
+    res = LazyProductionResult(items, output_pct, **kwargs)
+    if res.pricing_mode == "target":
+        return np.full(res.n, np.nan)
+    t = _ex_vat_target(res, target_price, inc_vat)
+    pools = res.inst_weekly_total + res.overheads_weekly_total + res.dev_weekly_total_actual - res.addl_benefit_weekly
+    others = res.assigned.sum() - res.assigned
+    with np.errstate(divide="ignore", invalid="ignore"):
+        units_per_prisoner = np.where(
+            (res.minutes > 0) & (res.required > 0) & (res.workshop_hours > 0),
+            res.workshop_hours * 60.0 * res.output_scale / (res.minutes * res.required), 0.0,
+        )
+
+    def unit_price(a: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cost = a * res.prisoner_salary + pools * a / (others + a)
+            return np.where(units_per_prisoner > 0, cost / (a * units_per_prisoner), np.inf)
+
+    hi = int(kwargs.get("num_prisoners", 0)) - others
+    if max_assigned is not None:
+        hi = np.minimum(hi, int(max_assigned))
+    out = goal_seek(unit_price, t, 1, np.maximum(1, hi), integer=True, meet="at_most")
+    return np.where(hi >= 1, out, np.nan)
+
+
+# -------------------------------
+# Host (batch of scenarios)
+# -------------------------------
+def host_monthly_total(df: pd.DataFrame, *, inc_vat: bool = False) -> np.ndarray:
+    """
+    Monthly Host subtotal (ex VAT, or total with VAT) per scenario row, same figures as
+    host61.generate_host_quote. Columns: those of ratecard61.batch_fixed_costs plus
+    num_prisoners and prisoner_salary.
+    """
+    prisoners = pd.to_numeric(df["num_prisoners"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    salary = pd.to_numeric(df["prisoner_salary"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    total = prisoners * salary * MONTHLY + batch_fixed_costs(df, rules="host")["subtotal"].to_numpy()
+    return total * (1 + HOST_VAT) if inc_vat else total
+
+
+def host_solve(
+    df: pd.DataFrame, column: str, target_monthly: ArrayLike, *,
+    lo: ArrayLike = 0.0, hi: ArrayLike = 1e6, integer: Optional[bool] = None, inc_vat: bool = False,
+) -> np.ndarray:
+    """
+    Value of `column` (num_prisoners, prisoner_salary or workshop_hours) per scenario at which the
+    monthly Host total reaches target_monthly: the most that fits within it for a whole-number
+    input such as num_prisoners. The total is linear in each of these, so it is solved directly.
+    """
+    if column not in ("num_prisoners", "prisoner_salary", "workshop_hours"):
+        raise ValueError(f"can't goal-seek Host on {column!r}")
+    integer = (column == "num_prisoners") if integer is None else integer
+
+    def total(x: np.ndarray) -> np.ndarray:
+        return host_monthly_total(df.assign(**{column: x}), inc_vat=inc_vat)
+
+    return goal_seek(total, target_monthly, lo, hi, integer=integer, meet="at_most", linear=True)
+
+
+def host_max_instructors(
+    df: pd.DataFrame, target_monthly: ArrayLike, *, title: str, max_instructors: int = 20, inc_vat: bool = False,
+) -> np.ndarray:
+    """
+    Most instructors of `title` each scenario can carry while its monthly Host total stays within
+    target_monthly (replaces the scenario's instructor_titles). NaN if even none fits.
+    """
+    def total(n: np.ndarray) -> np.ndarray:
+        titles = [[title] * int(k) for k in n]
+        return host_monthly_total(df.assign(instructor_titles=titles), inc_vat=inc_vat)
+
+    return goal_seek(total, target_monthly, 0, max_instructors, integer=True, meet="at_most", linear=True)
@@ -0,0 +1,146 @@
+# graphstub61.py
+# Local stand-in for the Microsoft Graph upload endpoint, to exercise sharepoint61 offline.
+#
+#   with GraphStub(tokens={"t1"}) as stub:
+#       stub.fail_next(429, times=3, retry_after=0)           # throttle the next three requests
+#       up = QuoteUploader(SharePointConfig(graph_base=stub.url, drive_id="d"), token_provider=lambda: "t1")
+#       up.upload_many(docs)
+#       stub.uploads                                          # {"Quotes/a.html": b"..."}
+#
+# python graphstub61.py runs the uploader against it: concurrency, throttling and a revoked token.
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Set
+from urllib.parse import unquote, urlparse
+
+
+class GraphStub:
+    """PUT /drives/<drive>/root:/<path>:/content on 127.0.0.1, with scripted failures."""
+
+    def __init__(self, tokens: Optional[Set[str]] = None, delay: float = 0.0):
+        self.tokens = tokens             # accepted bearer tokens (None = any)
+        self.delay = delay               # seconds per upload, to make concurrency visible
+        self.uploads: Dict[str, bytes] = {}
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._failures = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1.0"
+
+    def fail_next(self, status: int, times: int = 1, retry_after: Optional[float] = None) -> None:
+        """Answer the next `times` requests with `status` (and a Retry-After header if given)."""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * times)
+
+    def __enter__(self) -> "GraphStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict, headers: Optional[Dict] = None) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_PUT(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                    failure = stub._failures.popleft() if stub._failures else None
+                try:
+                    if failure is not None:
+                        status, retry_after = failure
+                        headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+                        return self._reply(status, {"error": {"code": "scripted", "message": str(status)}}, headers)
+                    token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+                    if stub.tokens is not None and token not in stub.tokens:
+                        return self._reply(401, {"error": {"code": "InvalidAuthenticationToken"}})
+                    path = urlparse(self.path).path
+                    if "/root:/" not in path or not path.endswith(":/content"):
+                        return self._reply(400, {"error": {"code": "invalidRequest"}})
+                    name = unquote(path.split("/root:/", 1)[1][: -len(":/content")])
+                    time.sleep(stub.delay)
+                    with stub._lock:
+                        stub.uploads[name] = data
+                    return self._reply(201, {"id": f"item-{len(stub.uploads)}", "webUrl": f"https://stub/{name}"})
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+        return Handler
+
+
+def main() -> int:
+    from sharepoint61 import QuoteUploader, SharePointConfig
+
+    docs = [(f"quote_{i:03d}.html", f"<p>quote {i}</p>".encode()) for i in range(24)]
+    checks = []
+
+    with GraphStub(tokens={"t1"}, delay=0.02) as stub:
+        cfg = SharePointConfig(graph_base=stub.url, drive_id="d", max_workers=6, backoff_factor=0.0)
+        up = QuoteUploader(cfg, token_provider=lambda: "t1")
+        res = up.upload_many(docs)
+        checks.append(("concurrent upload", all(r["ok"] for r in res)
+                       and stub.uploads == {f"Quotes/{n}": d for n, d in docs} and stub.max_in_flight > 1))
+
+        stub.uploads.clear()
+        stub.fail_next(429, times=3, retry_after=0)
+        stub.fail_next(503, times=1)
+        res = up.upload_many(docs[:4])
+        checks.append(("retry on 429/503", all(r["ok"] for r in res) and len(stub.uploads) == 4))
+        up.close()
+
+    class Rotating:
+        """Serves a cached token until told it was rejected (like TokenProvider)."""
+        def __init__(self):
+            self.token, self.invalidated = "revoked", []
+
+        def __call__(self):
+            return self.token
+
+        def invalidate(self, token):
+            self.invalidated.append(token)
+            self.token = "fresh"
+
+    with GraphStub(tokens={"fresh"}) as stub:
+        tokens = Rotating()
+        up = QuoteUploader(SharePointConfig(graph_base=stub.url, drive_id="d"), token_provider=tokens)
+        r = up.upload_one("a.html", b"x")
+        checks.append(("fresh token after 401", r["ok"] and tokens.invalidated == ["revoked"]))
+        up.close()
+
+    for name, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
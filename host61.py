@@ -1,6 +1,10 @@
 import pandas as pd
 from datetime import date
 from utils61 import fmt_currency
+from tariff61 import current_tariff
+from rules61 import (
+    ADDL_BENEFIT_RATE, DEV_RATE_BASE, FULL_TIME_HOURS, MONTHLY, OVERHEAD_RATE, dev_rate_host,
+)
 
 def generate_host_quote(
     *,
@@ -14,6 +18,8 @@ def generate_host_quote(
     contracts: int,
     employment_support: str,
     additional_benefits: bool,
+    pool_share: float | None = None,   # share of the workshop's pools (workshop61); replaces 1/contracts
+    tariff=None,                       # tariff61.Tariff snapshot to price against (default: current_tariff())
 ):
     """
     Host breakdown:
@@ -28,18 +34,21 @@ def generate_host_quote(
       - Total with VAT (£/month)
     """
 
-    # Pull Band 3 shadow costs (annual) from production module
-    from production61 import BAND3_COSTS
+    # One tariff snapshot for the whole quote (Band 3 shadow costs, recorded in ctx)
+    tariff = tariff or current_tariff()
 
     # -------------------------------
     # Core monthly components
     # -------------------------------
     # Prisoner wages
-    prisoner_monthly = float(num_prisoners) * float(prisoner_salary) * (52.0 / 12.0)
+    prisoner_monthly = float(num_prisoners) * float(prisoner_salary) * MONTHLY
 
     # Safe helpers
-    hours_frac = (float(workshop_hours) / 37.5) if workshop_hours > 0 else 0.0
+    hours_frac = (float(workshop_hours) / FULL_TIME_HOURS) if workshop_hours > 0 else 0.0
     contracts_safe = max(1, int(contracts))
+    if pool_share is not None:
+        # joint workshop pricing (workshop61): share of the workshop's pools instead of 1/contracts
+        hours_frac, contracts_safe = hours_frac * float(pool_share), 1
 
     # Instructor cost (monthly): hours-based / divided by contracts
     if not customer_covers_supervisors:
@@ -51,28 +60,22 @@ def generate_host_quote(
     # - if customer provides instructors -> use Band 3 shadow (monthly) * hours_frac / contracts
     # - else -> base = instructor_cost
     if customer_covers_supervisors:
-        shadow_annual = float(BAND3_COSTS.get(region, 42247.81))
+        shadow_annual = tariff.band3_shadow(region)
         overhead_base_monthly = (shadow_annual / 12.0) * hours_frac / contracts_safe
     else:
         overhead_base_monthly = instructor_cost
 
-    # Overheads = base * 0.61
-    overhead_monthly = overhead_base_monthly * 0.61
+    # Overheads = base * 61%
+    overhead_monthly = overhead_base_monthly * OVERHEAD_RATE
 
     # -------------------------------
     # Development charge logic (on Instructor + Overheads)
     # -------------------------------
-    s = (employment_support or "").lower()
-    if "both" in s:
-        dev_rate_actual = 0.0
-    elif "employment on release/rotl" in s or "pre-release support" in s:
-        dev_rate_actual = 0.10
-    else:
-        dev_rate_actual = 0.20
+    dev_rate_actual = dev_rate_host(employment_support)
 
     # Dev before @ 20% (reference), and actual @ dev_rate_actual
     base_for_dev = instructor_cost + overhead_monthly
-    dev_before_monthly = base_for_dev * 0.20
+    dev_before_monthly = base_for_dev * DEV_RATE_BASE
     dev_actual_monthly = base_for_dev * dev_rate_actual
     dev_discount_monthly = max(0.0, dev_before_monthly - dev_actual_monthly)
 
@@ -82,7 +85,7 @@ def generate_host_quote(
     # -------------------------------
     addl_benefit_monthly = 0.0
     if (employment_support == "Both") and additional_benefits:
-        addl_benefit_monthly = (instructor_cost + overhead_monthly) * 0.10
+        addl_benefit_monthly = (instructor_cost + overhead_monthly) * ADDL_BENEFIT_RATE
 
     # -------------------------------
     # Totals
@@ -108,7 +111,7 @@ def generate_host_quote(
     rows.append(("Overheads", overhead_monthly))
 
     # Development: show either a single line (20%) or the before/discount/revised trio
-    if dev_rate_actual == 0.20:
+    if dev_rate_actual == DEV_RATE_BASE:
         rows.append(("Development charge", dev_actual_monthly))
     else:
         rows.append(("Development charge", dev_before_monthly))
@@ -130,6 +133,7 @@ def generate_host_quote(
         "region": region,
         "employment_support": employment_support,
         "additional_benefits": additional_benefits,
+        "tariff_version": tariff.version,
     }
 
     return host_df, ctx
\ No newline at end of file
@@ -0,0 +1,144 @@
+# jobs61.py
+# Background job manager for long calculations.
+#
+# A job is any callable; if it accepts a `progress` keyword it can report (done, total).
+# Jobs run on a bounded worker pool so the Streamlit script (and other users' sessions)
+# keep responding; the UI stores only the job id in st.session_state and polls.
+#
+#   jobs = JobManager(max_workers=4)
+#   job_id = jobs.submit(fn, *args, label="Ad-hoc 20,000 lines", **kwargs)
+#   job = jobs.get(job_id)   # status / progress / result / error
+import inspect
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+@dataclass
+class Job:
+    id: str
+    label: str
+    status: str = PENDING
+    done: int = 0
+    total: int = 0
+    result: Any = None
+    error: Optional[str] = None
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return (self.done / self.total) if self.total else 0.0
+
+    @property
+    def finished_ok(self) -> bool:
+        return self.status == DONE
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+def _accepts_progress(fn: Callable) -> bool:
+    try:
+        return "progress" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class JobManager:
+    """
+    Thread pool (default) or process pool with an in-memory job table.
+    Process pools suit CPU-heavy pure-Python batches; their jobs report progress only on completion.
+    Finished jobs are kept for `keep_seconds` then dropped.
+    """
+
+    def __init__(self, max_workers: int = 4, *, use_processes: bool = False, keep_seconds: float = 3600.0):
+        self._pool = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=max_workers)
+        self._use_processes = use_processes
+        self._keep_seconds = keep_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, label: str = "", **kwargs) -> str:
+        job = Job(id=uuid.uuid4().hex[:12], label=label or getattr(fn, "__name__", "job"))
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+        if self._use_processes:
+            job.status, job.started = RUNNING, time.time()
+            fut = self._pool.submit(fn, *args, **kwargs)
+        else:
+            fut = self._pool.submit(self._run, job, fn, args, kwargs)
+        with self._lock:
+            self._futures[job.id] = fut
+        fut.add_done_callback(lambda f, j=job: self._finish(j, f))
+        return job.id
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        job.status, job.started = RUNNING, time.time()
+        if _accepts_progress(fn):
+            def progress(done: int, total: int):
+                job.done, job.total = int(done), int(total)
+            kwargs = {**kwargs, "progress": progress}
+        return fn(*args, **kwargs)
+
+    def _finish(self, job: Job, fut: Future):
+        job.finished = time.time()
+        if fut.cancelled():
+            job.status = CANCELLED
+            return
+        err = fut.exception()
+        if err is not None:
+            job.status, job.error = FAILED, f"{type(err).__name__}: {err}"
+        else:
+            job.result, job.status = fut.result(), DONE
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            fut = self._futures.get(job_id)
+        return bool(fut and fut.cancel())
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda j: j.submitted)
+
+    def _prune(self):
+        cutoff = time.time() - self._keep_seconds
+        for jid in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            self._jobs.pop(jid, None)
+            self._futures.pop(jid, None)
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def run_batch(fn: Callable, batch: List[Dict], *, progress: Optional[Callable[[int, int], None]] = None) -> List[Any]:
+    """Run fn(**kwargs) for every kwargs dict in `batch`, reporting progress per entry (a job-friendly batch)."""
+    out = []
+    total = len(batch)
+    for i, kw in enumerate(batch, start=1):
+        out.append(fn(**kw))
+        if progress:
+            progress(i, total)
+    return out
@@ -0,0 +1,364 @@
+# lazy61.py
+# Lazily evaluated, column-projected version of calculate_production_contractual.
+#
+# Every intermediate (capacity, share, weekly pools, unit costs, ...) is a cached property computed
+# over all items at once with numpy, so asking for one output column evaluates only its dependency
+# chain:
+#   res = lazy_production_contractual(items, output_pct, **same_kwargs_as_calculate_production_contractual)
+#   res["Unit Price ex VAT (£)"]                 -> list, same values as the eager rows
+#   res.array("Monthly Total ex VAT (£)")        -> float array (NaN where the eager result is None)
+#   res.to_rows(["Item", "Unit Cost (£)"])       -> row dicts with only those columns
+from functools import cached_property
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rules61 import (
+    ADDL_BENEFIT_RATE, DEV_RATE_BASE, FULL_TIME_HOURS, OVERHEAD_RATE, dev_rate_production,
+)
+from tariff61 import current_tariff
+
+
+class LazyProductionResult:
+    def __init__(
+        self,
+        items: List[Dict],
+        output_pct: int,
+        *,
+        workshop_hours: float,
+        prisoner_salary: float,
+        supervisor_salaries: List[float],
+        customer_covers_supervisors: bool,
+        region: str,
+        customer_type: str,
+        apply_vat: bool,
+        vat_rate: float,
+        num_prisoners: int,
+        num_supervisors: int,
+        pricing_mode: str = "as-is",
+        targets: Optional[List[int]] = None,
+        employment_support: str = "None",
+        contracts: int = 1,
+        additional_benefits: bool = False,
+        timeline=None,
+        pool_share: Optional[float] = None,
+        tariff=None,
+    ):
+        self.items = items
+        self.output_pct = output_pct
+        self.workshop_hours = workshop_hours
+        self.prisoner_salary = prisoner_salary
+        self.supervisor_salaries = supervisor_salaries
+        self.customer_covers_supervisors = customer_covers_supervisors
+        self.region = region
+        self.customer_type = customer_type
+        self.apply_vat = apply_vat
+        self.vat_rate = vat_rate
+        self.pricing_mode = pricing_mode
+        self.targets = targets
+        self.employment_support = employment_support
+        self.contracts = contracts
+        self.additional_benefits = additional_benefits
+        self.timeline = timeline
+        self.pool_share = pool_share
+        self.tariff = tariff or current_tariff()
+        self.n = len(items)
+
+    # -------------------------------
+    # Scalar pools (same arithmetic as calculate_production_contractual)
+    # -------------------------------
+    @cached_property
+    def _hours_frac(self) -> float:
+        frac = (float(self.workshop_hours) / FULL_TIME_HOURS) if self.workshop_hours > 0 else 0.0
+        return frac if self.pool_share is None else frac * float(self.pool_share)
+
+    @cached_property
+    def _contracts_safe(self) -> int:
+        return max(1, int(self.contracts)) if self.pool_share is None else 1
+
+    @cached_property
+    def inst_weekly_total(self) -> float:
+        if self.customer_covers_supervisors:
+            return 0.0
+        return sum((s / 52.0) * self._hours_frac / self._contracts_safe for s in self.supervisor_salaries)
+
+    @cached_property
+    def overheads_weekly_total(self) -> float:
+        if self.customer_covers_supervisors:
+            shadow = self.tariff.band3_shadow(self.region)
+            base = (shadow / 52.0) * self._hours_frac / self._contracts_safe
+        else:
+            base = self.inst_weekly_total
+        return base * OVERHEAD_RATE
+
+    @cached_property
+    def dev_weekly_total_at_20(self) -> float:
+        return (self.inst_weekly_total + self.overheads_weekly_total) * DEV_RATE_BASE
+
+    @cached_property
+    def dev_weekly_total_actual(self) -> float:
+        return (self.inst_weekly_total + self.overheads_weekly_total) * dev_rate_production(self.employment_support)
+
+    @cached_property
+    def addl_benefit_weekly(self) -> float:
+        if self.employment_support == "Both" and self.additional_benefits:
+            return self.inst_weekly_total * ADDL_BENEFIT_RATE
+        return 0.0
+
+    @cached_property
+    def output_scale(self) -> float:
+        scale = float(self.output_pct) / 100.0
+        if self.timeline is not None:
+            scale *= self.timeline.availability_ratio()
+        return scale
+
+    # -------------------------------
+    # Per-item inputs
+    # -------------------------------
+    @cached_property
+    def minutes(self) -> np.ndarray:
+        return np.array([float(it.get("minutes", 0)) for it in self.items], dtype=float)
+
+    @cached_property
+    def required(self) -> np.ndarray:
+        return np.array([int(it.get("required", 1)) for it in self.items], dtype=float)
+
+    @cached_property
+    def assigned(self) -> np.ndarray:
+        return np.array([int(it.get("assigned", 0)) for it in self.items], dtype=float)
+
+    @cached_property
+    def names(self) -> List[str]:
+        return [(it.get("name") or "").strip() or f"Item {i+1}" for i, it in enumerate(self.items)]
+
+    @cached_property
+    def assigned_minutes(self) -> np.ndarray:
+        return self.assigned * self.workshop_hours * 60.0
+
+    # -------------------------------
+    # Per-item intermediates
+    # -------------------------------
+    @cached_property
+    def cap_100(self) -> np.ndarray:
+        ok = (self.assigned > 0) & (self.minutes > 0) & (self.required > 0) & (self.workshop_hours > 0)
+        out = np.zeros(self.n)
+        out[ok] = self.assigned_minutes[ok] / (self.minutes[ok] * self.required[ok])
+        return out
+
+    @cached_property
+    def capacity_units(self) -> np.ndarray:
+        return self.cap_100 * self.output_scale
+
+    @cached_property
+    def share(self) -> np.ndarray:
+        denom = float(self.assigned_minutes.sum())
+        return (self.assigned_minutes / denom) if denom > 0 else np.zeros(self.n)
+
+    @cached_property
+    def units_for_pricing(self) -> np.ndarray:
+        if self.pricing_mode != "target":
+            return self.capacity_units
+        # as iter_production_contractual: targets[idx], else the item's own "target" key
+        if self.targets is None:
+            raw = [it.get("target", 0) for it in self.items]
+        else:
+            raw = list(self.targets[:self.n])
+        out = np.zeros(self.n)
+        for idx, t in enumerate(raw):
+            try:
+                out[idx] = float(int(t))
+            except Exception:
+                out[idx] = 0.0
+        return out
+
+    @cached_property
+    def _priced(self) -> np.ndarray:
+        return self.units_for_pricing > 0
+
+    @cached_property
+    def prisoner_weekly(self) -> np.ndarray:
+        return self.assigned * self.prisoner_salary
+
+    @cached_property
+    def inst_weekly(self) -> np.ndarray:
+        return self.inst_weekly_total * self.share
+
+    @cached_property
+    def overheads_weekly(self) -> np.ndarray:
+        return self.overheads_weekly_total * self.share
+
+    @cached_property
+    def dev_weekly_at_20(self) -> np.ndarray:
+        return self.dev_weekly_total_at_20 * self.share
+
+    @cached_property
+    def dev_weekly_actual(self) -> np.ndarray:
+        return self.dev_weekly_total_actual * self.share
+
+    @cached_property
+    def dev_weekly_discount(self) -> np.ndarray:
+        return self.dev_weekly_at_20 - self.dev_weekly_actual
+
+    @cached_property
+    def addl_weekly(self) -> np.ndarray:
+        return self.addl_benefit_weekly * self.share
+
+    @cached_property
+    def weekly_cost_total(self) -> np.ndarray:
+        return self.prisoner_weekly + self.inst_weekly + self.overheads_weekly + self.dev_weekly_actual - self.addl_weekly
+
+    @cached_property
+    def unit_cost_ex_vat(self) -> np.ndarray:
+        out = np.full(self.n, np.nan)
+        p = self._priced
+        out[p] = self.weekly_cost_total[p] / self.units_for_pricing[p]
+        return out
+
+    @cached_property
+    def unit_price_inc_vat(self) -> np.ndarray:
+        if self.customer_type == "Commercial" and self.apply_vat:
+            return self.unit_cost_ex_vat * (1 + (float(self.vat_rate) / 100.0))
+        return self.unit_cost_ex_vat
+
+    @cached_property
+    def monthly_total_ex_vat(self) -> np.ndarray:
+        return self.units_for_pricing * self.unit_cost_ex_vat * 52 / 12
+
+    @cached_property
+    def monthly_total_inc_vat(self) -> np.ndarray:
+        return self.units_for_pricing * self.unit_price_inc_vat * 52 / 12
+
+    @cached_property
+    def monthly_inst(self) -> np.ndarray:
+        return self.inst_weekly * 52.0 / 12.0
+
+    @cached_property
+    def monthly_oh(self) -> np.ndarray:
+        return self.overheads_weekly * 52.0 / 12.0
+
+    @cached_property
+    def monthly_dev_before(self) -> np.ndarray:
+        return self.dev_weekly_at_20 * 52.0 / 12.0
+
+    @cached_property
+    def monthly_dev_discount(self) -> np.ndarray:
+        return self.dev_weekly_discount * 52.0 / 12.0
+
+    @cached_property
+    def monthly_dev_revised(self) -> np.ndarray:
+        return self.dev_weekly_actual * 52.0 / 12.0
+
+    @cached_property
+    def monthly_addl(self) -> np.ndarray:
+        return self.addl_weekly * 52.0 / 12.0
+
+    @cached_property
+    def monthly_fixed(self) -> np.ndarray:
+        return self.monthly_inst + self.monthly_oh + self.monthly_dev_revised - self.monthly_addl
+
+    @cached_property
+    def unit_cost_from_prisoner(self) -> np.ndarray:
+        out = np.full(self.n, np.nan)
+        p = self._priced
+        out[p] = self.prisoner_weekly[p] / self.units_for_pricing[p]
+        return out
+
+    @cached_property
+    def units_to_cover(self) -> np.ndarray:
+        out = np.full(self.n, np.nan)
+        ucp = self.unit_cost_from_prisoner
+        ok = ~np.isnan(ucp) & (ucp > 0)
+        out[ok] = self.monthly_fixed[ok] / (ucp[ok] * 52.0 / 12.0)
+        return out
+
+    @cached_property
+    def available_minutes(self) -> np.ndarray:
+        return self.assigned_minutes * self.output_scale
+
+    @cached_property
+    def required_minutes(self) -> np.ndarray:
+        return self.units_for_pricing * self.minutes * self.required
+
+    @cached_property
+    def feasible(self) -> np.ndarray:
+        return self.required_minutes <= (self.available_minutes + 1e-6)
+
+    # -------------------------------
+    # Output columns
+    # -------------------------------
+    def _rounded_units(self, arr: np.ndarray) -> List[int]:
+        return [0 if v <= 0 else int(round(v)) for v in arr.tolist()]
+
+    def _nullable(self, arr: np.ndarray) -> List[Optional[float]]:
+        return [None if v != v else v for v in arr.tolist()]
+
+    def _notes(self) -> List[Optional[str]]:
+        if self.pricing_mode != "target":
+            return [None] * self.n
+        return [
+            None if ok else (f"Target requires {req:,.0f} mins vs available {avail:,.0f} mins; exceeds capacity.")
+            for ok, req, avail in zip(self.feasible.tolist(), self.required_minutes.tolist(), self.available_minutes.tolist())
+        ]
+
+    # column -> (numeric node or None, converter to the eager result's Python values)
+    _COLUMNS = {
+        "Item": (None, lambda r: r.names),
+        "Output %": (None, lambda r: [int(r.output_pct)] * r.n),
+        "Capacity (units/week)": ("capacity_units", lambda r: r._rounded_units(r.capacity_units)),
+        "Units/week": ("units_for_pricing", lambda r: r._rounded_units(r.units_for_pricing)),
+        "Unit Cost (£)": ("unit_cost_ex_vat", None),
+        "Unit Price ex VAT (£)": ("unit_cost_ex_vat", None),
+        "Unit Price inc VAT (£)": ("unit_price_inc_vat", None),
+        "Monthly Total ex VAT (£)": ("monthly_total_ex_vat", None),
+        "Monthly Total inc VAT (£)": ("monthly_total_inc_vat", None),
+        "Instructor cost (weekly £)": ("inst_weekly", None),
+        "Overheads (weekly £)": ("overheads_weekly", None),
+        "Development charge at 20% (weekly £)": ("dev_weekly_at_20", None),
+        "Development discount (weekly £)": ("dev_weekly_discount", None),
+        "Development revised (weekly £)": ("dev_weekly_actual", None),
+        "Additional benefit discount (weekly £)": ("addl_weekly", None),
+        "Instructor cost (monthly £)": ("monthly_inst", None),
+        "Overheads (monthly £)": ("monthly_oh", None),
+        "Development charge at 20% (monthly £)": ("monthly_dev_before", None),
+        "Development discount (monthly £)": ("monthly_dev_discount", None),
+        "Development revised (monthly £)": ("monthly_dev_revised", None),
+        "Additional benefit discount (monthly £)": ("monthly_addl", None),
+        "Monthly Fixed Costs excl Prisoner (£)": ("monthly_fixed", None),
+        "Unit Cost from Prisoner Wages (£)": ("unit_cost_from_prisoner", None),
+        "Units to cover fixed costs (per month)": ("units_to_cover", None),
+        "Feasible": ("feasible", lambda r: r.feasible.tolist() if r.pricing_mode == "target" else [None] * r.n),
+        "Note": (None, lambda r: r._notes()),
+        "Tariff version": (None, lambda r: [r.tariff.version] * r.n),
+    }
+
+    @classmethod
+    def columns(cls) -> List[str]:
+        return list(cls._COLUMNS)
+
+    def array(self, column: str) -> np.ndarray:
+        """Numeric column as a float array (NaN where the eager result is None)."""
+        node, _ = self._COLUMNS[column]
+        if node is None:
+            raise KeyError(f"{column} is not numeric")
+        return np.asarray(getattr(self, node), dtype=float)
+
+    def __getitem__(self, column: str) -> list:
+        node, conv = self._COLUMNS[column]
+        if conv is not None:
+            return conv(self)
+        return self._nullable(getattr(self, node))
+
+    def to_rows(self, columns: Optional[Sequence[str]] = None) -> List[Dict]:
+        cols = list(columns or self._COLUMNS)
+        values = [self[c] for c in cols]
+        return [dict(zip(cols, row)) for row in zip(*values)]
+
+    def to_frame(self, columns: Optional[Sequence[str]] = None):
+        import pandas as pd
+        cols = list(columns or self._COLUMNS)
+        return pd.DataFrame({c: self[c] for c in cols}, columns=cols)
+
+
+def lazy_production_contractual(items: List[Dict], output_pct: int, **kwargs) -> LazyProductionResult:
+    """Same arguments as calculate_production_contractual; nothing is computed until a column is read."""
+    return LazyProductionResult(items, output_pct, **kwargs)
@@ -0,0 +1,331 @@
+# loadtest61.py
+# Load-test harness: many simulated users drive newapp61.py headlessly (Streamlit AppTest)
+# at the same time, each with its own session, and every script rerun is timed.
+#
+# Each virtual user keeps one session open (like a browser tab) and repeatedly fills in and
+# generates a quote from a Host / Production / Ad-hoc mix with realistic inputs. Reports rerun
+# latency percentiles, per-session state size, each user process's RSS growth and throughput
+# for each concurrency level.
+#
+# Limitation: every virtual user is its own OS process with its own copy of the app (AppTest
+# sessions corrupt each other's widget state when run as threads in one process). The figures
+# are for N independent single-user servers sharing the machine's CPUs: there is no GIL
+# contention and no sharing of st.cache_resource objects (job pool, quote log, tariff store),
+# so they overstate what one `streamlit run` server sustains. Treat them as an upper bound.
+#
+#   python loadtest61.py --users 8 --quotes 5
+#   python loadtest61.py --users 16 --duration 120 --mix host=3,production=5,adhoc=2 --csv runs.csv
+import argparse
+import gc
+import multiprocessing
+import os
+import pickle
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from production61 import normalise_item_table
+from rules61 import EMPLOYMENT_SUPPORT_OPTIONS
+from tariff61 import PRISON_TO_REGION, SUPERVISOR_PAY
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "newapp61.py")
+DEFAULT_MIX = {"host": 4, "production": 4, "adhoc": 2}
+MODE = "independent per-process sessions"
+LIMITATION = ("each session runs in its own process with its own app copy: no GIL contention and no shared "
+              "st.cache_resource (job pool, quote log, tariff store), so this overstates one server's capacity")
+
+
+@dataclass
+class Rerun:
+    user: int
+    scenario: str
+    step: str
+    seconds: float
+    ok: bool
+    started: float
+
+
+# -------------------------------
+# Memory
+# -------------------------------
+def rss_bytes() -> int:
+    """Resident set size of this process (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def session_state_bytes(at) -> int:
+    """Pickled size of an open session's st.session_state (entries that can't be pickled count as 0)."""
+    total = 0
+    for value in at.session_state.to_dict().values():
+        try:
+            total += len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    return total
+
+
+# -------------------------------
+# Scenarios (one quote each, on an open session)
+# -------------------------------
+def _timed(at, log: List[Rerun], user: int, scenario: str, step: str):
+    t0 = time.perf_counter()
+    at.run()
+    log.append(Rerun(user, scenario, step, time.perf_counter() - t0, not at.exception, time.time()))
+
+
+def _base_inputs(at, rng: random.Random, contract_type: str, log, user, scenario):
+    prison = rng.choice(sorted(PRISON_TO_REGION.keys()))
+    at.selectbox(key="prison_choice").set_value(prison)
+    # typed in before any export buttons exist (see _rename_customer for edits afterwards)
+    at.session_state["customer_name"] = f"Customer {rng.randint(1, 9999)}"
+    at.selectbox(key="contract_type").set_value(contract_type)
+    _timed(at, log, user, scenario, "select contract")
+
+    region = PRISON_TO_REGION[prison]
+    n_sup = rng.randint(1, 3)
+    at.number_input[0].set_value(round(rng.uniform(20.0, 37.5), 1))   # workshop hours
+    at.number_input[1].set_value(rng.randint(6, 30))                  # prisoners
+    at.number_input[2].set_value(round(rng.uniform(10.0, 25.0), 2))   # prisoner salary
+    at.number_input[3].set_value(n_sup)                               # instructors
+    _timed(at, log, user, scenario, "inputs")
+
+    titles = [t["title"] for t in SUPERVISOR_PAY.get(region, [])]
+    for i in range(n_sup):
+        if titles:
+            at.selectbox(key=f"inst_title_{i}").set_value(rng.choice(titles))
+    at.selectbox[-1].set_value(rng.choice(EMPLOYMENT_SUPPORT_OPTIONS))
+    _timed(at, log, user, scenario, "instructors")
+
+
+def _click(at, label: str):
+    next(b for b in at.button if b.label == label).click()
+
+
+def _rename_customer(at, rng: random.Random, log: List[Rerun], user: int, scenario: str):
+    """Correct the customer name on a finished quote: reruns only the export buttons."""
+    at.text_input(key="customer_name").set_value(f"Customer {rng.randint(1, 9999)} Ltd")
+    _timed(at, log, user, scenario, "rename customer")
+    # AppTest keeps only the rerun fragment's elements; a plain full run restores the page
+    # so the next scenario can find its widgets (a browser keeps the rest of the page anyway).
+    at.run()
+
+
+def host_quote(at, rng: random.Random, log: List[Rerun], user: int):
+    _base_inputs(at, rng, "Host", log, user, "host")
+    _click(at, "Generate Host Costs")
+    _timed(at, log, user, "host", "generate")
+    _rename_customer(at, rng, log, user, "host")
+
+
+def production_quote(at, rng: random.Random, log: List[Rerun], user: int):
+    _base_inputs(at, rng, "Production", log, user, "production")
+    at.radio[0].set_value("Contractual")
+    n_prisoners = int(at.number_input[1].value)
+    n_items = rng.randint(1, min(12, n_prisoners))
+    assigned = np.random.default_rng(rng.randint(0, 2**31)).multinomial(n_prisoners - n_items, [1 / n_items] * n_items) + 1
+    at.session_state["prod_items_seed"] = normalise_item_table(pd.DataFrame([
+        {"Item": f"SKU {i + 1}", "Prisoners required": rng.randint(1, 2),
+         "Time per item": round(rng.uniform(2.0, 60.0), 1), "Prisoners assigned": int(a)}
+        for i, a in enumerate(assigned)
+    ]))
+    _timed(at, log, user, "production", "items")
+    _click(at, "Generate Production Costs")
+    _timed(at, log, user, "production", "generate")
+    _rename_customer(at, rng, log, user, "production")
+
+
+def adhoc_quote(at, rng: random.Random, log: List[Rerun], user: int):
+    _base_inputs(at, rng, "Production", log, user, "adhoc")
+    at.radio[0].set_value("Ad-hoc")
+    _timed(at, log, user, "adhoc", "mode")
+    n_lines = rng.randint(1, 6)
+    at.number_input(key="adhoc_num_lines").set_value(n_lines)
+    _timed(at, log, user, "adhoc", "lines")
+    for i in range(n_lines):
+        at.text_input(key=f"adhoc_name_{i}").set_value(f"Job {i + 1}")
+        at.number_input(key=f"adhoc_units_{i}").set_value(rng.randint(50, 2000))
+        at.date_input(key=f"adhoc_deadline_{i}").set_value(date.today() + timedelta(days=rng.randint(14, 120)))
+        at.number_input(key=f"adhoc_mins_{i}").set_value(round(rng.uniform(1.0, 30.0), 1))
+    _timed(at, log, user, "adhoc", "line inputs")
+    _click(at, "Generate Ad-hoc Costs")
+    _timed(at, log, user, "adhoc", "generate")
+    _rename_customer(at, rng, log, user, "adhoc")
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "host": host_quote,
+    "production": production_quote,
+    "adhoc": adhoc_quote,
+}
+
+
+# -------------------------------
+# Runner
+# -------------------------------
+# AppTest installs a process-wide Streamlit Runtime for the length of each run, so two AppTests
+# cannot rerun at the same time in one process. Each virtual user therefore gets its own worker
+# process; they all start quoting together and contend for the same CPUs as a busy server would.
+def _virtual_user(user: int, mix: Dict[str, float], quotes: Optional[int], duration: Optional[float],
+                  seed: int, timeout: float, start, results):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed * 100_003 + user)
+    names, weights = list(mix), list(mix.values())
+    log: List[Rerun] = []
+    errors: List[str] = []
+    gc.collect()
+    rss_base = rss_bytes()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    try:
+        _timed(at, log, user, "open", "first load")
+    finally:
+        start.wait()
+    deadline = (time.time() + duration) if duration else None
+    done = 0
+    while (quotes is None or done < quotes) and (deadline is None or time.time() < deadline):
+        scenario = rng.choices(names, weights)[0]
+        try:
+            SCENARIOS[scenario](at, rng, log, user)
+        except Exception as e:
+            errors.append(f"user {user} {scenario}: {type(e).__name__}: {e}")
+            at = AppTest.from_file(APP_PATH, default_timeout=timeout)   # start a fresh tab
+            _timed(at, log, user, "open", "first load")
+        done += 1
+    gc.collect()
+    results.put({
+        "log": [r.__dict__ for r in log],
+        "errors": errors,
+        "state_bytes": session_state_bytes(at),     # session still open
+        # whole-process growth: imports, module caches and the session together
+        "rss_delta_bytes": rss_bytes() - rss_base,
+        "finished": time.time(),
+    })
+
+
+def run_load(
+    users: int = 8,
+    *,
+    quotes: Optional[int] = 5,
+    duration: Optional[float] = None,
+    mix: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+    timeout: float = 120.0,
+) -> Dict:
+    """
+    Drive `users` concurrent sessions. Stops after `quotes` quotes per user, or after `duration` seconds.
+    Each user is a separate process (see the header: an upper bound for one server).
+    Returns {"mode", "reruns": DataFrame, "summary": DataFrame, "memory": {...}, "throughput": {...}, "errors": [...]}.
+    """
+    mix = mix or DEFAULT_MIX
+    start = multiprocessing.Barrier(users + 1)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(
+            target=_virtual_user,
+            args=(u, mix, None if duration else quotes, duration, seed, timeout, start, results),
+            daemon=True,
+        )
+        for u in range(users)
+    ]
+    for p in procs:
+        p.start()
+    start.wait()
+    t_start = time.time()       # throughput counts the quoting phase, not the first page loads
+    outs = [results.get(timeout=(duration or 0) + timeout * 10) for _ in procs]
+    for p in procs:
+        p.join(timeout=timeout)
+    wall = max(o["finished"] for o in outs) - t_start
+
+    df = pd.DataFrame([r for o in outs for r in o["log"]])
+    quoting = df[df["scenario"] != "open"] if not df.empty else df
+    generated = df[df["step"] == "generate"] if not df.empty else df
+    state = np.array([o["state_bytes"] for o in outs], dtype=float) / 2**10
+    rss_delta = np.array([o["rss_delta_bytes"] for o in outs], dtype=float) / 2**20
+    return {
+        "mode": MODE,
+        "reruns": df,
+        "summary": latency_summary(df),
+        "memory": {
+            "session_state_kb": float(state.mean()),
+            "session_state_max_kb": float(state.max()),
+            "process_rss_delta_mb": float(rss_delta.mean()),
+            "process_rss_delta_max_mb": float(rss_delta.max()),
+        },
+        "throughput": {
+            "users": users,
+            "wall_seconds": wall,
+            "reruns_per_second": len(quoting) / wall if wall else 0.0,
+            "quotes_per_minute": 60.0 * len(generated) / wall if wall else 0.0,
+        },
+        "errors": [e for o in outs for e in o["errors"]],
+    }
+
+
+def latency_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """p50/p95/p99/max rerun latency (ms) overall, per scenario and per scenario step."""
+    if df.empty:
+        return pd.DataFrame(columns=["group", "n", "p50_ms", "p95_ms", "p99_ms", "max_ms", "failed"])
+
+    def row(name: str, part: pd.DataFrame) -> Dict:
+        ms = part["seconds"].to_numpy() * 1000.0
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {"group": name, "n": len(ms), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+                "max_ms": ms.max(), "failed": int((~part["ok"]).sum())}
+
+    rows = [row("all reruns", df)]
+    rows += [row(s, part) for s, part in df.groupby("scenario", sort=True)]
+    rows += [row(f"{s} / {st}", part) for (s, st), part in df.groupby(["scenario", "step"], sort=True)]
+    return pd.DataFrame(rows)
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=f"Load test for newapp61.py ({MODE}; an upper bound for one server)")
+    p.add_argument("--users", type=int, nargs="+", default=[8], help="one or more concurrency levels to run in turn")
+    p.add_argument("--quotes", type=int, default=5, help="quotes per user (ignored with --duration)")
+    p.add_argument("--duration", type=float, default=None, help="seconds to run each level")
+    p.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX, help="e.g. host=4,production=4,adhoc=2")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--csv", default=None, help="write every timed rerun to this CSV")
+    args = p.parse_args(argv)
+
+    all_runs = []
+    for users in args.users:
+        out = run_load(users, quotes=args.quotes, duration=args.duration, mix=args.mix, seed=args.seed)
+        print(f"\n=== {users} {MODE} ===")
+        print(f"note: {LIMITATION}")
+        print(out["summary"].to_string(index=False, float_format=lambda x: f"{x:,.0f}"))
+        m, t = out["memory"], out["throughput"]
+        print(f"session state: {m['session_state_kb']:,.1f} KB per open session (max {m['session_state_max_kb']:,.1f} KB)")
+        print(f"process RSS delta: {m['process_rss_delta_mb']:,.1f} MB per user process "
+              f"(max {m['process_rss_delta_max_mb']:,.1f} MB; includes imports and module caches)")
+        print(f"throughput: {t['reruns_per_second']:,.1f} reruns/s, {t['quotes_per_minute']:,.1f} quotes/min over {t['wall_seconds']:,.0f} s")
+        for e in out["errors"][:10]:
+            print("error:", e)
+        all_runs.append(out["reruns"].assign(users=users))
+    if args.csv:
+        pd.concat(all_runs, ignore_index=True).to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,44 @@
+import hashlib
+import io
+import logging
+import sqlite3
+import time
+
 import streamlit as st
 import pandas as pd
 from datetime import date
 
 from config61 import CFG
-from tariff61 import PRISON_TO_REGION, SUPERVISOR_PAY
+from tariff61 import current_tariff
 from utils61 import (
     inject_govuk_css,
     fmt_currency,
     export_csv_single_row,
     export_csv_bytes_rows,
     export_html,
+    export_parquet_bytes,
+    quote_lines_table,
+    memo_payload,
+    lazy_download_button,
+    fragment,
+    rerun_fragments,
     render_table_html,
     build_header_block,
 )
 from production61 import (
     labour_minutes_budget,
-    calculate_production_contractual,
-    calculate_adhoc,
+    ITEM_TABLE_COLUMNS,
+    normalise_item_table,
+    items_from_table,
 )
-import host61
+from adhocvec61 import adhoc_display_table
+from cache61 import cached_adhoc_arrays, cached_host_quote, cached_production_contractual
+from calibrate61 import DATE_FORMAT_ISO, DATE_FORMAT_UK, LogCalibrator
+from rules61 import EMPLOYMENT_SUPPORT_OPTIONS
+from validate61 import ADHOC_LINE_SCHEMA, validate_table, error_messages
+from ratecard61 import fixed_costs_monthly, get_rate_card
+from jobs61 import JobManager
+from quotelog61 import QuoteLog
 
 
 # -------------------------------
@@ -36,19 +56,25 @@ with st.sidebar:
     prisoner_output = st.slider(
         "Prisoner labour output (%)",
         min_value=0, max_value=100,
-        value=CFG.GLOBAL_OUTPUT_DEFAULT, step=1
+        value=CFG.GLOBAL_OUTPUT_DEFAULT, step=1, key="prisoner_output",
     )
 
 
 # -------------------------------
 # Base inputs
 # -------------------------------
-prisons_sorted = ["Select"] + sorted(PRISON_TO_REGION.keys())
+# One tariff snapshot per run: the form's regions and pay bands and the quotes priced from them
+# come from the same tariff version, even if a reload lands mid-run.
+tariff = current_tariff()
+
+prisons_sorted = ["Select"] + sorted(tariff.prison_to_region.keys())
 prison_choice = st.selectbox("Prison Name", prisons_sorted, index=0, key="prison_choice")
-region = PRISON_TO_REGION.get(prison_choice, "Select") if prison_choice != "Select" else "Select"
+region = tariff.prison_to_region.get(prison_choice, "Select") if prison_choice != "Select" else "Select"
 st.session_state["region"] = region
 
-customer_name = st.text_input("Customer Name", key="customer_name")
+# Document-only fields: they appear on the exports but feed no calculation, so editing them
+# reruns just the export buttons ("exports" fragment), not the page.
+customer_name = st.text_input("Customer Name", key="customer_name", on_change=rerun_fragments("exports"))
 contract_type = st.selectbox("Contract Type", ["Select", "Host", "Production"], key="contract_type")
 
 workshop_hours = st.number_input("How many hours is the workshop open per week?", min_value=0.0, format="%.2f")
@@ -63,14 +89,16 @@ num_supervisors = st.number_input(
 customer_covers_supervisors = st.checkbox("Customer provides Instructor(s)?", value=False)
 
 supervisor_salaries = []
+supervisor_titles = []
 if num_supervisors > 0 and region != "Select" and not customer_covers_supervisors:
-    titles_for_region = SUPERVISOR_PAY.get(region, [])
+    titles_for_region = tariff.supervisor_pay.get(region, [])
     for i in range(int(num_supervisors)):
         options = [t["title"] for t in titles_for_region]
         sel = st.selectbox(f"Instructor {i+1} Title", options, key=f"inst_title_{i}")
         pay = next(t["avg_total"] for t in titles_for_region if t["title"] == sel)
         st.caption(f"{region} — £{pay:,.0f}")
         supervisor_salaries.append(float(pay))
+        supervisor_titles.append(sel)
 
 # Contracts: hide when customer provides instructors (assume 1)
 if not customer_covers_supervisors:
@@ -81,14 +109,17 @@ else:
 # Employment support (includes "Pre-release support")
 employment_support = st.selectbox(
     "What employment support does the customer offer?",
-    ["None", "Employment on release/RoTL", "Pre-release support", "Both"],
+    EMPLOYMENT_SUPPORT_OPTIONS,
 )
 
 # Additional benefits
 additional_benefits = st.checkbox("Are there any additional benefits to the prison?", value=False)
 additional_benefits_desc = ""
 if additional_benefits:
-    additional_benefits_desc = st.text_area("Please describe the additional benefits", value="")
+    additional_benefits_desc = st.text_area(
+        "Please describe the additional benefits", value="",
+        key="additional_benefits_desc", on_change=rerun_fragments("exports"),
+    )
 
 
 # -------------------------------
@@ -98,7 +129,7 @@ def validate_inputs():
     errors = []
     if prison_choice == "Select": errors.append("Select prison")
     if region == "Select": errors.append("Region could not be derived from prison selection")
-    if not str(customer_name).strip(): errors.append("Enter customer name")
+    if not _document_fields()[0].strip(): errors.append("Enter customer name")
     if contract_type == "Select": errors.append("Select contract type")
     if workshop_hours <= 0: errors.append("Workshop hours must be greater than zero")
     if num_prisoners < 0: errors.append("Prisoners employed cannot be negative")
@@ -107,29 +138,241 @@ def validate_inputs():
     return errors
 
 
+def _document_fields():
+    """(customer name, benefits description) as typed now; read from session state so fragments see edits."""
+    desc = st.session_state.get("additional_benefits_desc", "") if additional_benefits else ""
+    return str(st.session_state.get("customer_name", "") or ""), desc
+
+
 def _uk_date(d: date) -> str:
     return d.strftime("%d/%m/%Y")
 
 
-def _dev_rate_from_support(s: str) -> float:
-    s = (s or "").lower()
-    if "both" in s:
-        return 0.0
-    if "employment on release/rotl" in s or "pre-release support" in s:
-        return 0.10
-    return 0.20
+@st.cache_resource
+def _jobs() -> JobManager:
+    # one worker pool per server process, shared by every session
+    return JobManager(max_workers=CFG.JOB_WORKERS)
+
+
+@st.cache_resource
+def _quote_log() -> QuoteLog:
+    # one quote log per server process (QUOTE_LOG_PATH); stale quotes are invalidated on tariff reload
+    log = QuoteLog()
+    log.watch_tariff()
+    return log
+
+
+def _logged(common: dict, lines, build):
+    """
+    Payload builder that first records the exported quote in the quote log (Finance's CDC feed),
+    keyed "<customer>|<prison>|<quote type>", then builds the file. A log failure doesn't stop the download.
+    """
+    def run():
+        key = f"{str(common['Customer Name']).strip()}|{common['Prison Name']}|{common['Quote Type']}"
+        try:
+            _quote_log().record(key, lines(), tariff_version=common["Tariff Version"])
+        except (sqlite3.Error, OSError):
+            logging.getLogger(__name__).exception("could not record quote %s in the quote log", key)
+        return build()
+    return run
+
+
+LOG_DATE_FORMATS = {"DD/MM/YYYY": DATE_FORMAT_UK, "YYYY-MM-DD": DATE_FORMAT_ISO}
+
+
+@st.cache_data(show_spinner="Reading production log…", max_entries=4)
+def _read_log(data: bytes, date_format: str) -> LogCalibrator:
+    return LogCalibrator(date_format=date_format).ingest_csv(io.BytesIO(data))
+
+
+def _calibration_log():
+    """Optional production-log upload for calibrated times; its LogCalibrator, or None."""
+    with st.expander("Calibrate from a production log (optional)"):
+        uploaded = st.file_uploader("Production log CSV (item, prisoners, minutes, units, date)", type=["csv"], key="prod_log_csv")
+        fmt = st.radio("Dates in the log", list(LOG_DATE_FORMATS), index=0, horizontal=True, key="prod_log_dates")
+        if uploaded is None:
+            return None
+        try:
+            cal = _read_log(uploaded.getvalue(), LOG_DATE_FORMATS[fmt])
+        except ValueError as e:
+            st.error(f"Could not read the production log: {e}")
+            return None
+        st.caption(
+            f"{cal.rows_read - cal.rows_skipped:,} of {cal.rows_read:,} records used. Skipped: "
+            f"{cal.rows_bad_date:,} with a missing date or one not in {fmt} format, "
+            f"{cal.rows_invalid:,} with no item or non-positive prisoners / minutes / units."
+        )
+        if cal.stats:
+            st.dataframe(cal.summary(), hide_index=True, use_container_width=True)
+        return cal
+
+
+def _use_calibrated_item_times(cal: LogCalibrator, items_df: pd.DataFrame, time_unit: str):
+    """Button callback: calibrated times into the item grid (items the log has enough records for)."""
+    df = items_df.copy()
+    for i, (name, required) in enumerate(zip(df["Item"], df["Prisoners required"])):
+        m = cal.calibrated_minutes(str(name or ""), 1 if pd.isna(required) else int(required))
+        if m is not None:
+            df.loc[df.index[i], "Time per item"] = m * 60.0 if time_unit == "Seconds" else m
+    st.session_state["prod_items_seed"] = normalise_item_table(df)
+    st.session_state.pop("prod_items_editor", None)
+
+
+def _use_calibrated_line_minutes(cal: LogCalibrator, lines):
+    """Button callback: calibrated minutes into the ad-hoc line inputs."""
+    for i, ln in enumerate(lines):
+        m = cal.calibrated_minutes(ln["name"], ln["pris_per_item"])
+        if m is not None:
+            st.session_state[f"adhoc_mins_{i}"] = float(m)
+
+
+def _use_observed_output(cal: LogCalibrator, items):
+    """Button callback: the sidebar Output % becomes the output the log shows against these times."""
+    _, pct = cal.calibrated_defaults(items, int(st.session_state["prisoner_output"]), use="output")
+    st.session_state["prisoner_output"] = pct
+
+
+def _calibration_buttons(cal: LogCalibrator, items, key: str, on_times, args):
+    """'Use calibrated times' / 'Use observed output' for the items on screen."""
+    calibrated = [it for it in items if cal.calibrated_minutes(it["name"], it["required"]) is not None]
+    observed = cal.observed_output_pct(items)
+    if not calibrated and observed is None:
+        st.caption("The log has fewer than 5 usable records for every item here.")
+        return
+    b1, b2 = st.columns(2)
+    with b1:
+        st.button(f"Use calibrated times ({len(calibrated)} of {len(items)})", key=f"{key}_cal_times",
+                  on_click=on_times, args=args, disabled=not calibrated)
+    with b2:
+        label = "Use observed output" + (f" ({min(100.0, observed):.0f}%)" if observed is not None else "")
+        if st.button(label, key=f"{key}_cal_output", on_click=_use_observed_output, args=(cal, items), disabled=observed is None):
+            st.rerun()    # the Output % slider is outside this fragment
+
+
+def _inputs_signature(rows, output_pct, kwargs) -> str:
+    return hashlib.sha1(repr((rows, output_pct, sorted(kwargs.items()))).encode("utf-8")).hexdigest()
+
+
+def _background_result(state_key: str, signature: str):
+    """Poll the background job stored under state_key; returns its result once finished (else None)."""
+    entry = st.session_state.get(state_key)
+    if not entry:
+        return None
+    job_id, sig = entry
+    job = _jobs().get(job_id)
+    if job is None or sig != signature:
+        # job expired, or the inputs changed since it was submitted
+        st.session_state.pop(state_key, None)
+        return None
+    if job.status == "failed":
+        st.session_state.pop(state_key, None)
+        st.error(f"{job.label} failed: {job.error}")
+        return None
+    if job.is_active:
+        pct = f" ({job.done:,}/{job.total:,})" if job.total else ""
+        st.progress(job.progress, text=f"{job.label}: running for {job.elapsed:.0f}s{pct}")
+        time.sleep(CFG.JOB_POLL_SECONDS)
+        st.rerun()
+    return job.result
 
 
 # -------------------------------
 # HOST
 # -------------------------------
-if contract_type == "Host":
+@fragment("exports")
+def host_exports(df: pd.DataFrame, source_df: pd.DataFrame, tariff_version: str):
+    """Host download buttons. Reruns alone when a document-only field (customer name, benefits text) changes."""
+    customer_name, additional_benefits_desc = _document_fields()
+    header_block = build_header_block(
+        uk_date=_uk_date(date.today()),
+        customer_name=customer_name,
+        prison_name=prison_choice,
+        region=region,
+    )
+
+    def _grab_amount(needle: str) -> float:
+        try:
+            m = source_df["Item"].astype(str).str.contains(needle, case=False, na=False)
+            if m.any():
+                raw = str(source_df.loc[m, "Amount (£)"].iloc[-1]).replace("£", "").replace(",", "")
+                return float(raw)
+        except Exception:
+            pass
+        return 0.0
+
+    dev_before_amt = _grab_amount("Development Charge (before")
+    dev_single_amt = _grab_amount("Development charge")
+    dev_revised_amt = _grab_amount("Revised development charge")
+
+    amounts = {
+        "Host: Prisoner wages (£/month)": _grab_amount("Prisoner Wages"),
+        "Host: Instructor cost (£/month)": _grab_amount("Instructor Salary"),
+        "Host: Overheads (£/month)": _grab_amount("Overheads"),
+        "Host: Development charge (£/month)": dev_before_amt if dev_before_amt > 0 else dev_single_amt,
+        "Host: Development Reduction (£/month)": _grab_amount("Development charge discount"),
+        "Host: Development Revised (£/month)": dev_revised_amt if dev_revised_amt > 0 else dev_single_amt,
+        "Host: Additional benefit discount (£/month)": _grab_amount("Additional benefit discount"),
+        "Host: Grand Total (£/month)": _grab_amount("Grand Total (£/month)"),
+        "Host: VAT (£/month)": _grab_amount("VAT (20%)"),
+        "Host: Grand Total + VAT (£/month)": _grab_amount("Grand Total + VAT"),
+    }
+
+    common = {
+        "Quote Type": "Host",
+        "Date": _uk_date(date.today()),
+        "Prison Name": prison_choice,
+        "Region": region,
+        "Customer Name": customer_name,
+        "Contract Type": "Host",
+        "Workshop Hours / week": workshop_hours,
+        "Prisoners Employed": num_prisoners,
+        "Prisoner Salary / week": prisoner_salary,
+        "Instructors Count": num_supervisors,
+        "Customer Provides Instructors": "Yes" if customer_covers_supervisors else "No",
+        "Employment Support": employment_support,
+        "Contracts Overseen": contracts,
+        "VAT Rate (%)": 20.0,
+        "Tariff Version": tariff_version,
+        "Additional Benefits": "Yes" if additional_benefits else "No",
+        "Additional Benefits (desc)": additional_benefits_desc,
+    }
+
+    # Files are built only when downloaded, once per distinct quote
+    sig = _inputs_signature(common, header_block, {"host": source_df.to_dict("split")})
+    lines = lambda: quote_lines_table(common, None, source_df)  # noqa: E731
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        lazy_download_button(
+            "Download CSV (Host)",
+            memo_payload("host.csv", sig, _logged(common, lines, lambda: export_csv_bytes_rows([{**common, **amounts}]))),
+            file_name="host_quote.csv",
+            mime="text/csv",
+        )
+    with c2:
+        lazy_download_button(
+            "Download PDF-ready HTML (Host)",
+            memo_payload("host.html", sig, _logged(common, lines, lambda: export_html(df, None, title="Host Quote", header_block=header_block, segregated_df=None))),
+            file_name="host_quote.html",
+            mime="text/html",
+        )
+    with c3:
+        lazy_download_button(
+            "Download Parquet (Host)",
+            memo_payload("host.parquet", sig, _logged(common, lines, lambda: export_parquet_bytes(lines()))),
+            file_name="host_quote.parquet",
+            mime="application/vnd.apache.parquet",
+        )
+
+
+@fragment("host")
+def host_panel():
+    """Generate button and Host results; clicking Generate reruns only this panel."""
     if st.button("Generate Host Costs"):
         errs = validate_inputs()
         if errs:
             st.error("Fix errors:\n- " + "\n- ".join(errs))
         else:
-            host_df, ctx = host61.generate_host_quote(
+            host_df, ctx = cached_host_quote(
                 workshop_hours=workshop_hours,
                 num_prisoners=num_prisoners,
                 prisoner_salary=prisoner_salary,
@@ -140,8 +383,10 @@ if contract_type == "Host":
                 contracts=contracts,
                 employment_support=employment_support,
                 additional_benefits=additional_benefits,
+                tariff=tariff,
             )
             st.session_state["host_df"] = host_df
+            st.session_state["host_tariff_version"] = ctx["tariff_version"]
 
     if "host_df" in st.session_state:
         df = st.session_state["host_df"].copy()
@@ -157,78 +402,130 @@ if contract_type == "Host":
             st.markdown(render_table_html(df_display), unsafe_allow_html=True)
 
         # Downloads
-        header_block = build_header_block(
-            uk_date=_uk_date(date.today()),
-            customer_name=customer_name,
-            prison_name=prison_choice,
-            region=region,
-        )
+        host_exports(df, st.session_state["host_df"].copy(), st.session_state["host_tariff_version"])
+
+
+if contract_type == "Host":
+    host_panel()
 
-        source_df = st.session_state["host_df"].copy()
-
-        def _grab_amount(needle: str) -> float:
-            try:
-                m = source_df["Item"].astype(str).str.contains(needle, case=False, na=False)
-                if m.any():
-                    raw = str(source_df.loc[m, "Amount (£)"].iloc[-1]).replace("£", "").replace(",", "")
-                    return float(raw)
-            except Exception:
-                pass
-            return 0.0
-
-        dev_before_amt = _grab_amount("Development Charge (before")
-        dev_single_amt = _grab_amount("Development charge")
-        dev_revised_amt = _grab_amount("Revised development charge")
-
-        amounts = {
-            "Host: Prisoner wages (£/month)": _grab_amount("Prisoner Wages"),
-            "Host: Instructor cost (£/month)": _grab_amount("Instructor Salary"),
-            "Host: Overheads (£/month)": _grab_amount("Overheads"),
-            "Host: Development charge (£/month)": dev_before_amt if dev_before_amt > 0 else dev_single_amt,
-            "Host: Development Reduction (£/month)": _grab_amount("Development charge discount"),
-            "Host: Development Revised (£/month)": dev_revised_amt if dev_revised_amt > 0 else dev_single_amt,
-            "Host: Additional benefit discount (£/month)": _grab_amount("Additional benefit discount"),
-            "Host: Grand Total (£/month)": _grab_amount("Grand Total (£/month)"),
-            "Host: VAT (£/month)": _grab_amount("VAT (20%)"),
-            "Host: Grand Total + VAT (£/month)": _grab_amount("Grand Total + VAT"),
-        }
 
+# -------------------------------
+# PRODUCTION
+# -------------------------------
+@fragment("exports")
+def production_exports(results, prod_breakdown_df: pd.DataFrame, unit_df: pd.DataFrame, calc_sig: str, tariff_version: str):
+    """Production download buttons (reruns alone on document-only edits, like host_exports)."""
+    customer_name, additional_benefits_desc = _document_fields()
+    header_block = build_header_block(
+        uk_date=_uk_date(date.today()),
+        customer_name=customer_name,
+        prison_name=prison_choice,
+        region=region
+    )
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        # CSV for the breakdown only
         common = {
-            "Quote Type": "Host",
+            "Quote Type": "Production",
             "Date": _uk_date(date.today()),
             "Prison Name": prison_choice,
             "Region": region,
             "Customer Name": customer_name,
-            "Contract Type": "Host",
+            "Contract Type": "Production",
             "Workshop Hours / week": workshop_hours,
             "Prisoners Employed": num_prisoners,
             "Prisoner Salary / week": prisoner_salary,
             "Instructors Count": num_supervisors,
-            "Customer Provides Instructors": "Yes" if customer_covers_supervisors else "No",
+            "Customer Provides Instructors": "No",
+            "Labour Output (%)": prisoner_output,
             "Employment Support": employment_support,
             "Contracts Overseen": contracts,
             "VAT Rate (%)": 20.0,
+            "Tariff Version": tariff_version,
             "Additional Benefits": "Yes" if additional_benefits else "No",
             "Additional Benefits (desc)": additional_benefits_desc,
         }
+        sig = _inputs_signature(common, header_block, {"calc": calc_sig})
+        lines = lambda: quote_lines_table(common, pd.DataFrame(results), prod_breakdown_df)  # noqa: E731
+        lazy_download_button(
+            "Download CSV (Production – Breakdown)",
+            memo_payload("production.csv", sig, _logged(common, lines, lambda: export_csv_single_row(common, prod_breakdown_df, None))),
+            file_name="production_breakdown.csv",
+            mime="text/csv"
+        )
+    with c2:
+        # HTML shows both: breakdown (main) + unit table (secondary)
+        lazy_download_button(
+            "Download PDF-ready HTML (Production)",
+            memo_payload("production.html", sig, _logged(common, lines, lambda: export_html(None, prod_breakdown_df, title="Production Quote", header_block=header_block, segregated_df=unit_df))),
+            file_name="production_quote.html",
+            mime="text/html"
+        )
+    with c3:
+        # Long-format Parquet: per-item numeric results + monthly breakdown
+        lazy_download_button(
+            "Download Parquet (Production)",
+            memo_payload("production.parquet", sig, _logged(common, lines, lambda: export_parquet_bytes(lines()))),
+            file_name="production_quote.parquet",
+            mime="application/vnd.apache.parquet"
+        )
 
-        host_csv = export_csv_bytes_rows([{**common, **amounts}])
-        c1, c2 = st.columns(2)
-        with c1:
-            st.download_button("Download CSV (Host)", data=host_csv, file_name="host_quote.csv", mime="text/csv")
-        with c2:
-            st.download_button(
-                "Download PDF-ready HTML (Host)",
-                data=export_html(df, None, title="Host Quote", header_block=header_block, segregated_df=None),
-                file_name="host_quote.html",
-                mime="text/html",
-            )
 
+@fragment("exports")
+def adhoc_exports(df: pd.DataFrame, calc_sig: str, tariff_version: str):
+    """Ad-hoc download buttons (reruns alone on document-only edits, like host_exports)."""
+    customer_name, _ = _document_fields()
+    header_block = build_header_block(
+        uk_date=_uk_date(date.today()),
+        customer_name=customer_name,
+        prison_name=prison_choice,
+        region=region
+    )
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        common = {
+            "Quote Type": "Production (Ad-hoc)",
+            "Date": _uk_date(date.today()),
+            "Prison Name": prison_choice,
+            "Region": region,
+            "Customer Name": customer_name,
+            "Workshop Hours / week": workshop_hours,
+            "Prisoners Employed": num_prisoners,
+            "Prisoner Salary / week": prisoner_salary,
+            "Labour Output (%)": prisoner_output,
+            "VAT Rate (%)": 20.0,
+            "Tariff Version": tariff_version,
+        }
+        sig = _inputs_signature(common, header_block, {"calc": calc_sig})
+        lines = lambda: quote_lines_table(common, df, None)  # noqa: E731
+        lazy_download_button(
+            "Download CSV (Ad-hoc)",
+            memo_payload("adhoc.csv", sig, _logged(common, lines, lambda: export_csv_single_row(common, df, None))),
+            file_name="adhoc_quote.csv",
+            mime="text/csv"
+        )
+    with c2:
+        lazy_download_button(
+            "Download PDF-ready HTML (Ad-hoc)",
+            memo_payload("adhoc.html", sig, _logged(common, lines, lambda: export_html(None, df, title="Ad-hoc Quote", header_block=header_block, segregated_df=None))),
+            file_name="adhoc_quote.html",
+            mime="text/html"
+        )
+    with c3:
+        lazy_download_button(
+            "Download Parquet (Ad-hoc)",
+            memo_payload("adhoc.parquet", sig, _logged(common, lines, lambda: export_parquet_bytes(lines()))),
+            file_name="adhoc_quote.parquet",
+            mime="application/vnd.apache.parquet"
+        )
 
-# -------------------------------
-# PRODUCTION
-# -------------------------------
-if contract_type == "Production":
+
+@fragment("production")
+def production_panel():
+    """
+    Production settings, items / lines and results. Editing an item or line, or clicking
+    Generate, reruns only this panel; the base inputs above it are not rebuilt.
+    """
     st.markdown("---")
     st.subheader("Production settings")
 
@@ -238,55 +535,61 @@ if contract_type == "Production":
     st.info(f"Available Labour minutes per week @ {prisoner_output}% = **{budget_minutes_planned:,.0f} minutes**.")
 
     prod_mode = st.radio("Do you want contractual or ad-hoc costs?", ["Contractual", "Ad-hoc"], index=0)
+    cal = _calibration_log()
 
     if prod_mode == "Contractual":
         pricing_mode = st.radio("Price based on:", ["Maximum units from capacity", "Target units per week"], index=0)
         pricing_mode_key = "as-is" if pricing_mode.startswith("Maximum") else "target"
 
-        num_items = st.number_input("Number of items produced?", min_value=1, value=1, step=1, key="num_items_prod")
-        items, targets = [], []
-
-        for i in range(int(num_items)):
-            with st.expander(f"Item {i+1} details", expanded=(i == 0)):
-                name = st.text_input(f"Item {i+1} Name", key=f"name_{i}")
-                disp = (name.strip() or f"Item {i+1}") if isinstance(name, str) else f"Item {i+1}"
-
-                required = st.number_input(f"Prisoners required to make 1 item ({disp})", min_value=1, value=1, step=1, key=f"req_{i}")
-                unit_choice = st.radio(
-                    f"Input unit for production time ({disp})", ["Minutes", "Seconds"],
-                    index=0, key=f"mins_unit_{i}", horizontal=True
-                )
-                if unit_choice == "Minutes":
-                    minutes_val = st.number_input(
-                        f"How long to make 1 item ({disp}) (minutes)",
-                        min_value=0.0, value=10.0, format="%.4f", key=f"mins_val_{i}"
-                    )
-                    minutes_per = float(minutes_val)
-                else:
-                    seconds_val = st.number_input(
-                        f"How long to make 1 item ({disp}) (seconds)",
-                        min_value=0.0, value=30.0, format="%.2f", key=f"secs_val_{i}"
-                    )
-                    minutes_per = float(seconds_val) / 60.0
-
-                total_assigned_before = sum(int(st.session_state.get(f"assigned_{j}", 0)) for j in range(i))
-                remaining = max(0, int(num_prisoners) - total_assigned_before)
-                assigned = st.number_input(
-                    f"How many prisoners work solely on this item ({disp})",
-                    min_value=0, max_value=remaining, value=int(st.session_state.get(f"assigned_{i}", 0)),
-                    step=1, key=f"assigned_{i}",
-                )
-
-                cap_100 = (assigned * workshop_hours * 60.0) / (minutes_per * required) if (assigned > 0 and minutes_per > 0) else 0.0
-                cap_planned = cap_100 * output_scale
-                st.caption(f"{disp} capacity @ 100%: **{cap_100:.0f} units/week** · @ {prisoner_output}%: **{cap_planned:.0f}**")
-
-                if pricing_mode_key == "target":
-                    tgt_default = int(round(cap_planned)) if cap_planned > 0 else 0
-                    tgt = st.number_input(f"Target units per week ({disp})", min_value=0, value=tgt_default, step=1, key=f"target_{i}")
-                    targets.append(int(tgt))
-
-                items.append({"name": name, "required": int(required), "minutes": float(minutes_per), "assigned": int(assigned)})
+        # Items are entered in one editable grid (type, paste from a spreadsheet or import a CSV)
+        # instead of a set of widgets per item, so reruns stay flat as the item count grows.
+        time_unit = st.radio("Input unit for production time", ["Minutes", "Seconds"], index=0, horizontal=True, key="prod_time_unit")
+        uploaded = st.file_uploader("Import items from CSV (optional)", type=["csv"], key="prod_items_csv")
+        if uploaded is not None and st.session_state.get("prod_items_csv_sig") != (uploaded.name, uploaded.size):
+            st.session_state["prod_items_seed"] = normalise_item_table(pd.read_csv(uploaded))
+            st.session_state["prod_items_csv_sig"] = (uploaded.name, uploaded.size)
+            st.session_state.pop("prod_items_editor", None)
+        if "prod_items_seed" not in st.session_state:
+            st.session_state["prod_items_seed"] = normalise_item_table(pd.DataFrame([{"Item": ""}]))
+
+        items_df = st.data_editor(
+            st.session_state["prod_items_seed"],
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            column_order=ITEM_TABLE_COLUMNS if pricing_mode_key == "target" else ITEM_TABLE_COLUMNS[:-1],
+            column_config={
+                "Item": st.column_config.TextColumn("Item"),
+                "Prisoners required": st.column_config.NumberColumn("Prisoners required to make 1 item", min_value=1, step=1, default=1),
+                "Time per item": st.column_config.NumberColumn(f"Time to make 1 item ({time_unit.lower()})", min_value=0.0, format="%.4f", default=10.0),
+                "Prisoners assigned": st.column_config.NumberColumn("Prisoners working solely on this item", min_value=0, step=1, default=0),
+                "Target units/week": st.column_config.NumberColumn("Target units per week (blank = capacity)", min_value=0, step=1),
+            },
+            key="prod_items_editor",
+        )
+        items, targets, item_errors = items_from_table(items_df, num_prisoners=int(num_prisoners), time_unit=time_unit)
+        if item_errors:
+            st.error("Check the item table:\n- " + "\n- ".join(item_errors))
+        if cal is not None and items:
+            _calibration_buttons(cal, items, "prod", _use_calibrated_item_times, (cal, items_df, time_unit))
+
+        # Capacity preview for every item, computed per column rather than per widget
+        cap_df = pd.DataFrame(items, columns=["name", "required", "minutes", "assigned"])
+        cap_100 = (cap_df["assigned"] * workshop_hours * 60.0) / (cap_df["minutes"] * cap_df["required"])
+        cap_100 = cap_100.where((cap_df["assigned"] > 0) & (cap_df["minutes"] > 0), 0.0).fillna(0.0)
+        cap_planned = cap_100 * output_scale
+        if pricing_mode_key == "target":
+            targets = [int(round(c)) if t is None else t for t, c in zip(targets, cap_planned)]
+        if not cap_df.empty:
+            st.dataframe(
+                pd.DataFrame({
+                    "Item": [n.strip() or f"Item {i+1}" for i, n in enumerate(cap_df["name"])],
+                    "Capacity @ 100% (units/week)": cap_100.round().astype(int),
+                    f"Capacity @ {prisoner_output}% (units/week)": cap_planned.round().astype(int),
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
 
         total_assigned = sum(it["assigned"] for it in items)
         used_minutes_raw = total_assigned * workshop_hours * 60.0
@@ -296,195 +599,162 @@ if contract_type == "Production":
         if pricing_mode_key == "as-is" and used_minutes_planned > budget_minutes_planned:
             st.error("Planned used minutes exceed planned available minutes.")
         else:
+            calc_kwargs = dict(
+                workshop_hours=float(workshop_hours),
+                prisoner_salary=float(prisoner_salary),
+                supervisor_salaries=supervisor_salaries,
+                customer_covers_supervisors=False,
+                region=region,
+                customer_type="Commercial",
+                apply_vat=True, vat_rate=20.0,
+                num_prisoners=int(num_prisoners),
+                num_supervisors=int(num_supervisors),
+                pricing_mode=pricing_mode_key,
+                targets=targets if pricing_mode_key == "target" else None,
+                employment_support=employment_support,
+                contracts=int(contracts),
+            )
+            calc_sig = _inputs_signature(items, prisoner_output, {**calc_kwargs, "tariff": tariff.version})
+
+            results = None
             if st.button("Generate Production Costs", key="generate_contractual"):
-                errs = validate_inputs()
+                errs = validate_inputs() + item_errors
                 if errs:
                     st.error("Fix errors:\n- " + "\n- ".join(errs))
+                elif len(items) >= CFG.BACKGROUND_JOB_MIN_ROWS:
+                    # Large item lists run on the background worker pool; the page polls for progress
+                    job_id = _jobs().submit(
+                        cached_production_contractual, items, int(prisoner_output),
+                        label=f"Production quote ({len(items):,} items)", tariff=tariff, **calc_kwargs,
+                    )
+                    st.session_state["prod_job"] = (job_id, calc_sig)
                 else:
+                    st.session_state.pop("prod_job", None)
                     # We still call calculate_production_contractual to get item Unit Price ex VAT (used for coverage calc),
-                    # but we will NOT render that table anymore.
-                    results = calculate_production_contractual(
-                        items, int(prisoner_output),
-                        workshop_hours=float(workshop_hours),
-                        prisoner_salary=float(prisoner_salary),
-                        supervisor_salaries=supervisor_salaries,
-                        customer_covers_supervisors=False,
-                        region=region,
-                        customer_type="Commercial",
-                        apply_vat=True, vat_rate=20.0,
-                        num_prisoners=int(num_prisoners),
-                        num_supervisors=int(num_supervisors),
-                        pricing_mode=pricing_mode_key,
-                        targets=targets if pricing_mode_key == "target" else None,
-                        employment_support=employment_support,
-                        contracts=int(contracts),
-                    )
+                    # but we will NOT render that table anymore. Repeat quotes come from the result cache (cache61).
+                    results = cached_production_contractual(items, int(prisoner_output), tariff=tariff, **calc_kwargs)
+            if results is None:
+                results = _background_result("prod_job", calc_sig)
 
-                    # === Monthly Breakdown (Instructor cost, Overheads, Dev, Discounts) ===
-                    hours_frac = (float(workshop_hours) / 37.5) if workshop_hours > 0 else 0.0
-                    contracts_safe = max(1, int(contracts))
-
-                    # Instructor cost (weekly/monthly)
-                    inst_weekly_total = sum((s / 52.0) * hours_frac / contracts_safe for s in supervisor_salaries)
-                    inst_monthly = inst_weekly_total * 52.0 / 12.0
-
-                    # Overheads based on instructor (61%)
-                    overheads_weekly = inst_weekly_total * 0.61
-                    overheads_monthly = overheads_weekly * 52.0 / 12.0
-
-                    # Development charge on (Instructor + Overheads)
-                    dev_rate_eff = _dev_rate_from_support(employment_support)
-                    dev_weekly_before = (inst_weekly_total + overheads_weekly) * 0.20
-                    dev_weekly_actual = (inst_weekly_total + overheads_weekly) * dev_rate_eff
-                    dev_weekly_discount = max(0.0, dev_weekly_before - dev_weekly_actual)
-
-                    dev_before_monthly = dev_weekly_before * 52.0 / 12.0
-                    dev_actual_monthly = dev_weekly_actual * 52.0 / 12.0
-                    dev_disc_monthly = dev_weekly_discount * 52.0 / 12.0
-
-                    # Additional benefit discount (now 10% of (Instructor + Overheads))
-                    addl_benefit_monthly = 0.0
-                    if employment_support == "Both" and additional_benefits:
-                        addl_benefit_monthly = (inst_monthly + overheads_monthly) * 0.10
-
-                    subtotal_monthly_ex_vat = inst_monthly + overheads_monthly + dev_actual_monthly - addl_benefit_monthly
-                    total_with_vat_monthly = subtotal_monthly_ex_vat * 1.20
-
-                    breakdown_rows = [
-                        ("Instructor cost", inst_monthly),
-                        ("Overheads", overheads_monthly),
-                        ("Development charge", dev_before_monthly),
-                        ("Development discount", -dev_disc_monthly),
-                        ("Revised development charge", dev_actual_monthly),
-                    ]
-                    if addl_benefit_monthly > 0:
-                        breakdown_rows.append(("Additional benefit discount", -addl_benefit_monthly))
-                    breakdown_rows.append(("Subtotal (ex VAT £/month)", subtotal_monthly_ex_vat))
-                    breakdown_rows.append(("Total with VAT (£/month)", total_with_vat_monthly))
-
-                    prod_breakdown_df = pd.DataFrame(breakdown_rows, columns=["Item", "Amount (£)"])
-                    prod_breakdown_df["Amount (£)"] = prod_breakdown_df["Amount (£)"].apply(fmt_currency)
-                    st.markdown("### Monthly Breakdown")
-                    st.markdown(render_table_html(prod_breakdown_df), unsafe_allow_html=True)
-
-                    # === Prisoner-only unit cost & units required to cover prisoner wages ===
-                    denom_minutes = sum(int(it.get("assigned", 0)) * workshop_hours * 60.0 for it in items)
-                    unit_rows = []
-                    for idx, it in enumerate(items):
-                        name = (it.get("name") or f"Item {idx+1}").strip()
-                        pris_assigned = int(it.get("assigned", 0))
-                        mins_per_unit = float(it.get("minutes", 0))
-                        pris_required = int(it.get("required", 1))
-
-                        # Units used for pricing (weekly)
-                        if pricing_mode_key == "target":
-                            units_week = float(targets[idx]) if (targets and idx < len(targets)) else 0.0
-                        else:
-                            cap_100 = (pris_assigned * workshop_hours * 60.0) / (mins_per_unit * pris_required) if (pris_assigned > 0 and mins_per_unit > 0) else 0.0
-                            units_week = cap_100 * output_scale
-
-                        units_month = units_week * (52.0 / 12.0)
-
-                        # Monthly prisoner wages assigned to this item
-                        prisoner_weekly_item = pris_assigned * prisoner_salary
-                        prisoner_monthly_item = prisoner_weekly_item * 52.0 / 12.0
-
-                        # Prisoner-only unit cost (per unit per month)
-                        if units_month > 0:
-                            unit_cost_prisoner_only = prisoner_monthly_item / units_month
-                        else:
-                            unit_cost_prisoner_only = None
-
-                        # Unit Price ex VAT (£) for this item (from results)
-                        unit_price_ex_vat = None
-                        if idx < len(results):
-                            try:
-                                unit_price_ex_vat = float(results[idx].get("Unit Price ex VAT (£)"))
-                            except Exception:
-                                unit_price_ex_vat = None
-
-                        # Units required per month to cover prisoner wages
-                        if unit_price_ex_vat and unit_price_ex_vat > 0:
-                            units_required_cover_pris = prisoner_monthly_item / unit_price_ex_vat
-                        else:
-                            units_required_cover_pris = None
-
-                        unit_rows.append({
-                            "Item": name,
-                            "Unit cost (prisoner-only, £/unit per month)": unit_cost_prisoner_only,
-                            "Units required (per month) to cover prisoner wages": units_required_cover_pris,
-                        })
-
-                    unit_df = pd.DataFrame(unit_rows, columns=[
-                        "Item",
-                        "Unit cost (prisoner-only, £/unit per month)",
-                        "Units required (per month) to cover prisoner wages"
-                    ])
-                    # Format numeric columns
-                    def _fmt2(x):
-                        try:
-                            return "£" + format(float(x), ",.2f")
-                        except Exception:
-                            return "—" if x is None else x
+            if results is not None:
 
-                    def _fmt0(x):
+                # === Monthly Breakdown (Instructor cost, Overheads, Dev, Discounts) ===
+                # Looked up from the precomputed regional rate card (host rules: dev on Instructor + Overheads,
+                # additional benefit discount = 10% of (Instructor + Overheads))
+                fixed = fixed_costs_monthly(
+                    region=region,
+                    titles=supervisor_titles,
+                    workshop_hours=float(workshop_hours),
+                    contracts=int(contracts),
+                    employment_support=employment_support,
+                    additional_benefits=additional_benefits,
+                    rules="host",
+                    card=get_rate_card(tariff),
+                )
+                inst_monthly = fixed["instructor"]
+                overheads_monthly = fixed["overheads"]
+                dev_before_monthly = fixed["dev_before"]
+                dev_actual_monthly = fixed["dev_actual"]
+                dev_disc_monthly = fixed["dev_discount"]
+                addl_benefit_monthly = fixed["additional_benefit"]
+
+                subtotal_monthly_ex_vat = fixed["subtotal"]
+                total_with_vat_monthly = subtotal_monthly_ex_vat * 1.20
+
+                breakdown_rows = [
+                    ("Instructor cost", inst_monthly),
+                    ("Overheads", overheads_monthly),
+                    ("Development charge", dev_before_monthly),
+                    ("Development discount", -dev_disc_monthly),
+                    ("Revised development charge", dev_actual_monthly),
+                ]
+                if addl_benefit_monthly > 0:
+                    breakdown_rows.append(("Additional benefit discount", -addl_benefit_monthly))
+                breakdown_rows.append(("Subtotal (ex VAT £/month)", subtotal_monthly_ex_vat))
+                breakdown_rows.append(("Total with VAT (£/month)", total_with_vat_monthly))
+
+                prod_breakdown_df = pd.DataFrame(breakdown_rows, columns=["Item", "Amount (£)"])
+                prod_breakdown_df["Amount (£)"] = prod_breakdown_df["Amount (£)"].apply(fmt_currency)
+                st.markdown("### Monthly Breakdown")
+                st.markdown(render_table_html(prod_breakdown_df), unsafe_allow_html=True)
+
+                # === Prisoner-only unit cost & units required to cover prisoner wages ===
+                denom_minutes = sum(int(it.get("assigned", 0)) * workshop_hours * 60.0 for it in items)
+                unit_rows = []
+                for idx, it in enumerate(items):
+                    name = (it.get("name") or f"Item {idx+1}").strip()
+                    pris_assigned = int(it.get("assigned", 0))
+                    mins_per_unit = float(it.get("minutes", 0))
+                    pris_required = int(it.get("required", 1))
+
+                    # Units used for pricing (weekly)
+                    if pricing_mode_key == "target":
+                        units_week = float(targets[idx]) if (targets and idx < len(targets)) else 0.0
+                    else:
+                        cap_100 = (pris_assigned * workshop_hours * 60.0) / (mins_per_unit * pris_required) if (pris_assigned > 0 and mins_per_unit > 0) else 0.0
+                        units_week = cap_100 * output_scale
+
+                    units_month = units_week * (52.0 / 12.0)
+
+                    # Monthly prisoner wages assigned to this item
+                    prisoner_weekly_item = pris_assigned * prisoner_salary
+                    prisoner_monthly_item = prisoner_weekly_item * 52.0 / 12.0
+
+                    # Prisoner-only unit cost (per unit per month)
+                    if units_month > 0:
+                        unit_cost_prisoner_only = prisoner_monthly_item / units_month
+                    else:
+                        unit_cost_prisoner_only = None
+
+                    # Unit Price ex VAT (£) for this item (from results)
+                    unit_price_ex_vat = None
+                    if idx < len(results):
                         try:
-                            return format(float(x), ",.0f")
+                            unit_price_ex_vat = float(results[idx].get("Unit Price ex VAT (£)"))
                         except Exception:
-                            return "—" if x is None else x
-
-                    if not unit_df.empty:
-                        unit_df_disp = unit_df.copy()
-                        unit_df_disp["Unit cost (prisoner-only, £/unit per month)"] = unit_df_disp["Unit cost (prisoner-only, £/unit per month)"].apply(_fmt2)
-                        unit_df_disp["Units required (per month) to cover prisoner wages"] = unit_df_disp["Units required (per month) to cover prisoner wages"].apply(_fmt0)
-
-                        st.markdown("### Prisoner-only Unit Cost & Coverage")
-                        st.markdown(render_table_html(unit_df_disp), unsafe_allow_html=True)
-
-                    # === Downloads (Production) ===
-                    header_block = build_header_block(
-                        uk_date=_uk_date(date.today()),
-                        customer_name=customer_name,
-                        prison_name=prison_choice,
-                        region=region
-                    )
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        # CSV for the breakdown only
-                        common = {
-                            "Quote Type": "Production",
-                            "Date": _uk_date(date.today()),
-                            "Prison Name": prison_choice,
-                            "Region": region,
-                            "Customer Name": customer_name,
-                            "Contract Type": "Production",
-                            "Workshop Hours / week": workshop_hours,
-                            "Prisoners Employed": num_prisoners,
-                            "Prisoner Salary / week": prisoner_salary,
-                            "Instructors Count": num_supervisors,
-                            "Customer Provides Instructors": "No",
-                            "Labour Output (%)": prisoner_output,
-                            "Employment Support": employment_support,
-                            "Contracts Overseen": contracts,
-                            "VAT Rate (%)": 20.0,
-                            "Additional Benefits": "Yes" if additional_benefits else "No",
-                            "Additional Benefits (desc)": additional_benefits_desc,
-                        }
-                        csv_bytes = export_csv_single_row(common, prod_breakdown_df, None)
-                        st.download_button(
-                            "Download CSV (Production – Breakdown)",
-                            data=csv_bytes,
-                            file_name="production_breakdown.csv",
-                            mime="text/csv"
-                        )
-                    with c2:
-                        # HTML shows both: breakdown (main) + unit table (secondary)
-                        st.download_button(
-                            "Download PDF-ready HTML (Production)",
-                            data=export_html(None, prod_breakdown_df, title="Production Quote", header_block=header_block, segregated_df=unit_df),
-                            file_name="production_quote.html",
-                            mime="text/html"
-                        )
+                            unit_price_ex_vat = None
+
+                    # Units required per month to cover prisoner wages
+                    if unit_price_ex_vat and unit_price_ex_vat > 0:
+                        units_required_cover_pris = prisoner_monthly_item / unit_price_ex_vat
+                    else:
+                        units_required_cover_pris = None
+
+                    unit_rows.append({
+                        "Item": name,
+                        "Unit cost (prisoner-only, £/unit per month)": unit_cost_prisoner_only,
+                        "Units required (per month) to cover prisoner wages": units_required_cover_pris,
+                    })
+
+                unit_df = pd.DataFrame(unit_rows, columns=[
+                    "Item",
+                    "Unit cost (prisoner-only, £/unit per month)",
+                    "Units required (per month) to cover prisoner wages"
+                ])
+                # Format numeric columns
+                def _fmt2(x):
+                    try:
+                        return "£" + format(float(x), ",.2f")
+                    except Exception:
+                        return "—" if x is None else x
+
+                def _fmt0(x):
+                    try:
+                        return format(float(x), ",.0f")
+                    except Exception:
+                        return "—" if x is None else x
+
+                if not unit_df.empty:
+                    unit_df_disp = unit_df.copy()
+                    unit_df_disp["Unit cost (prisoner-only, £/unit per month)"] = unit_df_disp["Unit cost (prisoner-only, £/unit per month)"].apply(_fmt2)
+                    unit_df_disp["Units required (per month) to cover prisoner wages"] = unit_df_disp["Units required (per month) to cover prisoner wages"].apply(_fmt0)
+
+                    st.markdown("### Prisoner-only Unit Cost & Coverage")
+                    st.markdown(render_table_html(unit_df_disp), unsafe_allow_html=True)
+
+                # === Downloads (Production) ===
+                tariff_version = results[0]["Tariff version"] if results else tariff.version
+                production_exports(results, prod_breakdown_df, unit_df, calc_sig, tariff_version)
 
     else:  # Ad-hoc
         num_lines = st.number_input("How many product lines are needed?", min_value=1, value=1, step=1, key="adhoc_num_lines")
@@ -505,78 +775,56 @@ if contract_type == "Production":
                     "pris_per_item": int(pris_per_item),
                     "mins_per_item": float(minutes_per_item),
                 })
+        if cal is not None:
+            _calibration_buttons(
+                cal, [{"name": ln["name"], "required": ln["pris_per_item"], "minutes": ln["mins_per_item"]} for ln in lines],
+                "adhoc", _use_calibrated_line_minutes, (cal, lines),
+            )
+
+        calc_kwargs = dict(
+            workshop_hours=float(workshop_hours),
+            num_prisoners=int(num_prisoners),
+            prisoner_salary=float(prisoner_salary),
+            supervisor_salaries=supervisor_salaries,
+            customer_covers_supervisors=False,  # For Production
+            region=region,
+            customer_type="Commercial",
+            apply_vat=True, vat_rate=20.0,
+            today=date.today(),
+            employment_support=employment_support,
+            contracts=int(contracts),
+        )
+        calc_sig = _inputs_signature(lines, prisoner_output, {**calc_kwargs, "tariff": tariff.version})
 
+        result = None
         if st.button("Generate Ad-hoc Costs", key="generate_adhoc"):
             errs = validate_inputs()
             if workshop_hours <= 0: errs.append("Hours per week must be > 0 for Ad-hoc")
-            for i, ln in enumerate(lines):
-                if ln["units"] <= 0: errs.append(f"Line {i+1}: Units requested must be > 0")
-                if ln["pris_per_item"] <= 0: errs.append(f"Line {i+1}: Prisoners to make one must be > 0")
-                if ln["mins_per_item"] < 0: errs.append(f"Line {i+1}: Minutes to make one cannot be negative")
+            errs += error_messages(validate_table(pd.DataFrame(lines), ADHOC_LINE_SCHEMA), label="Line")
             if errs:
                 st.error("Fix errors:\n- " + "\n- ".join(errs))
-            else:
-                result = calculate_adhoc(
-                    lines, int(prisoner_output),
-                    workshop_hours=float(workshop_hours),
-                    num_prisoners=int(num_prisoners),
-                    prisoner_salary=float(prisoner_salary),
-                    supervisor_salaries=supervisor_salaries,
-                    customer_covers_supervisors=False,  # For Production
-                    region=region,
-                    customer_type="Commercial",
-                    apply_vat=True, vat_rate=20.0,
-                    today=date.today(),
-                    employment_support=employment_support,
-                    contracts=int(contracts),
+            elif len(lines) >= CFG.BACKGROUND_JOB_MIN_ROWS:
+                job_id = _jobs().submit(
+                    cached_adhoc_arrays, lines, int(prisoner_output),
+                    label=f"Ad-hoc quote ({len(lines):,} lines)", tariff=tariff, **calc_kwargs,
                 )
-                if result["feasibility"]["hard_block"]:
-                    st.error(result["feasibility"]["reason"])
-                else:
-                    per_line = result.get("per_line", [])
-                    df_rows = []
-                    for p in per_line:
-                        df_rows.append({
-                            "Item": p.get("name", "—"),
-                            "Units": p.get("units", 0),
-                            "Unit Cost (ex VAT £)": round(p.get("unit_cost_ex_vat", 0.0), 2),
-                            "Unit Cost (inc VAT £)": round(p.get("unit_cost_inc_vat", 0.0), 2),
-                            "Line Total (ex VAT £)": round(p.get("line_total_ex_vat", 0.0), 2),
-                            "Line Total (inc VAT £)": round(p.get("line_total_inc_vat", 0.0), 2),
-                        })
-                    df = pd.DataFrame(df_rows, columns=[
-                        "Item", "Units", "Unit Cost (ex VAT £)", "Unit Cost (inc VAT £)",
-                        "Line Total (ex VAT £)", "Line Total (inc VAT £)"
-                    ])
-                    st.markdown(render_table_html(df), unsafe_allow_html=True)
-
-                    # Download
-                    header_block = build_header_block(
-                        uk_date=_uk_date(date.today()),
-                        customer_name=customer_name,
-                        prison_name=prison_choice,
-                        region=region
-                    )
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        common = {
-                            "Quote Type": "Production (Ad-hoc)",
-                            "Date": _uk_date(date.today()),
-                            "Prison Name": prison_choice,
-                            "Region": region,
-                            "Customer Name": customer_name,
-                            "Workshop Hours / week": workshop_hours,
-                            "Prisoners Employed": num_prisoners,
-                            "Prisoner Salary / week": prisoner_salary,
-                            "Labour Output (%)": prisoner_output,
-                            "VAT Rate (%)": 20.0,
-                        }
-                        csv_bytes = export_csv_single_row(common, df, None)
-                        st.download_button("Download CSV (Ad-hoc)", data=csv_bytes, file_name="adhoc_quote.csv", mime="text/csv")
-                    with c2:
-                        st.download_button(
-                            "Download PDF-ready HTML (Ad-hoc)",
-                            data=export_html(None, df, title="Ad-hoc Quote", header_block=header_block, segregated_df=None),
-                            file_name="adhoc_quote.html",
-                            mime="text/html"
-                        )
\ No newline at end of file
+                st.session_state["adhoc_job"] = (job_id, calc_sig)
+            else:
+                st.session_state.pop("adhoc_job", None)
+                result = cached_adhoc_arrays(lines, int(prisoner_output), tariff=tariff, **calc_kwargs)
+        if result is None:
+            result = _background_result("adhoc_job", calc_sig)
+
+        if result is not None:
+            if result["feasibility"]["hard_block"]:
+                st.error(result["feasibility"]["reason"])
+            else:
+                df = adhoc_display_table(result["lines"])
+                st.markdown(render_table_html(df), unsafe_allow_html=True)
+
+                # Download
+                adhoc_exports(df, calc_sig, result["tariff_version"])
+
+
+if contract_type == "Production":
+    production_panel()
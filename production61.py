@@ -1,14 +1,12 @@
 # production61.py
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from datetime import date, timedelta
 import math
 
-# Band 3 shadow costs (annual)
-BAND3_COSTS = {
-    "Outer London": 45855.97,
-    "Inner London": 49202.70,
-    "National": 42247.81,
-}
+from rules61 import (
+    ADDL_BENEFIT_RATE, DEV_RATE_BASE, FULL_TIME_HOURS, OVERHEAD_RATE, dev_rate_production,
+)
+from tariff61 import BAND3_COSTS, Tariff, current_tariff  # noqa: F401  (BAND3_COSTS kept for existing importers)
 
 
 def labour_minutes_budget(num_pris: int, hours: float) -> float:
@@ -27,22 +25,81 @@ def _working_days_between(start: date, end: date) -> int:
 
 
 def _dev_rate_from_support(employment_support: str) -> float:
-    """
-    Dev charge baseline is 20%.
-    - If employment_support == "Both" -> 0%
-    - If either of the two options ("Employment on release/RoTL" or "Post release") -> 10%
-    - Else (None/other) -> 20%
-    """
-    s = (employment_support or "").lower()
-    if "both" in s:
-        return 0.0
-    if "employment on release/rotl" in s or "post release" in s:
-        return 0.10
-    return 0.20
+    """Production dev charge rate (rules61.dev_rate_production); kept for existing callers."""
+    return dev_rate_production(employment_support)
+
+
+# -------------------------------
+# Bulk item table (grid / CSV import)
+# -------------------------------
+ITEM_TABLE_COLUMNS = ["Item", "Prisoners required", "Time per item", "Prisoners assigned", "Target units/week"]
+
+# Accepted CSV header aliases (lower-case) -> grid column
+_ITEM_TABLE_ALIASES = {
+    "item": "Item", "name": "Item", "item name": "Item",
+    "prisoners required": "Prisoners required", "required": "Prisoners required",
+    "time per item": "Time per item", "minutes": "Time per item", "minutes per item": "Time per item",
+    "prisoners assigned": "Prisoners assigned", "assigned": "Prisoners assigned",
+    "target units/week": "Target units/week", "target": "Target units/week", "targets": "Target units/week",
+}
 
 
-def calculate_production_contractual(
-    items: List[Dict],
+def normalise_item_table(df):
+    """Rename known CSV headers to the grid columns and add any missing ones (defaults as per the old form)."""
+    import pandas as pd
+    df = pd.DataFrame(df).rename(columns=lambda c: _ITEM_TABLE_ALIASES.get(str(c).strip().lower(), c))
+    defaults = {"Item": "", "Prisoners required": 1, "Time per item": 10.0, "Prisoners assigned": 0, "Target units/week": None}
+    for col in ITEM_TABLE_COLUMNS:
+        if col not in df.columns:
+            df[col] = defaults[col]
+    return df[ITEM_TABLE_COLUMNS].reset_index(drop=True)
+
+
+def items_from_table(df, *, num_prisoners: int, time_unit: str = "Minutes"):
+    """
+    Validate a grid of items column by column and convert it to calculator inputs.
+    Returns (items, targets, errors); errors name the offending rows (1-based).
+    A blank target is returned as None so the caller can default it (e.g. to capacity).
+    """
+    import pandas as pd
+    df = normalise_item_table(df)
+    df = df[~(df.isna() | (df.astype(str).apply(lambda s: s.str.strip()) == "")).all(axis=1)]
+    errors: List[str] = []
+
+    def _rows(mask) -> str:
+        return ", ".join(str(i + 1) for i in df.index[mask][:10]) + (" …" if int(mask.sum()) > 10 else "")
+
+    def _num(col, *, integer: bool, minimum: float, optional: bool = False):
+        s = pd.to_numeric(df[col], errors="coerce")
+        bad = s.notna() & (s < minimum)
+        if integer:
+            bad |= s.notna() & (s != s.round())
+        if not optional:
+            bad |= s.isna()
+        if bad.any():
+            kind = "a whole number" if integer else "a number"
+            errors.append(f"{col} must be {kind} ≥ {minimum:g} (rows {_rows(bad)})")
+        return s if optional else s.fillna(minimum)
+
+    required = _num("Prisoners required", integer=True, minimum=1)
+    time_val = _num("Time per item", integer=False, minimum=0)
+    assigned = _num("Prisoners assigned", integer=True, minimum=0)
+    target = _num("Target units/week", integer=True, minimum=0, optional=True)
+
+    if int(assigned.sum()) > int(num_prisoners):
+        errors.append(f"Prisoners assigned ({int(assigned.sum())}) exceed prisoners employed ({int(num_prisoners)})")
+
+    minutes = time_val / 60.0 if time_unit == "Seconds" else time_val
+    names = df["Item"].fillna("").astype(str).str.strip()
+    items = [
+        {"name": n, "required": int(r), "minutes": float(m), "assigned": int(a)}
+        for n, r, m, a in zip(names, required, minutes, assigned)
+    ]
+    return items, [None if pd.isna(t) else int(t) for t in target], errors
+
+
+def iter_production_contractual(
+    items,
     output_pct: int,
     *,
     workshop_hours: float,
@@ -60,8 +117,23 @@ def calculate_production_contractual(
     employment_support: str = "None",
     contracts: int = 1,
     additional_benefits: bool = False,        # NEW: to enable the 10% instructor-cost discount when ES="Both"
-) -> List[Dict]:
+    timeline=None,                            # optional timeline61.WorkshopTimeline (closures/leave scale capacity)
+    total_assigned: Optional[int] = None,     # precomputed sum of "assigned" (lets a one-shot iterator stream)
+    pool_share: Optional[float] = None,       # share of the workshop's instructor/overhead pools (replaces 1/contracts)
+    tariff: Optional[Tariff] = None,          # tariff snapshot to price against (default: current_tariff())
+) -> Iterator[Dict]:
     """
+    Streaming form of calculate_production_contractual: yields one result row per item as it is computed.
+
+    Items are apportioned by their share of total assigned minutes, so the total is needed before the
+    first row. `items` may be:
+      - a list (summed up front),
+      - a callable returning a fresh iterable (two passes: sum, then price), or
+      - any iterable together with total_assigned=... (single pass, constant memory; agrees with the
+        list form to float rounding, since the minutes are summed as one product rather than per item).
+    In target mode each item's target comes from `targets[idx]`, or from the item's own "target"
+    key when `targets` is None.
+
     Contractual mode with full breakdown.
 
     Breakdown rules (per your spec):
@@ -79,10 +151,19 @@ def calculate_production_contractual(
 
     NOTE: This function returns per-item rows. The breakdown values are repeated per-item using the item's
     share of total assigned minutes to apportion weekly instructor/overhead/dev pools.
+
+    If a timeline is given, weekly capacity is scaled by its availability ratio over the horizon
+    (actual / nominal minutes after closures, reduced regime days and leave).
     """
+    # One tariff snapshot for the whole quote (recorded on every row)
+    tariff = tariff or current_tariff()
+
     # Hours/contract fraction
-    hours_frac = (float(workshop_hours) / 37.5) if workshop_hours > 0 else 0.0
+    hours_frac = (float(workshop_hours) / FULL_TIME_HOURS) if workshop_hours > 0 else 0.0
     contracts_safe = max(1, int(contracts))
+    if pool_share is not None:
+        # joint workshop pricing (workshop61): the contract carries this share of the pools
+        hours_frac, contracts_safe = hours_frac * float(pool_share), 1
 
     # Instructor weekly total (if customer provides instructors, this is 0; shadow is used for overhead base)
     if not customer_covers_supervisors:
@@ -92,17 +173,17 @@ def calculate_production_contractual(
 
     # Overhead base (shadow if customer provides; otherwise actual instructor cost)
     if customer_covers_supervisors:
-        shadow = BAND3_COSTS.get(region, 42247.81)
+        shadow = tariff.band3_shadow(region)
         overhead_base_weekly = (shadow / 52.0) * hours_frac / contracts_safe
     else:
         overhead_base_weekly = inst_weekly_total
 
-    overheads_weekly_total = overhead_base_weekly * 0.61
+    overheads_weekly_total = overhead_base_weekly * OVERHEAD_RATE
 
     # Development charge — derived from employment support
     # NEW: development runs against (instructor + overheads)
     dev_rate_eff = _dev_rate_from_support(employment_support)
-    dev_weekly_total_at_20 = (inst_weekly_total + overheads_weekly_total) * 0.20
+    dev_weekly_total_at_20 = (inst_weekly_total + overheads_weekly_total) * DEV_RATE_BASE
     dev_weekly_total_actual = (inst_weekly_total + overheads_weekly_total) * dev_rate_eff
     dev_weekly_discount = max(0.0, dev_weekly_total_at_20 - dev_weekly_total_actual)
 
@@ -110,12 +191,21 @@ def calculate_production_contractual(
     # NEW rule for Production: 10% of instructor cost
     addl_benefit_weekly = 0.0
     if (employment_support == "Both") and additional_benefits:
-        addl_benefit_weekly = inst_weekly_total * 0.10
-
-    denom_minutes = sum(int(it.get("assigned", 0)) * workshop_hours * 60.0 for it in items)
+        addl_benefit_weekly = inst_weekly_total * ADDL_BENEFIT_RATE
+
+    if total_assigned is not None:
+        denom_minutes = int(total_assigned) * workshop_hours * 60.0
+    elif callable(items):
+        denom_minutes = sum(int(it.get("assigned", 0)) * workshop_hours * 60.0 for it in items())
+        items = items()
+    elif isinstance(items, (list, tuple)):
+        denom_minutes = sum(int(it.get("assigned", 0)) * workshop_hours * 60.0 for it in items)
+    else:
+        raise TypeError("pass a list, a callable returning the items, or total_assigned= for a one-shot iterable")
     output_scale = float(output_pct) / 100.0
+    if timeline is not None:
+        output_scale *= timeline.availability_ratio()
 
-    results: List[Dict] = []
     for idx, it in enumerate(items):
         name = (it.get("name") or "").strip() or f"Item {idx+1}"
         mins_per_unit = float(it.get("minutes", 0))
@@ -146,18 +236,17 @@ def calculate_production_contractual(
         # Units to price
         if pricing_mode == "target":
             tgt = 0
-            if targets and idx < len(targets):
-                try:
-                    tgt = int(targets[idx])
-                except Exception:
-                    tgt = 0
+            raw_tgt = it.get("target", 0) if targets is None else (targets[idx] if idx < len(targets) else 0)
+            try:
+                tgt = int(raw_tgt)
+            except Exception:
+                tgt = 0
             units_for_pricing = float(tgt)
         else:
             units_for_pricing = capacity_units
 
         # Feasibility check (target mode)
-        output_scale_local = float(output_pct) / 100.0
-        available_minutes_item = pris_assigned * workshop_hours * 60.0 * output_scale_local
+        available_minutes_item = pris_assigned * workshop_hours * 60.0 * output_scale
         required_minutes_item = units_for_pricing * mins_per_unit * pris_required
         feasible = (required_minutes_item <= (available_minutes_item + 1e-6))
         note = None
@@ -227,7 +316,7 @@ def calculate_production_contractual(
             monthly_units_to_cover = None
 
         # Output row
-        results.append({
+        yield {
             "Item": name,
             "Output %": int(output_pct),
             "Capacity (units/week)": 0 if capacity_units <= 0 else int(round(capacity_units)),
@@ -264,17 +353,16 @@ def calculate_production_contractual(
             # Target feasibility
             "Feasible": feasible if pricing_mode == "target" else None,
             "Note": note,
-        })
 
-    return results
+            "Tariff version": tariff.version,
+        }
 
 
-def calculate_adhoc(
-    lines: List[Dict],
+def calculate_production_contractual(
+    items: List[Dict],
     output_pct: int,
     *,
     workshop_hours: float,
-    num_prisoners: int,
     prisoner_salary: float,
     supervisor_salaries: List[float],
     customer_covers_supervisors: bool,
@@ -282,13 +370,60 @@ def calculate_adhoc(
     customer_type: str,
     apply_vat: bool,
     vat_rate: float,
-    today: date,
+    num_prisoners: int,
+    num_supervisors: int,
+    pricing_mode: str = "as-is",              # "as-is" | "target"
+    targets: Optional[List[int]] = None,
     employment_support: str = "None",
     contracts: int = 1,
-) -> Dict:
+    additional_benefits: bool = False,        # NEW: to enable the 10% instructor-cost discount when ES="Both"
+    timeline=None,                            # optional timeline61.WorkshopTimeline (closures/leave scale capacity)
+    pool_share: Optional[float] = None,       # share of the workshop's instructor/overhead pools (replaces 1/contracts)
+    tariff: Optional[Tariff] = None,          # tariff snapshot to price against (default: current_tariff())
+    progress: Optional[Callable[[int, int], None]] = None,   # progress(done, total) after each item (jobs61)
+) -> List[Dict]:
     """
-    Ad-hoc flow (UNCHANGED).
+    Contractual mode with full breakdown (see iter_production_contractual for the rules).
+    Returns per-item rows as a list. `items` may also be a callable or an iterable; the rows are
+    returned as a list anyway, so it is materialised once up front.
     """
+    if callable(items):
+        items = items()
+    if not isinstance(items, (list, tuple)):
+        items = list(items)
+    rows = iter_production_contractual(
+        items, output_pct,
+        workshop_hours=workshop_hours, prisoner_salary=prisoner_salary, supervisor_salaries=supervisor_salaries,
+        customer_covers_supervisors=customer_covers_supervisors, region=region, customer_type=customer_type,
+        apply_vat=apply_vat, vat_rate=vat_rate, num_prisoners=num_prisoners, num_supervisors=num_supervisors,
+        pricing_mode=pricing_mode, targets=targets, employment_support=employment_support, contracts=contracts,
+        additional_benefits=additional_benefits, timeline=timeline, pool_share=pool_share, tariff=tariff,
+    )
+    if progress is None:
+        return list(rows)
+    out: List[Dict] = []
+    total = len(items)
+    for row in rows:
+        out.append(row)
+        progress(len(out), total)
+    return out
+
+
+def _adhoc_rates(
+    output_pct: int,
+    *,
+    workshop_hours: float,
+    num_prisoners: int,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    customer_covers_supervisors: bool,
+    region: str,
+    employment_support: str = "None",
+    contracts: int = 1,
+    tariff: Optional[Tariff] = None,
+) -> Dict:
+    """Job-wide ad-hoc figures (cost per labour minute, daily / weekly capacity); no line depends on another."""
+    tariff = tariff or current_tariff()
     output_scale = float(output_pct) / 100.0
     hours_per_day = float(workshop_hours) / 5.0
     daily_minutes_capacity_per_prisoner = hours_per_day * 60.0 * output_scale
@@ -296,7 +431,7 @@ def calculate_adhoc(
     minutes_per_week_capacity = max(1e-9, num_prisoners * workshop_hours * 60.0 * output_scale)
 
     # Hours/contract fraction
-    hours_frac = (float(workshop_hours) / 37.5) if workshop_hours > 0 else 0.0
+    hours_frac = (float(workshop_hours) / FULL_TIME_HOURS) if workshop_hours > 0 else 0.0
     contracts_safe = max(1, int(contracts))
 
     # Instructor weekly total
@@ -307,20 +442,93 @@ def calculate_adhoc(
 
     # Overheads base
     if customer_covers_supervisors:
-        shadow = BAND3_COSTS.get(region, 42247.81)
+        shadow = tariff.band3_shadow(region)
         overhead_base = (shadow / 52.0) * hours_frac / contracts_safe
     else:
         overhead_base = inst_weekly_total
 
-    overheads_weekly = overhead_base * 0.61
+    overheads_weekly = overhead_base * OVERHEAD_RATE
     dev_rate_eff = _dev_rate_from_support(employment_support)
     dev_weekly_total = (inst_weekly_total + overheads_weekly) * dev_rate_eff  # <- use (inst+oh) here too
 
     prisoners_weekly_cost = num_prisoners * prisoner_salary
     weekly_cost_total = prisoners_weekly_cost + inst_weekly_total + overheads_weekly + dev_weekly_total
-    cost_per_minute = weekly_cost_total / minutes_per_week_capacity
+    return {
+        "tariff_version": tariff.version,
+        "cost_per_minute": weekly_cost_total / minutes_per_week_capacity,
+        "current_daily_capacity": current_daily_capacity,
+        "minutes_per_week_capacity": minutes_per_week_capacity,
+    }
+
+
+def _adhoc_summary(
+    rates: Dict, totals_ex: float, totals_inc: float, total_job_minutes: float,
+    earliest_wd_available: int, earliest_deadline: Optional[date], *, today: date, timeline=None,
+) -> Dict:
+    """Totals / capacity / feasibility keys of calculate_adhoc, from the job's aggregates."""
+    current_daily_capacity = rates["current_daily_capacity"]
+    if timeline is not None:
+        done_by = timeline.first_date_with(total_job_minutes, today)
+        wd_needed_all = timeline.working_days_between(today, done_by) if done_by else float("inf")
+        available_total_minutes_by_deadline = (
+            timeline.minutes_between(today, earliest_deadline) if earliest_deadline is not None else 0.0
+        )
+    else:
+        wd_needed_all = math.ceil(total_job_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
+        available_total_minutes_by_deadline = current_daily_capacity * earliest_wd_available
+    hard_block = total_job_minutes > available_total_minutes_by_deadline
+    reason = None
+    if hard_block:
+        reason = (
+            f"Requested total minutes ({total_job_minutes:,.0f}) exceed available minutes by the earliest deadline "
+            f"({available_total_minutes_by_deadline:,.0f}). Reduce units, add prisoners, increase hours, extend deadline or lower Output%."
+        )
+    return {
+        "totals": {"ex_vat": totals_ex, "inc_vat": totals_inc},
+        "capacity": {"current_daily_capacity": current_daily_capacity, "minutes_per_week_capacity": rates["minutes_per_week_capacity"]},
+        "feasibility": {"earliest_wd_available": earliest_wd_available, "wd_needed_all": wd_needed_all, "hard_block": hard_block, "reason": reason},
+        "tariff_version": rates["tariff_version"],
+    }
+
 
-    per_line, total_job_minutes, earliest_wd_available = [], 0.0, None
+def iter_adhoc(
+    lines: Iterable[Dict],
+    output_pct: int,
+    *,
+    workshop_hours: float,
+    num_prisoners: int,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    customer_covers_supervisors: bool,
+    region: str,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    today: date,
+    employment_support: str = "None",
+    contracts: int = 1,
+    timeline=None,
+    summary: Optional[Dict] = None,
+    tariff: Optional[Tariff] = None,
+) -> Iterator[Dict]:
+    """
+    Streaming form of calculate_adhoc: yields one per-line dict per input line, in a single pass
+    over any iterable (constant memory). Line pricing does not depend on the other lines; totals
+    and the earliest deadline are kept as running aggregates. Once the generator is exhausted,
+    `summary` (if given) is filled with the same totals/capacity/feasibility keys calculate_adhoc returns.
+    """
+    rates = _adhoc_rates(
+        output_pct, workshop_hours=workshop_hours, num_prisoners=num_prisoners, prisoner_salary=prisoner_salary,
+        supervisor_salaries=supervisor_salaries, customer_covers_supervisors=customer_covers_supervisors,
+        region=region, employment_support=employment_support, contracts=contracts, tariff=tariff,
+    )
+    cost_per_minute = rates["cost_per_minute"]
+    current_daily_capacity = rates["current_daily_capacity"]
+    if timeline is not None:
+        timeline = timeline.at_capacity(num_prisoners=num_prisoners, workshop_hours=workshop_hours, output_pct=output_pct)
+
+    total_job_minutes, earliest_wd_available, earliest_deadline = 0.0, None, None
+    totals_ex, totals_inc = 0.0, 0.0
     for ln in lines:
         mins_per_unit = float(ln["mins_per_item"]) * int(ln["pris_per_item"])  # already in minutes
         unit_cost_ex_vat = cost_per_minute * mins_per_unit
@@ -331,12 +539,19 @@ def calculate_adhoc(
 
         total_line_minutes = int(ln["units"]) * mins_per_unit
         total_job_minutes += total_line_minutes
-        wd_available = _working_days_between(today, ln["deadline"])
+        if timeline is not None:
+            wd_available = timeline.working_days_between(today, ln["deadline"])
+            done_by = timeline.first_date_with(total_line_minutes, today)
+            wd_needed_line_alone = timeline.working_days_between(today, done_by) if done_by else float("inf")
+        else:
+            wd_available = _working_days_between(today, ln["deadline"])
+            wd_needed_line_alone = math.ceil(total_line_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
         if earliest_wd_available is None or wd_available < earliest_wd_available:
             earliest_wd_available = wd_available
-        wd_needed_line_alone = math.ceil(total_line_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
+        if earliest_deadline is None or ln["deadline"] < earliest_deadline:
+            earliest_deadline = ln["deadline"]
 
-        per_line.append({
+        row = {
             "name": ln["name"],
             "units": int(ln["units"]),
             "unit_cost_ex_vat": unit_cost_ex_vat,
@@ -345,46 +560,62 @@ def calculate_adhoc(
             "line_total_inc_vat": unit_cost_inc_vat * int(ln["units"]),
             "wd_available": wd_available,
             "wd_needed_line_alone": wd_needed_line_alone,
-        })
+        }
+        totals_ex += row["line_total_ex_vat"]
+        totals_inc += row["line_total_inc_vat"]
+        yield row
 
-    wd_needed_all = math.ceil(total_job_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
-    earliest_wd_available = earliest_wd_available or 0
-    available_total_minutes_by_deadline = current_daily_capacity * earliest_wd_available
-    hard_block = total_job_minutes > available_total_minutes_by_deadline
-    reason = None
-    if hard_block:
-        reason = (
-            f"Requested total minutes ({total_job_minutes:,.0f}) exceed available minutes by the earliest deadline "
-            f"({available_total_minutes_by_deadline:,.0f}). Reduce units, add prisoners, increase hours, extend deadline or lower Output%."
-        )
+    if summary is None:
+        return
+    summary.update(_adhoc_summary(
+        rates, totals_ex, totals_inc, total_job_minutes, earliest_wd_available or 0, earliest_deadline,
+        today=today, timeline=timeline,
+    ))
 
-    totals_ex = sum(p["line_total_ex_vat"] for p in per_line)
-    totals_inc = sum(p["line_total_inc_vat"] for p in per_line)
 
-    return {
-        "per_line": per_line,
-        "totals": {"ex_vat": totals_ex, "inc_vat": totals_inc},
-        "capacity": {"current_daily_capacity": current_daily_capacity, "minutes_per_week_capacity": minutes_per_week_capacity},
-        "feasibility": {"earliest_wd_available": earliest_wd_available, "wd_needed_all": wd_needed_all, "hard_block": hard_block, "reason": reason},
-    }
+def calculate_adhoc(
+    lines: List[Dict],
+    output_pct: int,
+    *,
+    workshop_hours: float,
+    num_prisoners: int,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    customer_covers_supervisors: bool,
+    region: str,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    today: date,
+    employment_support: str = "None",
+    contracts: int = 1,
+    timeline=None,                            # optional timeline61.WorkshopTimeline (day factors for deadlines)
+    tariff: Optional[Tariff] = None,          # tariff snapshot to price against (default: current_tariff())
+) -> Dict:
+    """
+    Ad-hoc flow (UNCHANGED).
+
+    If a timeline61.WorkshopTimeline is given, deadlines are checked against its day-by-day
+    factors (closures, reduced regime, leave) applied to this job's own daily capacity,
+    instead of a flat daily figure.
+    """
+    summary: Dict = {}
+    per_line = list(iter_adhoc(
+        lines, output_pct,
+        workshop_hours=workshop_hours, num_prisoners=num_prisoners, prisoner_salary=prisoner_salary,
+        supervisor_salaries=supervisor_salaries, customer_covers_supervisors=customer_covers_supervisors,
+        region=region, customer_type=customer_type, apply_vat=apply_vat, vat_rate=vat_rate, today=today,
+        employment_support=employment_support, contracts=contracts, timeline=timeline, summary=summary, tariff=tariff,
+    ))
+    return {"per_line": per_line, **summary}
 
 
 def build_adhoc_table(result: Dict):
-    """Helper to produce the flat table used by newapp for Ad-hoc (UNCHANGED)."""
-    rows = []
-    for p in result.get("per_line", []):
-        rows.append({
-            "Item": p.get("name", "—"),
-            "Units": p.get("units", 0),
-            "Unit Cost (ex VAT £)": round(p.get("unit_cost_ex_vat", 0.0), 2),
-            "Unit Cost (inc VAT £)": round(p.get("unit_cost_inc_vat", 0.0), 2),
-            "Line Total (ex VAT £)": round(p.get("line_total_ex_vat", 0.0), 2),
-            "Line Total (inc VAT £)": round(p.get("line_total_inc_vat", 0.0), 2),
-        })
+    """Helper to produce the flat table used by newapp for Ad-hoc (calculate_adhoc or calculate_adhoc_arrays result)."""
     import pandas as pd
-    df = pd.DataFrame(rows, columns=[
-        "Item", "Units", "Unit Cost (ex VAT £)", "Unit Cost (inc VAT £)",
-        "Line Total (ex VAT £)", "Line Total (inc VAT £)"
-    ])
+    from adhocvec61 import ADHOC_LINE_COLUMNS, adhoc_display_table
+    frame = result.get("lines")
+    if frame is None:
+        frame = pd.DataFrame(result.get("per_line", []), columns=ADHOC_LINE_COLUMNS)
     totals = result.get("totals", {})
-    return df, totals
\ No newline at end of file
+    return adhoc_display_table(frame), totals
@@ -0,0 +1,139 @@
+# projection61.py
+# Multi-year contract projection with pay-award indexation.
+#
+# Works on numeric arrays (quotes x months) instead of re-scaling formatted tables:
+#   components = contract_components([...host-style inputs...])      # one tariff snapshot per batch
+#   proj = project_contracts(components, months=36, schedule=IndexationSchedule(supervisor_pay=[0.05, 0.03]))
+#   proj["yearly"]      -> per-quote, per-contract-year totals (ex / inc VAT)
+#   proj["cumulative"]  -> quotes x months cumulative ex-VAT cost
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from rules61 import ADDL_BENEFIT_RATE, FULL_TIME_HOURS, MONTHLY, OVERHEAD_RATE, dev_rate_host
+from tariff61 import Tariff, current_tariff
+
+COMPONENT_COLUMNS = ["prisoner_monthly", "instructor_monthly", "shadow_monthly", "dev_rate", "addl_rate", "tariff_version"]
+
+
+@dataclass(frozen=True)
+class IndexationSchedule:
+    """
+    Annual uplifts (fractions, e.g. 0.03 = 3%) applied at each pay award.
+    Entry k applies from award k+1 onwards; awards beyond the list repeat the last entry
+    (an empty list means no indexation).
+    """
+    supervisor_pay: Sequence[float] = field(default_factory=list)
+    band3: Sequence[float] = field(default_factory=list)
+    prisoner_pay: Sequence[float] = field(default_factory=list)
+    first_award_month: int = 12     # months from contract start to the first award
+    award_interval: int = 12        # months between awards
+
+
+def _uplift_factors(uplifts: Sequence[float], months: int, first: int, interval: int) -> np.ndarray:
+    """Cumulative multiplier for each month of the term (length `months`)."""
+    m = np.arange(months)
+    n_awards = np.where(m >= first, (m - first) // max(1, interval) + 1, 0)
+    if not uplifts:
+        return np.ones(months)
+    max_awards = int(n_awards.max()) if months else 0
+    steps = np.array([uplifts[min(k, len(uplifts) - 1)] for k in range(max_awards)], dtype=float)
+    cum = np.concatenate([[1.0], np.cumprod(1.0 + steps)])
+    return cum[n_awards]
+
+
+def contract_components(contracts: List[Dict], *, tariff: Optional[Tariff] = None) -> pd.DataFrame:
+    """
+    Month-one cost components for each contract, from host-style inputs:
+      workshop_hours, num_prisoners, prisoner_salary, supervisor_salaries, customer_covers_supervisors,
+      region, contracts, employment_support, additional_benefits
+    Columns: COMPONENT_COLUMNS (shadow_monthly is the Band 3 overhead base when the customer
+    provides instructors). The whole batch uses one tariff snapshot (default: current_tariff()).
+    """
+    tariff = tariff or current_tariff()
+    rows = []
+    for c in contracts:
+        hours = float(c.get("workshop_hours", 0.0))
+        hours_frac = (hours / FULL_TIME_HOURS) if hours > 0 else 0.0
+        contracts_safe = max(1, int(c.get("contracts", 1)))
+        covers = bool(c.get("customer_covers_supervisors", False))
+        es = c.get("employment_support", "None")
+        instructor = 0.0 if covers else sum(
+            (float(s) / 12.0) * hours_frac / contracts_safe for s in c.get("supervisor_salaries", [])
+        )
+        shadow = 0.0
+        if covers:
+            shadow = (tariff.band3_shadow(c.get("region")) / 12.0) * hours_frac / contracts_safe
+        rows.append({
+            "prisoner_monthly": float(c.get("num_prisoners", 0)) * float(c.get("prisoner_salary", 0.0)) * MONTHLY,
+            "instructor_monthly": instructor,
+            "shadow_monthly": shadow,
+            "dev_rate": dev_rate_host(es),
+            "addl_rate": ADDL_BENEFIT_RATE if (es == "Both" and c.get("additional_benefits")) else 0.0,
+            "tariff_version": tariff.version,
+        })
+    return pd.DataFrame(rows, columns=COMPONENT_COLUMNS)
+
+
+def project_contracts(
+    components: pd.DataFrame,
+    *,
+    months: int,
+    schedule: IndexationSchedule = IndexationSchedule(),
+    vat_rate: float = 20.0,
+) -> Dict:
+    """
+    Project every contract month by month over `months`.
+    Returns arrays shaped (n_contracts, months) plus yearly/cumulative summaries, and the
+    tariff_version the components were priced with (raises ValueError if they mix versions).
+    """
+    versions = components["tariff_version"].dropna().unique() if "tariff_version" in components else []
+    if len(versions) > 1:
+        raise ValueError(f"components priced under different tariffs: {', '.join(sorted(map(str, versions)))}")
+    months = int(months)
+    sup_f = _uplift_factors(schedule.supervisor_pay, months, schedule.first_award_month, schedule.award_interval)
+    b3_f = _uplift_factors(schedule.band3, months, schedule.first_award_month, schedule.award_interval)
+    pris_f = _uplift_factors(schedule.prisoner_pay, months, schedule.first_award_month, schedule.award_interval)
+
+    col = lambda name: components[name].to_numpy(dtype=float)[:, None]
+    prisoner = col("prisoner_monthly") * pris_f
+    instructor = col("instructor_monthly") * sup_f
+    overheads = (instructor + col("shadow_monthly") * b3_f) * OVERHEAD_RATE
+    base_for_dev = instructor + overheads
+    dev = base_for_dev * col("dev_rate")
+    addl = base_for_dev * col("addl_rate")
+
+    cost_ex_vat = prisoner + instructor + overheads + dev - addl
+    price_inc_vat = cost_ex_vat * (1.0 + float(vat_rate) / 100.0)
+
+    year_idx = np.arange(months) // 12
+    n_years = int(year_idx[-1]) + 1 if months else 0
+    yearly_ex = np.zeros((len(components), n_years))
+    np.add.at(yearly_ex.T, year_idx, cost_ex_vat.T)
+    yearly_inc = yearly_ex * (1.0 + float(vat_rate) / 100.0)
+
+    yearly = pd.DataFrame({
+        "contract": np.repeat(np.arange(len(components)), n_years),
+        "year": np.tile(np.arange(1, n_years + 1), len(components)),
+        "total_ex_vat": yearly_ex.ravel(),
+        "total_inc_vat": yearly_inc.ravel(),
+    })
+    yearly["cumulative_ex_vat"] = yearly.groupby("contract")["total_ex_vat"].cumsum()
+    yearly["cumulative_inc_vat"] = yearly.groupby("contract")["total_inc_vat"].cumsum()
+
+    return {
+        "tariff_version": versions[0] if len(versions) else None,
+        "prisoner": prisoner,
+        "instructor": instructor,
+        "overheads": overheads,
+        "development": dev,
+        "additional_benefit": addl,
+        "monthly_ex_vat": cost_ex_vat,
+        "monthly_inc_vat": price_inc_vat,
+        "cumulative": np.cumsum(cost_ex_vat, axis=1),
+        "yearly": yearly,
+        "term_total_ex_vat": cost_ex_vat.sum(axis=1),
+        "term_total_inc_vat": price_inc_vat.sum(axis=1),
+    }
@@ -0,0 +1,144 @@
+# quotediff61.py
+# Diff two versions of a book of quotes (e.g. before / after a tariff change).
+#
+# Both sides are long-format quote lines (utils61.QUOTE_LINE_COLUMNS: the Parquet export,
+# an Arrow table, or a DataFrame). Lines are aligned by (quote, section, item, field) with one
+# hash join, and only lines whose value moved by more than the tolerance are returned:
+#   changes = diff_quote_lines("book_2024.parquet", "book_2025.parquet", abs_tol=0.01)
+#   per_quote = summarise_changes(changes)
+#
+# Quotes are matched by header fields (DEFAULT_ALIGN_ON: customer, prison and quote type), since
+# quote ids hash the whole header -- tariff version and date included -- and so change whenever a
+# quote is re-priced. align_on=None matches by quote_id. A side on which two quotes share an
+# alignment key is an error: name more header fields in align_on to tell them apart.
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils61 import QUOTE_LINE_COLUMNS
+
+CHANGE_COLUMNS = [
+    "quote", "section", "item", "field", "occurrence",
+    "old", "new", "delta", "rel_delta", "old_text", "new_text", "status",
+]
+_KEY = ["quote", "section", "item", "field", "occurrence"]
+DEFAULT_ALIGN_ON = ("Customer Name", "Prison Name", "Quote Type")
+
+
+def load_quote_lines(source) -> pd.DataFrame:
+    """Quote lines from a Parquet path, an Arrow table or a DataFrame."""
+    if isinstance(source, pd.DataFrame):
+        df = source
+    elif isinstance(source, str):
+        import pyarrow.parquet as pq
+        df = pq.read_table(source, columns=QUOTE_LINE_COLUMNS).to_pandas()
+    else:
+        df = source.to_pandas()
+    missing = [c for c in QUOTE_LINE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"quote lines are missing column(s): {', '.join(missing)}")
+    return df[QUOTE_LINE_COLUMNS]
+
+
+def _quote_keys(df: pd.DataFrame, align_on: Optional[Sequence[str]]) -> pd.Series:
+    """quote_id -> alignment key (the quote_id itself, or the chosen header fields joined)."""
+    ids = pd.Series(df["quote_id"].unique())
+    if not align_on:
+        return pd.Series(ids.to_numpy(), index=ids.to_numpy())
+    head = df[(df["section"] == "header") & df["field"].isin(list(align_on))]
+    shown = head["text"].where(head["text"].notna(), head["value"].astype(str))
+    wide = pd.DataFrame({"quote_id": head["quote_id"], "field": head["field"], "v": shown}) \
+        .drop_duplicates(["quote_id", "field"]).pivot(index="quote_id", columns="field", values="v")
+    wide = wide.reindex(index=ids.to_numpy(), columns=list(align_on)).fillna("")
+    keys = wide.astype(str).agg(" | ".join, axis=1)
+    dup = keys[keys.duplicated(keep=False)]
+    if len(dup):
+        shown = ", ".join(f"{k!r} ({n} quotes)" for k, n in dup.value_counts().head(5).items())
+        raise ValueError(
+            f"{dup.nunique()} alignment key(s) on {', '.join(align_on)} match more than one quote: {shown}; "
+            "add header fields to align_on"
+        )
+    return keys
+
+
+def _keyed(df: pd.DataFrame, align_on: Optional[Sequence[str]]) -> pd.DataFrame:
+    out = pd.DataFrame({
+        "quote": df["quote_id"].map(_quote_keys(df, align_on)),
+        "section": df["section"],
+        "item": df["item"].fillna(""),
+        "field": df["field"],
+        "value": df["value"],
+        "text": df["text"],
+    })
+    # The same item name can appear on several lines of one quote; pair them up in order
+    out["occurrence"] = out.groupby(["quote", "section", "item", "field"], sort=False).cumcount()
+    return out
+
+
+def diff_quote_lines(
+    old,
+    new,
+    *,
+    abs_tol: float = 0.005,
+    rel_tol: float = 0.0,
+    align_on: Optional[Sequence[str]] = DEFAULT_ALIGN_ON,
+    sections: Sequence[str] = ("item", "breakdown"),
+    include_text: bool = False,
+) -> pd.DataFrame:
+    """
+    Lines that changed between `old` and `new` (columns CHANGE_COLUMNS).
+    A numeric line counts as changed when |new - old| > abs_tol + rel_tol * |old|; lines present
+    on one side only are reported as "added" / "removed". Text-only changes are included with
+    include_text=True. Header lines are compared only if "header" is in `sections`.
+    Quotes are matched on the `align_on` header fields (None: by quote_id); raises ValueError if
+    either side has two quotes with the same alignment key.
+    """
+    a = _keyed(load_quote_lines(old), align_on)
+    b = _keyed(load_quote_lines(new), align_on)
+    if sections:
+        a = a[a["section"].isin(list(sections))]
+        b = b[b["section"].isin(list(sections))]
+
+    m = a.merge(b, on=_KEY, how="outer", suffixes=("_old", "_new"), indicator=True)
+    old_v = m["value_old"].to_numpy(dtype=float)
+    new_v = m["value_new"].to_numpy(dtype=float)
+    delta = new_v - old_v
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.where(old_v != 0, delta / np.abs(old_v), np.where(delta == 0, 0.0, np.inf))
+
+    both = (m["_merge"] == "both").to_numpy()
+    num_changed = both & (np.isnan(old_v) != np.isnan(new_v))
+    num_changed |= both & (np.abs(np.nan_to_num(delta)) > abs_tol + rel_tol * np.abs(np.nan_to_num(old_v)))
+    text_changed = both & (m["text_old"].fillna("").to_numpy() != m["text_new"].fillna("").to_numpy())
+    keep = num_changed | (~both) | (text_changed if include_text else False)
+
+    status = np.select(
+        [m["_merge"].to_numpy() == "left_only", m["_merge"].to_numpy() == "right_only", num_changed],
+        ["removed", "added", "changed"], default="text changed",
+    )
+    out = pd.DataFrame({
+        "quote": m["quote"], "section": m["section"], "item": m["item"], "field": m["field"],
+        "occurrence": m["occurrence"],
+        "old": old_v, "new": new_v, "delta": delta, "rel_delta": rel,
+        "old_text": m["text_old"], "new_text": m["text_new"], "status": status,
+    })[keep]
+    return out.sort_values(["quote", "section", "item", "occurrence", "field"], kind="stable").reset_index(drop=True)
+
+
+def summarise_changes(changes: pd.DataFrame, fields: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    One row per quote: how many lines changed / were added / removed, and the summed delta of the
+    given fields (default: breakdown lines whose name contains "Total" or "Subtotal").
+    """
+    if changes.empty:
+        return pd.DataFrame(columns=["quote", "changed", "added", "removed", "total_delta"])
+    counts = pd.crosstab(changes["quote"], changes["status"]).reindex(columns=["changed", "added", "removed"], fill_value=0)
+    if fields is None:
+        pick = (changes["section"] == "breakdown") & changes["field"].str.contains("Total", case=False)
+    else:
+        pick = changes["field"].isin(list(fields))
+    total = changes.loc[pick & (changes["status"] == "changed")].groupby("quote")["delta"].sum()
+    out = counts.assign(total_delta=total.reindex(counts.index).fillna(0.0)).reset_index()
+    out.columns.name = None
+    return out.sort_values("total_delta", key=np.abs, ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,290 @@
+# quotelog61.py
+# Persistent quote log with an incremental (change-data-capture) export for Finance.
+#
+# Every quote is logged under a stable business key (e.g. "ACME|Belmarsh|Host") with its
+# long-format lines (utils61.quote_lines_table). Each change -- created, modified, invalidated
+# by a tariff change, deleted -- stamps the quote with the next sequence number, and every
+# consumer has a high-water mark, so an export reads only the quotes changed since its last run
+# (an index range scan on seq): the cost follows the churn, not the size of the book.
+#
+#   log = QuoteLog("quotes_log.sqlite")
+#   log.watch_tariff()                                  # invalidate stale quotes on tariff reload
+#   log.record("ACME|Belmarsh|Host", quote_lines_table(common, None, host_df))
+#   log.export_changes("finance", "exports/finance")    # -> new cdc-<first>-<last>.parquet files
+# The app records every quote it exports (CSV, HTML or Parquet) in the log at QUOTE_LOG_PATH.
+#
+# Batches (CDC_COLUMNS) are new files named after their sequence range, written atomically and
+# never rewritten, so a consumer can append them in name order. To apply a batch, replace every
+# row of each quote_key in it with the batch's rows. An invalidated quote comes with its stored
+# lines (op "invalidated": the figures still stand, but were priced under a superseded tariff);
+# a deleted quote, or one with no lines, comes as one row with no line fields. record_key ("<quote_key>:<change_seq>:<row>") is the same each time a
+# change is delivered, so a batch re-sent after a crash can be de-duplicated or upserted.
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tariff61 import current_version
+from utils61 import QUOTE_LINE_COLUMNS, quote_lines_schema
+
+DEFAULT_LOG_PATH = os.environ.get(
+    "QUOTE_LOG_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "cost-price-calculator", "quote_log.sqlite"),
+)
+CDC_COLUMNS = ["record_key", "quote_key", "change_seq", "op", "tariff_version"] + QUOTE_LINE_COLUMNS
+CREATED, MODIFIED, INVALIDATED, DELETED = "created", "modified", "invalidated", "deleted"
+ACTIVE = "active"
+
+
+def cdc_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("record_key", pa.string()),
+        ("quote_key", pa.string()),
+        ("change_seq", pa.int64()),
+        ("op", pa.string()),              # created | modified | invalidated | deleted
+        ("tariff_version", pa.string()),
+        *quote_lines_schema(),
+    ])
+
+
+def _as_table(lines):
+    import pyarrow as pa
+    if isinstance(lines, pa.Table):
+        return lines.select(QUOTE_LINE_COLUMNS).cast(quote_lines_schema())
+    return pa.Table.from_pandas(lines[QUOTE_LINE_COLUMNS], schema=quote_lines_schema(), preserve_index=False)
+
+
+def _encode(table, tariff_version: str) -> Tuple[str, bytes]:
+    """(content hash, stored blob) of a quote's lines: its columns as JSON (floats round-trip exactly)."""
+    payload = json.dumps(table.to_pydict(), default=str, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(tariff_version.encode("utf-8") + b"\n" + payload).hexdigest()
+    return digest, zlib.compress(payload, 6)
+
+
+class QuoteLog:
+    def __init__(self, path: str = DEFAULT_LOG_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        con = self._conn()
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS quotes ("
+            " quote_key TEXT PRIMARY KEY, status TEXT NOT NULL, tariff_version TEXT NOT NULL,"
+            " content_hash TEXT, lines BLOB, n_lines INTEGER NOT NULL,"
+            " seq INTEGER NOT NULL, created_seq INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS quotes_seq ON quotes(seq)")
+        con.execute("CREATE INDEX IF NOT EXISTS quotes_tariff ON quotes(tariff_version, status)")
+        con.execute("CREATE TABLE IF NOT EXISTS exports (consumer TEXT PRIMARY KEY, high_water INTEGER NOT NULL, updated REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread, as cache61.QuoteCache
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _write(self, fn):
+        """Run fn(con, next_seq) in one write transaction; next_seq() hands out increasing sequence numbers."""
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            last = con.execute("SELECT COALESCE(MAX(seq), 0) FROM quotes").fetchone()[0]
+            counter = [last]
+
+            def next_seq() -> int:
+                counter[0] += 1
+                return counter[0]
+
+            out = fn(con, next_seq)
+            con.execute("COMMIT")
+            return out
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    # -------------------------------
+    # Recording
+    # -------------------------------
+    def record_many(self, quotes: Iterable[Tuple[str, object]], *, tariff_version: Optional[str] = None) -> Dict[str, int]:
+        """
+        Log (quote_key, lines) pairs in one transaction; lines is a quote_lines_table (or a DataFrame
+        with QUOTE_LINE_COLUMNS). A quote whose lines and tariff are unchanged is not a change.
+        Returns counts per op ("unchanged" included).
+        """
+        version = tariff_version or current_version()
+        counts = {CREATED: 0, MODIFIED: 0, "unchanged": 0}
+
+        def apply(con, next_seq):
+            now = time.time()
+            for key, lines in quotes:
+                table = _as_table(lines)
+                digest, blob = _encode(table, version)
+                row = con.execute("SELECT status, content_hash FROM quotes WHERE quote_key = ?", (key,)).fetchone()
+                if row is not None and row[0] == ACTIVE and row[1] == digest:
+                    counts["unchanged"] += 1
+                    continue
+                seq = next_seq()
+                if row is None or row[0] == DELETED:
+                    counts[CREATED] += 1
+                    con.execute(
+                        "INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, ACTIVE, version, digest, blob, table.num_rows, seq, seq, now),
+                    )
+                else:
+                    counts[MODIFIED] += 1
+                    con.execute(
+                        "UPDATE quotes SET status = ?, tariff_version = ?, content_hash = ?, lines = ?, n_lines = ?, seq = ?,"
+                        " updated = ? WHERE quote_key = ?",
+                        (ACTIVE, version, digest, blob, table.num_rows, seq, now, key),
+                    )
+
+        self._write(apply)
+        return counts
+
+    def record(self, quote_key: str, lines, *, tariff_version: Optional[str] = None) -> Optional[str]:
+        """Log one quote. Returns "created" / "modified", or None if nothing changed."""
+        counts = self.record_many([(quote_key, lines)], tariff_version=tariff_version)
+        return next((op for op in (CREATED, MODIFIED) if counts[op]), None)
+
+    def delete(self, quote_key: str) -> bool:
+        """Withdraw a quote; the next export carries a "deleted" record for it."""
+        def apply(con, next_seq):
+            cur = con.execute(
+                "UPDATE quotes SET status = ?, content_hash = NULL, lines = NULL, n_lines = 0, seq = ?, updated = ?"
+                " WHERE quote_key = ? AND status != ?",
+                (DELETED, next_seq(), time.time(), quote_key, DELETED),
+            )
+            return cur.rowcount > 0
+        return self._write(apply)
+
+    def invalidate_tariff(self, version: Optional[str] = None) -> int:
+        """Mark every active quote priced under a tariff other than `version` (default: current) as invalidated."""
+        version = version or current_version()
+
+        def apply(con, next_seq):
+            stale = [k for (k,) in con.execute(
+                "SELECT quote_key FROM quotes WHERE status = ? AND tariff_version != ? ORDER BY quote_key", (ACTIVE, version)
+            )]
+            now = time.time()
+            con.executemany(
+                "UPDATE quotes SET status = ?, seq = ?, updated = ? WHERE quote_key = ?",
+                [(INVALIDATED, next_seq(), now, k) for k in stale],
+            )
+            return len(stale)
+        return self._write(apply)
+
+    def watch_tariff(self, store=None) -> None:
+        """Invalidate stale quotes whenever the tariff store swaps in a new tariff."""
+        import tariff61
+        (store or tariff61.STORE).on_reload(lambda tariff: self.invalidate_tariff(tariff.version))
+
+    # -------------------------------
+    # Export
+    # -------------------------------
+    def high_water(self, consumer: str) -> int:
+        row = self._conn().execute("SELECT high_water FROM exports WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else 0
+
+    def pending(self, consumer: str) -> int:
+        """Quotes changed since the consumer's last export."""
+        return self._conn().execute("SELECT COUNT(*) FROM quotes WHERE seq > ?", (self.high_water(consumer),)).fetchone()[0]
+
+    def _cdc_table(self, rows: List[Tuple], since: int):
+        """One Arrow table (cdc_schema) for a batch of quote rows; the columns are built up once."""
+        import pyarrow as pa
+        cols = {c: [] for c in CDC_COLUMNS}
+        for key, status, version, blob, n, seq, created_seq in rows:
+            op = (CREATED if created_seq > since else MODIFIED) if status == ACTIVE else status
+            if blob is not None and n > 0:
+                lines = json.loads(zlib.decompress(blob))
+            else:
+                n, lines = 1, {c: [None] for c in QUOTE_LINE_COLUMNS}
+            cols["record_key"].extend(f"{key}:{seq}:{i}" for i in range(n))
+            cols["quote_key"].extend([key] * n)
+            cols["change_seq"].extend([seq] * n)
+            cols["op"].extend([op] * n)
+            cols["tariff_version"].extend([version] * n)
+            for c in QUOTE_LINE_COLUMNS:
+                cols[c].extend(lines[c])
+        return pa.Table.from_pydict(cols, schema=cdc_schema())
+
+    def export_changes(self, consumer: str, out_dir: str, *, batch_rows: int = 100_000) -> List[str]:
+        """
+        Write the consumer's changes since its high-water mark as Parquet batches of about
+        batch_rows rows (a quote is never split), then advance the mark. Returns the new files.
+        """
+        import pyarrow.parquet as pq
+        os.makedirs(out_dir, exist_ok=True)
+        since = self.high_water(consumer)
+        con = self._conn()
+        con.execute("BEGIN")      # one snapshot: the quotes read and the new mark agree
+        try:
+            cur = con.execute(
+                "SELECT quote_key, status, tariff_version, lines, n_lines, seq, created_seq FROM quotes WHERE seq > ? ORDER BY seq",
+                (since,),
+            )
+            written, upto = [], since
+            while True:
+                rows, n = [], 0
+                for row in cur:
+                    rows.append(row)
+                    n += max(1, row[4])
+                    if n >= batch_rows:
+                        break
+                if not rows:
+                    break
+                first, upto = rows[0][5], rows[-1][5]
+                path = os.path.join(out_dir, f"cdc-{first:012d}-{upto:012d}.parquet")
+                tmp = path + ".tmp"
+                pq.write_table(self._cdc_table(rows, since), tmp, compression="zstd")
+                os.replace(tmp, path)
+                written.append(path)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        if upto > since:
+            con.execute(
+                "INSERT INTO exports(consumer, high_water, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT(consumer) DO UPDATE SET high_water = excluded.high_water, updated = excluded.updated"
+                " WHERE excluded.high_water > exports.high_water",
+                (consumer, upto, time.time()),
+            )
+        return written
+
+    def stats(self) -> Dict[str, int]:
+        out = {s: 0 for s in (ACTIVE, INVALIDATED, DELETED)}
+        for status, n in self._conn().execute("SELECT status, COUNT(*) FROM quotes GROUP BY status"):
+            out[status] = n
+        out["last_seq"] = self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM quotes").fetchone()[0]
+        return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export quotes changed since the last run (nightly Finance sync).")
+    ap.add_argument("out_dir", help="directory the cdc-*.parquet batches are added to")
+    ap.add_argument("--consumer", default="finance")
+    ap.add_argument("--log", default=DEFAULT_LOG_PATH, help="quote log (SQLite)")
+    ap.add_argument("--batch-rows", type=int, default=100_000)
+    args = ap.parse_args(argv)
+    log = QuoteLog(args.log)
+    stale = log.invalidate_tariff()
+    files = log.export_changes(args.consumer, args.out_dir, batch_rows=args.batch_rows)
+    print(f"{stale} quote(s) invalidated by the current tariff; {len(files)} batch file(s) written, "
+          f"high-water mark {log.high_water(args.consumer)}")
+    for f in files:
+        print(" ", f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# ramp61.py
+# Output ramp-up for new production contracts: week-by-week capacity, unit cost and volume.
+#
+# calculate_production_contractual prices every week at the contract's steady Output %. While
+# prisoners learn the task output is lower, so early units cost more and fewer are made. A ramp
+# profile gives the Output % for each week of the term, and every figure becomes an
+# (items x weeks) array:
+#   ramp = RampProfile.learning(start_pct=30, weeks_to_90=6)     # or RampProfile(weekly=[30, 50, 70, 85])
+#   res = ramp_production(items, output_pct, ramp, weeks=52, **same_kwargs_as_calculate_production_contractual)
+#   res["unit_cost_ex_vat"][:, 0]     -> week-1 unit costs
+#   res["summary"]                    -> per item: term volume, term cost, ramp-adjusted unit price
+#
+# The weekly cost of an item (wages and its share of the pools) doesn't depend on output, so only
+# the volumes move; a week at the steady Output % gives exactly the flat quote's unit cost.
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lazy61 import LazyProductionResult
+
+STEADY_TOLERANCE_PCT = 0.5    # a week within this many points of the steady Output % counts as steady
+
+SUMMARY_COLUMNS = [
+    "Item", "Steady Unit Cost (£)", "Week 1 Unit Cost (£)", "Term Units", "Steady Term Units",
+    "Term Cost ex VAT (£)", "Term Unit Price ex VAT (£)", "Term Unit Price inc VAT (£)",
+    "Ramp Premium (%)", "Weeks to Steady Output", "First Week Meeting Target",
+]
+
+
+@dataclass(frozen=True)
+class RampProfile:
+    """
+    Output % by week of the term (week 1 = the first week). `weekly` lists the first weeks
+    explicitly; `curve(weeks, steady_pct)` maps an array of week numbers to Output %. Weeks
+    beyond `weekly` (and every week when neither is set) run at the contract's steady Output %.
+    """
+    weekly: Sequence[float] = field(default_factory=list)
+    curve: Optional[Callable[[np.ndarray, float], np.ndarray]] = None
+
+    def output_pct(self, weeks: int, steady_pct: float) -> np.ndarray:
+        w = np.arange(1, int(weeks) + 1)
+        pct = np.full(len(w), float(steady_pct))
+        if self.curve is not None:
+            pct = np.asarray(self.curve(w, float(steady_pct)), dtype=float) * np.ones(len(w))
+        k = min(len(self.weekly), len(w))
+        pct[:k] = np.asarray(self.weekly, dtype=float)[:k]
+        return np.clip(pct, 0.0, 100.0)
+
+    @classmethod
+    def linear(cls, start_pct: float, weeks: int) -> "RampProfile":
+        """Straight line from start_pct in week 1 to the steady Output % in week `weeks`."""
+        span = max(1, int(weeks) - 1)
+        return cls(curve=lambda w, steady: start_pct + (steady - start_pct) * np.minimum(1.0, (w - 1) / span))
+
+    @classmethod
+    def learning(cls, start_pct: float, weeks_to_90: float) -> "RampProfile":
+        """Learning curve: the gap to the steady Output % closes by 90% every `weeks_to_90` weeks."""
+        if not float(weeks_to_90) > 0:
+            raise ValueError(f"weeks_to_90 must be greater than 0, got {weeks_to_90!r}")
+        return cls(curve=lambda w, steady: steady - (steady - start_pct) * 0.1 ** ((w - 1) / float(weeks_to_90)))
+
+
+def _first_week(mask: np.ndarray) -> np.ndarray:
+    """1-based first True per row, NaN where none."""
+    hit = mask.any(axis=1)
+    return np.where(hit, mask.argmax(axis=1) + 1, np.nan)
+
+
+def ramp_production(items: List[Dict], output_pct: int, ramp: RampProfile, *, weeks: int, **kwargs) -> Dict:
+    """
+    Week-by-week production figures over a term of `weeks` weeks under `ramp`. kwargs are those of
+    calculate_production_contractual. Arrays are (items x weeks); units are what the workshop
+    makes that week (in target mode the target, capped by that week's capacity).
+    """
+    res = LazyProductionResult(items, output_pct, **kwargs)
+    pct = ramp.output_pct(weeks, output_pct)
+    scale = pct / 100.0
+    if res.timeline is not None:
+        scale = scale * res.timeline.availability_ratio()
+
+    capacity = res.cap_100[:, None] * scale[None, :]
+    if res.pricing_mode == "target":
+        target = res.units_for_pricing[:, None]
+        units = np.minimum(target, capacity)
+        shortfall = target - units
+    else:
+        units = capacity
+        shortfall = np.zeros_like(units)
+
+    weekly_cost = res.weekly_cost_total
+    unit_ex = np.full(units.shape, np.nan)
+    made = units > 0
+    unit_ex[made] = np.broadcast_to(weekly_cost[:, None], units.shape)[made] / units[made]
+    vat = (1 + (float(res.vat_rate) / 100.0)) if (res.customer_type == "Commercial" and res.apply_vat) else 1.0
+    unit_inc = unit_ex * vat
+    cumulative = np.cumsum(units, axis=1)
+
+    term_units = cumulative[:, -1] if weeks else np.zeros(res.n)
+    term_cost = weekly_cost * int(weeks)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        term_unit = np.where(term_units > 0, term_cost / term_units, np.nan)
+        premium = (term_unit / res.unit_cost_ex_vat - 1.0) * 100.0
+    summary = pd.DataFrame({
+        "Item": res.names,
+        "Steady Unit Cost (£)": res.unit_cost_ex_vat,
+        "Week 1 Unit Cost (£)": unit_ex[:, 0] if weeks else np.nan,
+        "Term Units": term_units,
+        "Steady Term Units": res.units_for_pricing * int(weeks),
+        "Term Cost ex VAT (£)": term_cost,
+        "Term Unit Price ex VAT (£)": term_unit,
+        "Term Unit Price inc VAT (£)": term_unit * vat,
+        "Ramp Premium (%)": premium,
+        # a learning curve only approaches the steady %, so "steady" is within STEADY_TOLERANCE_PCT of it
+        "Weeks to Steady Output": _first_week((pct >= float(output_pct) - STEADY_TOLERANCE_PCT)[None, :])[0],
+        "First Week Meeting Target": _first_week(shortfall <= 1e-9) if res.pricing_mode == "target" else np.nan,
+    }, columns=SUMMARY_COLUMNS)
+
+    return {
+        "weeks": np.arange(1, int(weeks) + 1),
+        "output_pct": pct,
+        "items": res.names,
+        "capacity_units": capacity,
+        "units": units,
+        "cumulative_units": cumulative,
+        "shortfall_units": shortfall,
+        "weekly_cost_ex_vat": weekly_cost,
+        "unit_cost_ex_vat": unit_ex,
+        "unit_price_inc_vat": unit_inc,
+        "summary": summary,
+        "tariff_version": res.tariff.version,
+    }
+
+
+def weekly_table(result: Dict) -> pd.DataFrame:
+    """ramp_production arrays in long form: one row per (item, week)."""
+    n, w = result["units"].shape
+    return pd.DataFrame({
+        "Item": np.repeat(np.array(result["items"], dtype=object), w),
+        "Week": np.tile(result["weeks"], n),
+        "Output %": np.tile(result["output_pct"], n),
+        "Capacity (units/week)": result["capacity_units"].ravel(),
+        "Units": result["units"].ravel(),
+        "Cumulative Units": result["cumulative_units"].ravel(),
+        "Unit Cost ex VAT (£)": result["unit_cost_ex_vat"].ravel(),
+        "Unit Price inc VAT (£)": result["unit_price_inc_vat"].ravel(),
+    })
+
+
+def ramp_production_many(contracts: Sequence[Dict], ramp: RampProfile, *, weeks: int) -> pd.DataFrame:
+    """
+    Batch repricing: the ramp summary for many contracts, each a dict of
+    {"items", "output_pct", **calculate_production_contractual kwargs}, in one frame with a
+    "Contract" column (the contract's "name", else its position).
+    """
+    frames = []
+    for i, c in enumerate(contracts):
+        c = dict(c)
+        name = c.pop("name", i)
+        s = ramp_production(c.pop("items"), c.pop("output_pct"), ramp, weeks=weeks, **c)["summary"]
+        s.insert(0, "Contract", name)
+        frames.append(s)
+    if not frames:
+        return pd.DataFrame(columns=["Contract"] + SUMMARY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
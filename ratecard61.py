@@ -0,0 +1,188 @@
+# ratecard61.py
+# Precomputed regional rate cards: every tariff-derived coefficient the calculators use,
+# built once per tariff and looked up per quote.
+#
+#   card = get_rate_card()                 # one card per tariff version, pre-built on tariff reload
+#   card.instructor_monthly_per_hour[("National", "Production Instructor: Band 3")]
+#   fixed_costs_monthly(region="National", titles=[...], workshop_hours=30, ...)
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import tariff61
+from rules61 import (
+    ADDL_BENEFIT_RATE, DEV_RATE_BASE, EMPLOYMENT_SUPPORT_OPTIONS, FULL_TIME_HOURS, OVERHEAD_RATE,
+    dev_rate_host, dev_rate_production,
+)
+
+_DEV_RULES = {"host": dev_rate_host, "production": dev_rate_production}
+
+
+@dataclass(frozen=True)
+class RateCard:
+    version: str
+    # monthly cost of one instructor per weekly workshop hour (salary / 12 / 37.5)
+    instructor_monthly_per_hour: Dict[Tuple[str, str], float]
+    # monthly Band 3 shadow per weekly workshop hour (overhead base when the customer provides instructors)
+    shadow_monthly_per_hour: Dict[str, float]
+    # the same for a region the tariff doesn't list (Tariff.band3_fallback)
+    shadow_fallback_per_hour: float
+    # dev rate by (rules, employment support); rules = "host" | "production"
+    dev_rate: Dict[Tuple[str, str], float]
+
+    def instructor_monthly(self, region: str, titles: Sequence[str], workshop_hours: float, contracts: int = 1) -> float:
+        hours = float(workshop_hours) if workshop_hours > 0 else 0.0
+        per_hour = sum(self.instructor_monthly_per_hour[(region, t)] for t in titles)
+        return per_hour * hours / max(1, int(contracts))
+
+    def shadow_monthly(self, region: str, workshop_hours: float, contracts: int = 1) -> float:
+        hours = float(workshop_hours) if workshop_hours > 0 else 0.0
+        per_hour = self.shadow_monthly_per_hour.get(region, self.shadow_fallback_per_hour)
+        return per_hour * hours / max(1, int(contracts))
+
+
+def build_rate_card(tariff: Optional[tariff61.Tariff] = None) -> RateCard:
+    tariff = tariff or tariff61.current_tariff()
+    inst = {
+        (region, band["title"]): float(band["avg_total"]) / 12.0 / FULL_TIME_HOURS
+        for region, bands in tariff.supervisor_pay.items()
+        for band in bands
+    }
+    shadow = {region: float(v) / 12.0 / FULL_TIME_HOURS for region, v in tariff.band3_costs.items()}
+    dev = {(rules, es): fn(es) for rules, fn in _DEV_RULES.items() for es in EMPLOYMENT_SUPPORT_OPTIONS}
+    return RateCard(
+        version=tariff.version,
+        instructor_monthly_per_hour=inst,
+        shadow_monthly_per_hour=shadow,
+        shadow_fallback_per_hour=tariff.band3_fallback / 12.0 / FULL_TIME_HOURS,
+        dev_rate=dev,
+    )
+
+
+_lock = threading.Lock()
+_cards: Dict[str, RateCard] = {}
+_MAX_CARDS = 8
+
+
+def _remember(card: RateCard) -> RateCard:
+    with _lock:
+        _cards[card.version] = card
+        while len(_cards) > _MAX_CARDS:
+            _cards.pop(next(iter(_cards)))
+    return card
+
+
+def get_rate_card(tariff: Optional[tariff61.Tariff] = None) -> RateCard:
+    """Rate card for `tariff` (default: the tariff in force today), built once per tariff version."""
+    tariff = tariff or tariff61.current_tariff()
+    card = _cards.get(tariff.version)
+    if card is not None:
+        return card
+    return _remember(build_rate_card(tariff))
+
+
+# Build the new card while the reloaded tariff is being prepared, before it is swapped in,
+# so the first quotes after a pay award don't all rebuild it at once.
+tariff61.STORE.on_reload(lambda t: _remember(build_rate_card(t)))
+
+
+# -------------------------------
+# Quote helpers
+# -------------------------------
+def fixed_costs_monthly(
+    *,
+    region: str,
+    titles: Sequence[str] = (),
+    workshop_hours: float,
+    contracts: int = 1,
+    employment_support: str = "None",
+    additional_benefits: bool = False,
+    customer_covers_supervisors: bool = False,
+    rules: str = "host",
+    card: Optional[RateCard] = None,
+) -> Dict[str, float]:
+    """
+    Monthly instructor / overhead / development lines from rate-card lookups
+    (same figures as host61.generate_host_quote when rules="host").
+    """
+    card = card or get_rate_card()
+    if customer_covers_supervisors:
+        instructor = 0.0
+        oh_base = card.shadow_monthly(region, workshop_hours, contracts)
+    else:
+        instructor = card.instructor_monthly(region, titles, workshop_hours, contracts)
+        oh_base = instructor
+    overheads = oh_base * OVERHEAD_RATE
+    dev_rate = card.dev_rate[(rules, employment_support)] if (rules, employment_support) in card.dev_rate \
+        else _DEV_RULES[rules](employment_support)
+    dev_before = (instructor + overheads) * DEV_RATE_BASE
+    dev_actual = (instructor + overheads) * dev_rate
+    addl = 0.0
+    if employment_support == "Both" and additional_benefits:
+        addl = ((instructor + overheads) if rules == "host" else instructor) * ADDL_BENEFIT_RATE
+    subtotal = instructor + overheads + dev_actual - addl
+    return {
+        "instructor": instructor,
+        "overheads": overheads,
+        "dev_rate": dev_rate,
+        "dev_before": dev_before,
+        "dev_discount": max(0.0, dev_before - dev_actual),
+        "dev_actual": dev_actual,
+        "additional_benefit": addl,
+        "subtotal": subtotal,
+        "rate_card_version": card.version,
+    }
+
+
+def batch_fixed_costs(df: pd.DataFrame, *, rules: str = "host", card: Optional[RateCard] = None) -> pd.DataFrame:
+    """
+    Vectorized monthly fixed costs for many quotes.
+    Columns used: region, instructor_titles (list or ';'-separated), workshop_hours, contracts,
+    employment_support, additional_benefits, customer_covers_supervisors.
+    Raises ValueError naming the rows whose (region, instructor title) isn't in the rate card,
+    as fixed_costs_monthly raises KeyError for one quote.
+    """
+    card = card or get_rate_card()
+    n = len(df)
+    region = df["region"].astype(str)
+    hours = pd.to_numeric(df["workshop_hours"], errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy()
+    contracts = pd.to_numeric(df.get("contracts", pd.Series(1, index=df.index)), errors="coerce").fillna(1)
+    contracts = contracts.clip(lower=1).astype(int).to_numpy()
+    covers = df.get("customer_covers_supervisors", pd.Series(False, index=df.index)).fillna(False).astype(bool).to_numpy()
+    es = df.get("employment_support", pd.Series("None", index=df.index)).fillna("None").astype(str)
+    benefits = df.get("additional_benefits", pd.Series(False, index=df.index)).fillna(False).astype(bool).to_numpy()
+
+    titles = df.get("instructor_titles", pd.Series([[]] * n, index=df.index))
+    titles = titles.apply(lambda v: [t.strip() for t in v.split(";") if t.strip()] if isinstance(v, str) else list(v or []))
+    exploded = titles.explode().dropna()
+    keys = list(zip(region.reindex(exploded.index), exploded))
+    rate = pd.Series([card.instructor_monthly_per_hour.get(k, np.nan) for k in keys], index=exploded.index, dtype=float)
+    covered = pd.Series(covers, index=df.index).reindex(exploded.index).to_numpy()
+    bad = [f"row {i}: {t} ({r})" for i, (r, t), miss, c in zip(exploded.index, keys, rate.isna(), covered) if miss and not c]
+    if bad:
+        raise ValueError(f"unknown instructor title(s) for region: {'; '.join(bad)}")
+    per_hour = rate.groupby(level=0).sum(min_count=1).reindex(df.index).fillna(0.0).to_numpy()
+
+    shadow = region.map(card.shadow_monthly_per_hour).fillna(card.shadow_fallback_per_hour).to_numpy()
+    instructor = np.where(covers, 0.0, per_hour * hours / contracts)
+    oh_base = np.where(covers, shadow * hours / contracts, instructor)
+    overheads = oh_base * OVERHEAD_RATE
+
+    dev_fn = _DEV_RULES[rules]
+    dev_rate = es.map(lambda s: card.dev_rate.get((rules, s), dev_fn(s))).to_numpy(dtype=float)
+    base = instructor + overheads
+    dev_actual = base * dev_rate
+    addl_on = (es.to_numpy() == "Both") & benefits
+    addl = np.where(addl_on, (base if rules == "host" else instructor) * ADDL_BENEFIT_RATE, 0.0)
+    return pd.DataFrame({
+        "instructor": instructor,
+        "overheads": overheads,
+        "dev_rate": dev_rate,
+        "dev_before": base * DEV_RATE_BASE,
+        "dev_actual": dev_actual,
+        "additional_benefit": addl,
+        "subtotal": base + dev_actual - addl,
+    }, index=df.index)
@@ -0,0 +1,45 @@
+# rules61.py
+# Pricing rules and constants shared by the calculators (host61, production61) and every module
+# that re-derives their figures in bulk, so a rule change is made in one place.
+
+# Employment support the customer offers (drives the development charge rate)
+EMPLOYMENT_SUPPORT_OPTIONS = ["None", "Employment on release/RoTL", "Pre-release support", "Both"]
+
+FULL_TIME_HOURS = 37.5            # weekly hours of one full-time instructor
+OVERHEAD_RATE = 0.61              # overheads as a share of the overhead base
+DEV_RATE_BASE = 0.20              # development charge before any employment-support reduction
+ADDL_BENEFIT_RATE = 0.10          # additional benefit discount (employment support "Both" only)
+BAND3_SHADOW_FALLBACK = 42247.81  # annual Band 3 shadow cost if a tariff has no "National" row (see Tariff.band3_shadow)
+MONTHLY = 52.0 / 12.0             # weeks per month
+
+
+def dev_rate_host(employment_support: str) -> float:
+    """Host rule: 0% for "Both", 10% for RoTL or pre-release support, else 20%."""
+    s = (employment_support or "").lower()
+    if "both" in s:
+        return 0.0
+    if "employment on release/rotl" in s or "pre-release support" in s:
+        return 0.10
+    return DEV_RATE_BASE
+
+
+def dev_rate_production(employment_support: str) -> float:
+    """
+    Production / ad-hoc rule: 0% for "Both", 10% for "Employment on release/RoTL" or
+    "Post release", else 20%.
+    """
+    s = (employment_support or "").lower()
+    if "both" in s:
+        return 0.0
+    if "employment on release/rotl" in s or "post release" in s:
+        return 0.10
+    return DEV_RATE_BASE
+
+
+def dev_rates(employment_support, rule) -> "np.ndarray":
+    """`rule` (dev_rate_host / dev_rate_production) for an array of employment support values."""
+    import numpy as np
+    values = np.asarray(employment_support, dtype=object)
+    keys = np.array(["" if v is None or v != v else str(v) for v in values.ravel()], dtype=object)
+    uniq, inv = np.unique(keys, return_inverse=True)
+    return np.array([rule(u) for u in uniq], dtype=float)[inv].reshape(values.shape)
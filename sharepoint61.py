@@ -0,0 +1,251 @@
+# sharepoint61.py
+# Bulk upload of generated quote documents to a SharePoint document library via Microsoft Graph.
+#
+# - MSAL client-credentials auth with a persistent (file-backed) token cache
+# - one pooled requests.Session (keep-alive) shared by all workers
+# - retry with exponential backoff on 429/5xx (honours Retry-After)
+# - bounded concurrency via a thread pool
+#
+# Settings come from the environment (see SharePointConfig.from_env). graphstub61 is a local
+# stand-in for Graph (uploads, throttling, revoked tokens): python graphstub61.py checks the
+# whole pipeline offline.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+GRAPH_SCOPE = ["https://graph.microsoft.com/.default"]
+SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024   # Graph simple PUT upload limit (bytes)
+DEFAULT_TOKEN_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "cost-price-calculator", "msal_token_cache.bin")
+
+
+@dataclass(frozen=True)
+class SharePointConfig:
+    tenant_id: str = ""
+    client_id: str = ""
+    client_secret: str = ""
+    drive_id: str = ""                       # document library drive id
+    folder: str = "Quotes"                   # target folder inside the library
+    graph_base: str = "https://graph.microsoft.com/v1.0"
+    token_cache_path: str = DEFAULT_TOKEN_CACHE
+    max_workers: int = 8
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SharePointConfig":
+        env = os.environ.get
+        return cls(
+            tenant_id=env("SP_TENANT_ID", ""),
+            client_id=env("SP_CLIENT_ID", ""),
+            client_secret=env("SP_CLIENT_SECRET", ""),
+            drive_id=env("SP_DRIVE_ID", ""),
+            folder=env("SP_FOLDER", "Quotes"),
+            graph_base=env("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0"),
+            token_cache_path=env("SP_TOKEN_CACHE", DEFAULT_TOKEN_CACHE),
+            max_workers=int(env("SP_MAX_WORKERS", "8")),
+        )
+
+
+# -------------------------------
+# Auth (MSAL + persistent cache)
+# -------------------------------
+class TokenProvider:
+    """Thread-safe MSAL client-credentials token source with a file-backed cache."""
+
+    def __init__(self, cfg: SharePointConfig):
+        import msal
+        self._cfg = cfg
+        self._lock = threading.Lock()
+        self._cache = msal.SerializableTokenCache()
+        if cfg.token_cache_path and os.path.exists(cfg.token_cache_path):
+            with open(cfg.token_cache_path, "r", encoding="utf-8") as f:
+                self._cache.deserialize(f.read())
+        self._app = msal.ConfidentialClientApplication(
+            cfg.client_id,
+            authority=f"https://login.microsoftonline.com/{cfg.tenant_id}",
+            client_credential=cfg.client_secret,
+            token_cache=self._cache,
+        )
+
+    def _persist(self):
+        path = self._cfg.token_cache_path
+        if path and self._cache.has_state_changed:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp = path + ".tmp"
+            # owner-only: the file holds bearer tokens
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._cache.serialize())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, path)
+
+    def __call__(self) -> str:
+        with self._lock:
+            # acquire_token_for_client serves from the cache until the token is close to expiry
+            result = self._app.acquire_token_for_client(scopes=GRAPH_SCOPE)
+            self._persist()
+        if "access_token" not in result:
+            raise RuntimeError(f"Token acquisition failed: {result.get('error_description') or result.get('error')}")
+        return result["access_token"]
+
+    def invalidate(self, token: str) -> None:
+        """Drop a token the server rejected, so the next call fetches a new one instead of the cached copy."""
+        import msal
+        with self._lock:
+            search = getattr(self._cache, "search", None) or self._cache.find
+            for at in list(search(msal.TokenCache.CredentialType.ACCESS_TOKEN, query={"secret": token})):
+                self._cache.remove_at(at)
+            self._persist()
+
+
+# -------------------------------
+# HTTP session (pooled + retries)
+# -------------------------------
+def make_session(cfg: SharePointConfig):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=cfg.max_retries,
+        backoff_factor=cfg.backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "PUT", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=cfg.max_workers, pool_maxsize=cfg.max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# -------------------------------
+# Upload pipeline
+# -------------------------------
+class QuoteUploader:
+    """
+    Upload many (file_name, bytes) documents concurrently into cfg.folder of cfg.drive_id.
+
+    Usage:
+        up = QuoteUploader(SharePointConfig.from_env())
+        results = up.upload_many([("host_quote_123.html", html.encode()), ...])
+    """
+
+    def __init__(
+        self,
+        cfg: SharePointConfig,
+        *,
+        token_provider: Optional[Callable[[], str]] = None,
+        session=None,
+    ):
+        self.cfg = cfg
+        self._token = token_provider or TokenProvider(cfg)
+        self._session = session or make_session(cfg)
+
+    def _url(self, name: str) -> str:
+        path = "/".join(p for p in (self.cfg.folder.strip("/"), name) if p)
+        return (
+            f"{self.cfg.graph_base.rstrip('/')}/drives/{self.cfg.drive_id}"
+            f"/root:/{quote(path)}:/content?@microsoft.graph.conflictBehavior=replace"
+        )
+
+    def upload_one(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> Dict:
+        if len(data) > SIMPLE_UPLOAD_LIMIT:
+            raise ValueError(f"{name}: {len(data):,} bytes exceeds the simple upload limit")
+        t0 = time.perf_counter()
+        resp = None
+        for attempt in range(2):   # second attempt only after a 401 (token revoked/expired early)
+            token = self._token()
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": content_type}
+            resp = self._session.put(self._url(name), data=data, headers=headers, timeout=self.cfg.timeout)
+            if resp.status_code != 401:
+                break
+            # the provider would hand back the same cached token; make it fetch a fresh one
+            invalidate = getattr(self._token, "invalidate", None)
+            if invalidate is not None:
+                invalidate(token)
+        ok = 200 <= resp.status_code < 300
+        item = {}
+        if ok:
+            try:
+                item = resp.json()
+            except ValueError:
+                item = {}
+        return {
+            "name": name,
+            "ok": ok,
+            "status": resp.status_code,
+            "id": item.get("id"),
+            "web_url": item.get("webUrl"),
+            "error": None if ok else resp.text[:500],
+            "seconds": time.perf_counter() - t0,
+        }
+
+    def upload_many(
+        self,
+        documents: Iterable[Tuple[str, bytes]],
+        *,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Dict]:
+        docs = list(documents)
+        results: List[Dict] = []
+        with ThreadPoolExecutor(max_workers=max(1, self.cfg.max_workers)) as pool:
+            futures = {pool.submit(self.upload_one, n, d, _content_type(n)): n for n, d in docs}
+            for fut in as_completed(futures):
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    results.append({"name": futures[fut], "ok": False, "status": None, "id": None,
+                                    "web_url": None, "error": str(e), "seconds": None})
+                if on_progress:
+                    on_progress(len(results), len(docs))
+        return results
+
+    def close(self):
+        self._session.close()
+
+
+def _content_type(name: str) -> str:
+    n = name.lower()
+    if n.endswith(".html"):
+        return "text/html"
+    if n.endswith(".csv"):
+        return "text/csv"
+    if n.endswith(".parquet"):
+        return "application/vnd.apache.parquet"
+    return "application/octet-stream"
+
+
+def upload_directory(path: str, cfg: Optional[SharePointConfig] = None, **kwargs) -> List[Dict]:
+    """Upload every file in `path` (non-recursive)."""
+    cfg = cfg or SharePointConfig.from_env()
+    docs = []
+    for fn in sorted(os.listdir(path)):
+        full = os.path.join(path, fn)
+        if os.path.isfile(full):
+            with open(full, "rb") as f:
+                docs.append((fn, f.read()))
+    up = QuoteUploader(cfg, **kwargs)
+    try:
+        return up.upload_many(docs)
+    finally:
+        up.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python sharepoint61.py <directory-of-quotes>")
+    res = upload_directory(sys.argv[1])
+    failed = [r for r in res if not r["ok"]]
+    print(f"Uploaded {len(res) - len(failed)}/{len(res)} documents")
+    for r in failed:
+        print(f"  {r['name']}: {r['status']} {r['error']}")
+    raise SystemExit(1 if failed else 0)
@@ -1,70 +1,196 @@
 # tariff61.py
 # Prison-to-region mapping, Band 3 shadow costs, and Supervisor pay bands
+#
+# Tariffs live in versioned JSON files (tariffs/*.json, or $TARIFF_DIR), each with:
+#   {"version": "...", "effective_from": "YYYY-MM-DD",
+#    "prison_to_region": {...}, "band3_costs": {...}, "supervisor_pay": {...}}
+# Files are parsed once into immutable Tariff snapshots indexed by effective date. The
+# directory is re-checked at most every TARIFF_POLL_SECONDS; a changed file set is parsed,
+# pre-warmed (reload hooks, e.g. rate cards) and then swapped in with a single assignment,
+# so readers never see a half-loaded tariff and no restart is needed.
+#
+# PRISON_TO_REGION / BAND3_COSTS / SUPERVISOR_PAY remain importable; they are read-only
+# views that always resolve against the tariff in force today.
+import bisect
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import date
+from types import MappingProxyType
+from typing import Callable, List, Optional, Tuple
 
-PRISON_TO_REGION = {
-    "Altcourse": "National", "Ashfield": "National", "Askham Grange": "National",
-    "Aylesbury": "National", "Bedford": "National", "Belmarsh": "Inner London",
-    "Berwyn": "National", "Birmingham": "National", "Brinsford": "National",
-    "Bristol": "National", "Brixton": "Inner London", "Bronzefield": "Outer London",
-    "Buckley Hall": "National", "Bullingdon": "National", "Bure": "National",
-    "Cardiff": "National", "Channings Wood": "National", "Chelmsford": "National",
-    "Coldingley": "Outer London", "Cookham Wood": "National", "Dartmoor": "National",
-    "Deerbolt": "National", "Doncaster": "National", "Dovegate": "National",
-    "Downview": "Outer London", "Drake Hall": "National", "Durham": "National",
-    "East Sutton Park": "National", "Eastwood Park": "National", "Elmley": "National",
-    "Erlestoke": "National", "Exeter": "National", "Featherstone": "National",
-    "Feltham A": "Outer London", "Feltham B": "Outer London", "Five Wells": "National",
-    "Ford": "National", "Forest Bank": "National", "Fosse Way": "National",
-    "Foston Hall": "National", "Frankland": "National", "Full Sutton": "National",
-    "Garth": "National", "Gartree": "National", "Grendon": "National",
-    "Guys Marsh": "National", "Hatfield": "National", "Haverigg": "National",
-    "Hewell": "National", "High Down": "Outer London", "Highpoint": "National",
-    "Hindley": "National", "Hollesley Bay": "National", "Holme House": "National",
-    "Hull": "National", "Humber": "National", "Huntercombe": "National",
-    "Isis": "Inner London", "Isle of Wight": "National", "Kirkham": "National",
-    "Kirklevington Grange": "National", "Lancaster Farms": "National",
-    "Leeds": "National", "Leicester": "National", "Lewes": "National",
-    "Leyhill": "National", "Lincoln": "National", "Lindholme": "National",
-    "Littlehey": "National", "Liverpool": "National", "Long Lartin": "National",
-    "Low Newton": "National", "Lowdham Grange": "National", "Maidstone": "National",
-    "Manchester": "National", "Moorland": "National", "Morton Hall": "National",
-    "The Mount": "National", "New Hall": "National", "North Sea Camp": "National",
-    "Northumberland": "National", "Norwich": "National", "Nottingham": "National",
-    "Oakwood": "National", "Onley": "National", "Parc": "National", "Parc (YOI)": "National",
-    "Pentonville": "Inner London", "Peterborough Female": "National",
-    "Peterborough Male": "National", "Portland": "National", "Prescoed": "National",
-    "Preston": "National", "Ranby": "National", "Risley": "National", "Rochester": "National",
-    "Rye Hill": "National", "Send": "National", "Spring Hill": "National",
-    "Stafford": "National", "Standford Hill": "National", "Stocken": "National",
-    "Stoke Heath": "National", "Styal": "National", "Sudbury": "National",
-    "Swaleside": "National", "Swansea": "National", "Swinfen Hall": "National",
-    "Thameside": "Inner London", "Thorn Cross": "National", "Usk": "National",
-    "Verne": "National", "Wakefield": "National", "Wandsworth": "Inner London",
-    "Warren Hill": "National", "Wayland": "National", "Wealstun": "National",
-    "Werrington": "National", "Wetherby": "National", "Whatton": "National",
-    "Whitemoor": "National", "Winchester": "National", "Woodhill": "Inner London",
-    "Wormwood Scrubs": "Inner London", "Wymott": "National",
-}
+from rules61 import BAND3_SHADOW_FALLBACK
+
+TARIFF_DIR = os.environ.get("TARIFF_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tariffs"))
+TARIFF_POLL_SECONDS = float(os.environ.get("TARIFF_POLL_SECONDS", "5"))
+
+
+@dataclass(frozen=True)
+class Tariff:
+    version: str
+    effective_from: date
+    prison_to_region: Mapping
+    band3_costs: Mapping
+    supervisor_pay: Mapping
+    source: str = ""
+
+    @property
+    def band3_fallback(self) -> float:
+        """Annual Band 3 shadow cost for a region the tariff doesn't list: its National figure."""
+        return float(self.band3_costs.get("National", BAND3_SHADOW_FALLBACK))
+
+    def band3_shadow(self, region) -> float:
+        """Annual Band 3 shadow cost for `region` (the one fallback rule every calculator uses)."""
+        return float(self.band3_costs.get(region, self.band3_fallback))
+
+
+def _parse_tariff(path: str) -> Tariff:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    missing = [k for k in ("version", "effective_from", "prison_to_region", "band3_costs", "supervisor_pay") if k not in raw]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)}: missing {', '.join(missing)}")
+    pay = {
+        region: tuple(MappingProxyType({"title": str(b["title"]), "avg_total": float(b["avg_total"])}) for b in bands)
+        for region, bands in raw["supervisor_pay"].items()
+    }
+    return Tariff(
+        version=str(raw["version"]),
+        effective_from=date.fromisoformat(raw["effective_from"]),
+        prison_to_region=MappingProxyType({str(k): str(v) for k, v in raw["prison_to_region"].items()}),
+        band3_costs=MappingProxyType({str(k): float(v) for k, v in raw["band3_costs"].items()}),
+        supervisor_pay=MappingProxyType(pay),
+        source=os.path.basename(path),
+    )
+
+
+class TariffStore:
+    """All tariff versions in a directory, ordered by effective date, with polling hot reload."""
+
+    def __init__(self, directory: str = TARIFF_DIR, poll_seconds: float = TARIFF_POLL_SECONDS):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.last_error: Optional[str] = None
+        self._hooks: List[Callable[[Tariff], None]] = []
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._signature: Tuple = ()
+        # (effective dates, tariffs) — replaced as one tuple so readers see a consistent pair
+        self._index: Tuple[List[date], List[Tariff]] = ([], [])
+        self.reload(force=True)
+
+    def _scan(self) -> Tuple:
+        try:
+            names = sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+        except FileNotFoundError:
+            return ()
+        sig = []
+        for n in names:
+            st = os.stat(os.path.join(self.directory, n))
+            sig.append((n, st.st_mtime_ns, st.st_size))
+        return tuple(sig)
+
+    def on_reload(self, hook: Callable[[Tariff], None]) -> None:
+        """Register a hook run for the new current tariff before it is swapped in (cache pre-warm)."""
+        self._hooks.append(hook)
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the directory if it changed. Returns True when a new index was swapped in."""
+        if not self._reload_lock.acquire(blocking=force):
+            return False     # another thread is already reloading; keep serving the current snapshot
+        try:
+            sig = self._scan()
+            if not force and sig == self._signature:
+                return False
+            try:
+                tariffs = sorted(
+                    (_parse_tariff(os.path.join(self.directory, n)) for n, _, _ in sig),
+                    key=lambda t: (t.effective_from, t.version),
+                )
+                if not tariffs:
+                    raise ValueError(f"no tariff files in {self.directory}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep the last good tariffs; a broken file must not take the workers down
+                self.last_error = str(e)
+                self._signature = sig
+                if not self._index[1]:
+                    raise
+                return False
+            index = ([t.effective_from for t in tariffs], tariffs)
+            new_current = self._pick(index, date.today())
+            for hook in self._hooks:
+                hook(new_current)
+            self._index = index
+            self._signature = sig
+            self.last_error = None
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.poll_seconds
+            self.reload()
+
+    @staticmethod
+    def _pick(index, on: date) -> Tariff:
+        dates, tariffs = index
+        i = bisect.bisect_right(dates, on) - 1
+        return tariffs[max(0, i)]
+
+    def current(self, on: Optional[date] = None) -> Tariff:
+        """Tariff in force on `on` (default today); the earliest tariff if `on` predates all of them."""
+        self.maybe_reload()
+        return self._pick(self._index, on or date.today())
+
+    def get(self, version: str) -> Optional[Tariff]:
+        return next((t for t in self._index[1] if t.version == version), None)
+
+    def versions(self) -> List[Tuple[str, date]]:
+        return [(t.version, t.effective_from) for t in self._index[1]]
+
+
+STORE = TariffStore()
+
+
+def current_tariff(on: Optional[date] = None) -> Tariff:
+    return STORE.current(on)
+
+
+def current_version(on: Optional[date] = None) -> str:
+    return STORE.current(on).version
+
+
+class _LiveTable(Mapping):
+    """Read-only mapping that resolves against the tariff in force at call time."""
+
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def _table(self) -> Mapping:
+        return getattr(STORE.current(), self._attr)
+
+    def __getitem__(self, key):
+        return self._table()[key]
+
+    def __iter__(self):
+        return iter(self._table())
+
+    def __len__(self):
+        return len(self._table())
+
+    def __repr__(self):
+        return f"<live tariff table {self._attr}>"
+
+
+PRISON_TO_REGION = _LiveTable("prison_to_region")
 
 # Band 3 shadow costs (annual)
-BAND3_COSTS = {
-    "Outer London": 45855.97,
-    "Inner London": 49202.70,
-    "National": 42247.81,
-}
+BAND3_COSTS = _LiveTable("band3_costs")
 
 # Supervisor pay bands
-SUPERVISOR_PAY = {
-    "Inner London": [
-        {"title": "Production Instructor: Band 3", "avg_total": 49203},
-        {"title": "Specialist Instructor: Band 4", "avg_total": 55632},
-    ],
-    "Outer London": [
-        {"title": "Production Instructor: Band 3", "avg_total": 45856},
-        {"title": "Prison Officer Specialist - Instructor: Band 4", "avg_total": 69584},
-    ],
-    "National": [
-        {"title": "Production Instructor: Band 3", "avg_total": 42248},
-        {"title": "Prison Officer Specialist - Instructor: Band 4", "avg_total": 48969},
-    ],
-}
\ No newline at end of file
+SUPERVISOR_PAY = _LiveTable("supervisor_pay")
@@ -0,0 +1,215 @@
+# timeline61.py
+# Day-by-day labour-minute capacity for a workshop over a rolling horizon.
+#
+# The base day uses the same rule as calculate_adhoc: weekdays only,
+# num_prisoners * (workshop_hours / 5) * 60 * output%. Overrides (closures, lockdowns,
+# reduced regime, staff leave) scale individual date ranges. Queries use prefix sums:
+#   minutes_between(a, b)        O(1)
+#   first_date_with(n, start)    O(log days)
+# A query past horizon_days extends the timeline instead of clipping it: the extra days follow
+# the base weekly pattern, with any override that reaches that far (up to MAX_DAYS).
+# Overrides are per-day factors; a calculator applies them to its own headcount / hours / Output %
+# with at_capacity(), so a timeline built for another workshop size can't change a feasibility check.
+import math
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MAX_DAYS = 20 * 366     # furthest a timeline extends itself (first_date_with gives None beyond it)
+
+
+class WorkshopTimeline:
+    def __init__(
+        self,
+        *,
+        start: date,
+        horizon_days: int,
+        num_prisoners: int,
+        workshop_hours: float,
+        output_pct: float = 100.0,
+        name: str = "",
+    ):
+        self.name = name
+        self.start = start
+        self.horizon_days = int(horizon_days)
+        self.num_prisoners = int(num_prisoners)
+        self.workshop_hours = float(workshop_hours)
+        self.output_pct = float(output_pct)
+        daily = float(num_prisoners) * (float(workshop_hours) / 5.0) * 60.0 * (float(output_pct) / 100.0)
+        self.nominal_daily_minutes = max(0.0, daily)
+
+        self._days = 0          # days covered by the arrays: horizon_days, more once a query goes past it
+        self._base = np.zeros(0)
+        self._factor = np.ones(0)
+        self._overrides: List[Tuple[date, date, float, str]] = []
+        self._prefix: Optional[np.ndarray] = None
+        self._extend(self.horizon_days)
+
+    def _extend(self, days: int) -> None:
+        """Cover at least `days` days from start: the weekday pattern, then every override (in order) over the new days."""
+        days = min(int(days), MAX_DAYS)
+        if days <= self._days:
+            return
+        old = self._days
+        if old:
+            days = min(max(days, 2 * old), MAX_DAYS)     # grow geometrically: repeated queries stay cheap
+        weekdays = (np.arange(old, days) + self.start.weekday()) % 7
+        self._base = np.concatenate([self._base, np.where(weekdays < 5, self.nominal_daily_minutes, 0.0)])
+        self._factor = np.concatenate([self._factor, np.ones(days - old)])
+        self._days = days
+        for first, last, factor, _ in self._overrides:
+            a = max(old, (first - self.start).days)
+            b = min(days, (last - self.start).days + 1)
+            if b > a:
+                self._factor[a:b] = max(0.0, factor)
+        self._prefix = None
+
+    def _extend_to(self, d: date) -> None:
+        self._extend((d - self.start).days + 1)
+
+    # -------------------------------
+    # Overrides
+    # -------------------------------
+    def _slice(self, first: date, last: date) -> slice:
+        a = min(max(0, (first - self.start).days), self._days)
+        b = min(self._days, (last - self.start).days + 1)
+        return slice(a, max(a, b))
+
+    def set_factor(self, first: date, last: date, factor: float, reason: str = "") -> "WorkshopTimeline":
+        """Scale capacity on every day in [first, last] (inclusive). Later overrides win."""
+        self._factor[self._slice(first, last)] = max(0.0, float(factor))
+        self._overrides.append((first, last, float(factor), reason))
+        self._prefix = None
+        return self
+
+    def close(self, first: date, last: date, reason: str = "Closure") -> "WorkshopTimeline":
+        return self.set_factor(first, last, 0.0, reason)
+
+    def reduced_regime(self, first: date, last: date, hours_per_day: float, reason: str = "Reduced regime") -> "WorkshopTimeline":
+        normal = self.workshop_hours / 5.0
+        return self.set_factor(first, last, (float(hours_per_day) / normal) if normal > 0 else 0.0, reason)
+
+    def staff_leave(self, first: date, last: date, prisoners_lost: int, reason: str = "Staff leave") -> "WorkshopTimeline":
+        """Reduce headcount for a period (e.g. instructor leave stands down part of the workshop)."""
+        n = self.num_prisoners
+        remaining = max(0, n - int(prisoners_lost))
+        return self.set_factor(first, last, (remaining / n) if n > 0 else 0.0, reason)
+
+    def at_capacity(self, *, num_prisoners: int, workshop_hours: float, output_pct: float) -> "WorkshopTimeline":
+        """
+        The same day factors over another workshop's nominal capacity (the calculator's inputs);
+        self when they already match.
+        """
+        if (int(num_prisoners), float(workshop_hours), float(output_pct)) == \
+                (self.num_prisoners, self.workshop_hours, self.output_pct):
+            return self
+        other = WorkshopTimeline(
+            start=self.start, horizon_days=self.horizon_days, num_prisoners=num_prisoners,
+            workshop_hours=workshop_hours, output_pct=output_pct, name=self.name,
+        )
+        for first, last, factor, reason in self._overrides:
+            other.set_factor(first, last, factor, reason)
+        return other
+
+    @property
+    def overrides(self) -> List[Tuple[date, date, float, str]]:
+        return list(self._overrides)
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    @property
+    def daily_minutes(self) -> np.ndarray:
+        return self._base * self._factor
+
+    def _cum(self) -> np.ndarray:
+        if self._prefix is None:
+            self._prefix = np.concatenate([[0.0], np.cumsum(self.daily_minutes)])
+        return self._prefix
+
+    def _index(self, d: date) -> int:
+        return min(max(0, (d - self.start).days), self._days)
+
+    def _extend_for(self, shortfall: float) -> bool:
+        """Extend by roughly enough weeks for `shortfall` more minutes; False once it can't grow further."""
+        weekly = self.nominal_daily_minutes * 5.0
+        if weekly <= 0 or self._days >= MAX_DAYS:
+            return False
+        self._extend(self._days + 7 * (math.ceil(shortfall / weekly) + 1))
+        return True
+
+    def minutes_between(self, first: date, last: date) -> float:
+        """Available labour minutes on days first..last inclusive (days before start count as none)."""
+        if last < first:
+            return 0.0
+        self._extend_to(last)
+        cum = self._cum()
+        return float(cum[self._index(last + timedelta(days=1))] - cum[self._index(first)])
+
+    def first_date_with(self, minutes: float, start: Optional[date] = None) -> Optional[date]:
+        """Earliest date by which `minutes` cumulative minutes are available from `start` (None if beyond MAX_DAYS)."""
+        if minutes <= 0:
+            return start or self.start
+        if start is not None:
+            self._extend_to(start)
+        while True:
+            cum = self._cum()
+            target = cum[self._index(start or self.start)] + float(minutes)
+            j = int(np.searchsorted(cum, target - 1e-9, side="left"))
+            if j <= self._days:
+                return self.start + timedelta(days=j - 1)
+            if not self._extend_for(target - cum[-1]):
+                return None
+
+    def working_days_between(self, first: date, last: date) -> int:
+        """Days with any capacity in [first, last]."""
+        self._extend_to(last)
+        s = self._slice(first, last)
+        return int(np.count_nonzero(self.daily_minutes[s] > 0))
+
+    # -------------------------------
+    # Array queries (one answer per element, same rules as above)
+    # -------------------------------
+    def _open_cum(self) -> np.ndarray:
+        return np.concatenate([[0], np.cumsum(self.daily_minutes > 0)])
+
+    def _offsets(self, days) -> np.ndarray:
+        """Day offsets from start for a date / datetime64[D] array."""
+        return (np.asarray(days, dtype="datetime64[D]") - np.datetime64(self.start, "D")).astype(np.int64)
+
+    def working_days_between_many(self, first: date, lasts) -> np.ndarray:
+        """working_days_between(first, last) for every last in an array of dates."""
+        offsets = self._offsets(lasts)
+        if offsets.size:
+            self._extend(int(offsets.max()) + 1)
+        a = min(max(0, (first - self.start).days), self._days)
+        b = np.maximum(a, np.minimum(self._days, offsets + 1))
+        open_cum = self._open_cum()
+        return open_cum[b] - open_cum[a]
+
+    def first_offset_with_many(self, minutes: np.ndarray, start: Optional[date] = None) -> np.ndarray:
+        """
+        first_date_with(m, start) for every m, as day offsets from self.start
+        (NaN where that date would be None, i.e. beyond MAX_DAYS).
+        """
+        start = start or self.start
+        minutes = np.asarray(minutes, dtype=float)
+        self._extend_to(start)
+        while True:
+            cum = self._cum()
+            target = cum[self._index(start)] + minutes
+            j = np.searchsorted(cum, target - 1e-9, side="left")
+            if not (j > self._days).any() or not self._extend_for(float(target.max()) - cum[-1]):
+                break
+        out = np.where(j > self._days, np.nan, j - 1.0)
+        return np.where(minutes <= 0, float((start - self.start).days), out)
+
+    def availability_ratio(self, first: Optional[date] = None, last: Optional[date] = None) -> float:
+        """Actual / nominal capacity over a window (default: the configured horizon; 1.0 = no overrides bite)."""
+        first = first or self.start
+        last = last or (self.start + timedelta(days=self.horizon_days - 1))
+        self._extend_to(last)
+        s = self._slice(first, last)
+        nominal = float(self._base[s].sum())
+        return (float(self.daily_minutes[s].sum()) / nominal) if nominal > 0 else 0.0
@@ -1,4 +1,8 @@
+import csv
 import io
+import threading
+from collections import OrderedDict
+from typing import Callable
 import pandas as pd
 
 # -------------------------------
@@ -113,6 +117,35 @@ def export_csv_bytes_rows(rows: list[dict], columns_order: list[str] | None = No
         df = df[columns_order]
     return export_csv_bytes(df)
 
+def write_rows_csv(rows, path_or_buf, columns: list[str] | None = None, *, chunk_rows: int = 10_000) -> int:
+    """
+    Stream dict rows (e.g. production61.iter_production_contractual / iter_adhoc) to CSV,
+    writing every `chunk_rows` rows so memory stays flat. Columns default to the first row's keys.
+    Returns the number of rows written.
+    """
+    own = isinstance(path_or_buf, str)
+    f = open(path_or_buf, "w", newline="", encoding="utf-8") if own else path_or_buf
+    try:
+        writer, chunk, n = None, [], 0
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=columns or list(row.keys()), restval="", extrasaction="ignore")
+                writer.writeheader()
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                writer.writerows(chunk)
+                n += len(chunk)
+                chunk = []
+        if writer is None and columns:
+            csv.DictWriter(f, fieldnames=columns).writeheader()
+        if chunk:
+            writer.writerows(chunk)
+            n += len(chunk)
+        return n
+    finally:
+        if own:
+            f.close()
+
 def export_csv_single_row(common: dict, main_df: pd.DataFrame, seg_df: pd.DataFrame | None) -> bytes:
     row = {**common}
 
@@ -166,6 +199,209 @@ def export_csv_single_row(common: dict, main_df: pd.DataFrame, seg_df: pd.DataFr
 
     return export_csv_bytes_rows([row])
 
+# -------------------------------
+# Parquet export helpers (long format)
+# -------------------------------
+# One fixed schema for every quote so exports from different quote types can be
+# appended to the same dataset and queried by column (section/field) without
+# parsing the dynamic "Item N - ..." CSV headers.
+QUOTE_LINE_COLUMNS = ["quote_id", "section", "line_no", "item", "field", "value", "text"]
+
+
+def quote_lines_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("quote_id", pa.string()),
+        ("section", pa.string()),     # "header" | "item" | "breakdown"
+        ("line_no", pa.int32()),      # 0 for header, 1-based item / breakdown line otherwise
+        ("item", pa.string()),
+        ("field", pa.string()),
+        ("value", pa.float64()),      # numeric value (None when the field is text)
+        ("text", pa.string()),        # original text for non-numeric fields
+    ])
+
+
+def quote_id_for(
+    common: dict,
+    items_df: pd.DataFrame | None = None,
+    breakdown_df: pd.DataFrame | None = None,
+) -> str:
+    """
+    Stable id derived from the quote header fields and its item / breakdown lines (same quote ->
+    same id; two quotes with the same header but different items get different ids).
+    """
+    import hashlib
+    import json
+    body = common
+    lines = {name: df.to_dict("split") for name, df in (("items", items_df), ("breakdown", breakdown_df))
+             if df is not None and not df.empty}
+    if lines:
+        body = {"header": common, **lines}
+    payload = json.dumps(body, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def _num_or_text(val):
+    if val is None or (not isinstance(val, str) and pd.isna(val)):
+        return None, None
+    if isinstance(val, bool):
+        return None, "Yes" if val else "No"
+    if isinstance(val, (int, float)):
+        return float(val), None
+    f = _to_float(val)
+    if f is not None:
+        return f, None
+    return None, str(val)
+
+
+def quote_lines_table(
+    common: dict,
+    items_df: pd.DataFrame | None = None,
+    breakdown_df: pd.DataFrame | None = None,
+    *,
+    quote_id: str | None = None,
+):
+    """
+    Build a typed Arrow table (see quote_lines_schema) for one quote:
+      - header:    one line per entry of `common`
+      - item:      one line per (item row, column) of `items_df` (column "Item" names the item)
+      - breakdown: one line per row of `breakdown_df` ("Item" / "Amount (£)" frames)
+    """
+    import pyarrow as pa
+    qid = quote_id or quote_id_for(common, items_df, breakdown_df)
+    cols = {c: [] for c in QUOTE_LINE_COLUMNS}
+
+    def add(section, line_no, item, field, val):
+        num, txt = _num_or_text(val)
+        cols["quote_id"].append(qid)
+        cols["section"].append(section)
+        cols["line_no"].append(int(line_no))
+        cols["item"].append(item)
+        cols["field"].append(str(field))
+        cols["value"].append(num)
+        cols["text"].append(txt)
+
+    for k, v in (common or {}).items():
+        add("header", 0, None, k, v)
+
+    if items_df is not None and not items_df.empty:
+        for idx, (_, r) in enumerate(items_df.iterrows(), start=1):
+            name = str(r.get("Item", f"Item {idx}"))
+            for col in items_df.columns:
+                if col == "Item":
+                    continue
+                add("item", idx, name, col, r.get(col))
+
+    if breakdown_df is not None and not breakdown_df.empty and "Item" in breakdown_df.columns:
+        amount_col = "Amount (£)" if "Amount (£)" in breakdown_df.columns else breakdown_df.columns[-1]
+        for idx, (_, r) in enumerate(breakdown_df.iterrows(), start=1):
+            add("breakdown", idx, None, str(r.get("Item", "")), r.get(amount_col))
+
+    return pa.Table.from_pydict(cols, schema=quote_lines_schema())
+
+
+def export_parquet_bytes(tables) -> bytes:
+    """Concatenate one or more quote-line tables and return Parquet bytes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if not isinstance(tables, (list, tuple)):
+        tables = [tables]
+    table = pa.concat_tables(list(tables)) if tables else quote_lines_schema().empty_table()
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="zstd")
+    return buf.getvalue()
+
+
+def write_quote_lines_parquet(path: str, tables) -> None:
+    """Stream many quote-line tables into one Parquet file (one row group per batch)."""
+    import pyarrow.parquet as pq
+    with pq.ParquetWriter(path, quote_lines_schema(), compression="zstd") as writer:
+        for t in tables:
+            writer.write_table(t)
+
+# -------------------------------
+# Lazy download payloads
+# -------------------------------
+# Export files are built only when a download is requested, and at most once per
+# (name, signature): the signature identifies the result the payload is built from.
+_PAYLOADS: "OrderedDict[tuple, bytes]" = OrderedDict()
+_PAYLOADS_MAX = 64
+_payloads_lock = threading.Lock()
+
+
+def memo_payload(name: str, signature: str, build: Callable[[], bytes | str]) -> Callable[[], bytes]:
+    """Zero-argument callable returning build() as bytes, memoized per (name, signature)."""
+    key = (name, signature)
+
+    def payload() -> bytes:
+        with _payloads_lock:
+            hit = _PAYLOADS.get(key)
+            if hit is not None:
+                _PAYLOADS.move_to_end(key)
+                return hit
+        data = build()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with _payloads_lock:
+            _PAYLOADS[key] = data
+            while len(_PAYLOADS) > _PAYLOADS_MAX:
+                _PAYLOADS.popitem(last=False)
+        return data
+
+    payload.memo_key = key
+    return payload
+
+
+def lazy_download_button(label: str, payload, *, file_name: str, mime: str, key: str | None = None):
+    """
+    st.download_button that calls `payload` only when clicked (Streamlit with deferred downloads).
+    On older Streamlit, a "Prepare" button builds the file first, then the download button appears.
+    """
+    import streamlit as st
+    from streamlit.errors import StreamlitAPIException
+    try:
+        return st.download_button(label, data=payload, file_name=file_name, mime=mime, key=key)
+    except StreamlitAPIException:
+        pass
+    flag = f"_prepare_{key or label}_{hash(getattr(payload, 'memo_key', ''))}"
+    if st.session_state.get(flag) or st.button(f"Prepare {label[0].lower()}{label[1:]}", key=flag + "_btn"):
+        st.session_state[flag] = True
+        return st.download_button(label, data=payload(), file_name=file_name, mime=mime, key=key)
+    return False
+
+
+# -------------------------------
+# Fragments (scoped reruns)
+# -------------------------------
+# A widget inside a fragment reruns only that fragment. A widget outside every fragment names
+# the fragments that depend on it with on_change=rerun_fragments(...), so e.g. editing the
+# customer name rebuilds the export buttons and nothing else. On Streamlit versions without
+# (keyed) fragments both fall back to ordinary full reruns.
+def fragment(key: str | None = None):
+    """Decorator: st.fragment(key=key), or the closest this Streamlit version offers."""
+    import streamlit as st
+    deco = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if deco is None:
+        return lambda fn: fn
+    if key is None:
+        return deco
+    try:
+        return deco(key=key)
+    except TypeError:
+        return deco
+
+
+def rerun_fragments(*keys: str) -> Callable[[], None]:
+    """on_change callback rerunning only the fragments with these keys (a full rerun if none is on the page)."""
+    def callback() -> None:
+        import streamlit as st
+        from streamlit.errors import StreamlitAPIException
+        try:
+            st.rerun(scope=list(keys))
+        except (StreamlitAPIException, TypeError):
+            pass    # no such fragment on the page, or no keyed reruns: keep the default rerun
+    return callback
+
 # -------------------------------
 # HTML export (PDF-ready)
 # -------------------------------
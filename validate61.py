@@ -0,0 +1,199 @@
+# validate61.py
+# Schema-driven, whole-table validation of quote inputs for batch / API pricing.
+#
+# Each check runs once per column over the whole table (no Python loop per row), and
+# failures come back as a row-level report: one row per (input row, column, message).
+#   errors = validate_table(df, QUOTE_SCHEMA, checks=QUOTE_CHECKS)
+#   good, errors = split_valid(df, QUOTE_SCHEMA, checks=QUOTE_CHECKS)
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rules61 import EMPLOYMENT_SUPPORT_OPTIONS
+from tariff61 import PRISON_TO_REGION, current_tariff
+
+ERROR_COLUMNS = ["row", "column", "error"]
+
+
+@dataclass(frozen=True)
+class Rule:
+    kind: str = "number"                  # "number" | "integer" | "category" | "text" | "date"
+    required: bool = True
+    min: Optional[float] = None
+    min_exclusive: bool = False
+    max: Optional[float] = None
+    allowed: Optional[Sequence] = None    # for "category"
+    message: Optional[str] = None
+
+
+# -------------------------------
+# Schemas
+# -------------------------------
+QUOTE_SCHEMA: Dict[str, Rule] = {
+    "prison": Rule("category", allowed=PRISON_TO_REGION, message="Unknown prison"),   # live: current tariff
+    "workshop_hours": Rule("number", min=0, min_exclusive=True, message="Workshop hours must be greater than zero"),
+    "num_prisoners": Rule("integer", min=0, message="Prisoners employed cannot be negative"),
+    "prisoner_salary": Rule("number", min=0, message="Prisoner salary cannot be negative"),
+    "contracts": Rule("integer", required=False, min=1, message="Contracts must be at least 1"),
+    "employment_support": Rule("category", required=False, allowed=EMPLOYMENT_SUPPORT_OPTIONS,
+                               message="Unknown employment support option"),
+    "output_pct": Rule("number", required=False, min=0, max=100, message="Output % must be between 0 and 100"),
+}
+
+PRODUCTION_ITEM_SCHEMA: Dict[str, Rule] = {
+    "minutes": Rule("number", min=0, message="Minutes per item cannot be negative"),
+    "required": Rule("integer", min=1, message="Prisoners required must be at least 1"),
+    "assigned": Rule("integer", min=0, message="Prisoners assigned cannot be negative"),
+    "target": Rule("integer", required=False, min=0, message="Target units cannot be negative"),
+}
+
+ADHOC_LINE_SCHEMA: Dict[str, Rule] = {
+    "units": Rule("integer", min=0, min_exclusive=True, message="Units requested must be > 0"),
+    "pris_per_item": Rule("integer", min=0, min_exclusive=True, message="Prisoners to make one must be > 0"),
+    "mins_per_item": Rule("number", min=0, message="Minutes to make one cannot be negative"),
+    "deadline": Rule("date", message="Deadline is not a valid date"),
+}
+
+
+# -------------------------------
+# Column checks
+# -------------------------------
+def _errors(index, mask: np.ndarray, column: str, message: str) -> pd.DataFrame:
+    rows = np.asarray(index)[mask]
+    return pd.DataFrame({"row": rows, "column": column, "error": message})
+
+
+def _check_column(df: pd.DataFrame, col: str, rule: Rule) -> List[pd.DataFrame]:
+    out = []
+    if col not in df.columns:
+        if rule.required:
+            out.append(pd.DataFrame({"row": df.index, "column": col, "error": f"Missing column {col}"}))
+        return out
+
+    s = df[col]
+    missing = s.isna().to_numpy()
+    if rule.kind == "text":
+        missing |= (s.astype(str).str.strip() == "").to_numpy()
+    if rule.required and missing.any():
+        out.append(_errors(df.index, missing, col, f"{col} is required"))
+    present = ~missing
+
+    if rule.kind in ("number", "integer"):
+        num = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+        bad = present & np.isnan(num)
+        with np.errstate(invalid="ignore"):
+            if rule.kind == "integer":
+                bad |= present & ~np.isnan(num) & (num != np.round(num))
+            if rule.min is not None:
+                bad |= present & ((num <= rule.min) if rule.min_exclusive else (num < rule.min))
+            if rule.max is not None:
+                bad |= present & (num > rule.max)
+        if bad.any():
+            out.append(_errors(df.index, bad, col, rule.message or f"{col} is out of range"))
+    elif rule.kind == "category":
+        bad = present & ~s.isin(list(rule.allowed or [])).to_numpy()
+        if bad.any():
+            out.append(_errors(df.index, bad, col, rule.message or f"{col} is not an allowed value"))
+    elif rule.kind == "date":
+        bad = present & pd.to_datetime(s, errors="coerce").isna().to_numpy()
+        if bad.any():
+            out.append(_errors(df.index, bad, col, rule.message or f"{col} is not a date"))
+    return out
+
+
+# -------------------------------
+# Cross-field checks
+# -------------------------------
+def check_assigned_within_total(df: pd.DataFrame) -> List[pd.DataFrame]:
+    """Quote rows carrying both num_prisoners and assigned (total assigned across items)."""
+    if not {"assigned", "num_prisoners"} <= set(df.columns):
+        return []
+    a = pd.to_numeric(df["assigned"], errors="coerce").to_numpy(dtype=float)
+    n = pd.to_numeric(df["num_prisoners"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        bad = a > n
+    return [_errors(df.index, bad, "assigned", "Prisoners assigned exceed prisoners employed")] if bad.any() else []
+
+
+def _valid_titles(tariff) -> pd.MultiIndex:
+    return pd.MultiIndex.from_tuples(
+        [(region, t["title"]) for region, bands in tariff.supervisor_pay.items() for t in bands],
+        names=["region", "title"],
+    )
+
+
+def check_instructor_titles(df: pd.DataFrame) -> List[pd.DataFrame]:
+    """
+    instructor_titles: one title or several separated by ';' per row.
+    Each must exist in SUPERVISOR_PAY for the prison's region (skipped when the customer provides instructors).
+    """
+    if not {"prison", "instructor_titles"} <= set(df.columns):
+        return []
+    sub = df
+    if "customer_covers_supervisors" in df.columns:
+        sub = df[~df["customer_covers_supervisors"].fillna(False).astype(bool)]
+    titles = sub["instructor_titles"].dropna().astype(str).str.split(";").explode().str.strip()
+    titles = titles[titles != ""]
+    if titles.empty:
+        return []
+    tariff = current_tariff()
+    regions = sub["prison"].map(dict(tariff.prison_to_region)).reindex(titles.index)
+    ok = pd.MultiIndex.from_arrays([regions.to_numpy(), titles.to_numpy()]).isin(_valid_titles(tariff))
+    bad_rows = pd.unique(titles.index[~ok])
+    if len(bad_rows) == 0:
+        return []
+    return [pd.DataFrame({"row": bad_rows, "column": "instructor_titles",
+                          "error": "Instructor title not in the pay bands for this region"})]
+
+
+def check_items_against_quotes(items: pd.DataFrame, quotes: pd.DataFrame, key: str = "quote_id") -> pd.DataFrame:
+    """Total assigned per quote (items grouped by key) must not exceed that quote's num_prisoners."""
+    if items.empty or key not in items.columns or key not in quotes.columns:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    assigned = pd.to_numeric(items["assigned"], errors="coerce").fillna(0).groupby(items[key]).sum()
+    total = pd.to_numeric(quotes.set_index(key)["num_prisoners"], errors="coerce")
+    over = assigned.index[(assigned > total.reindex(assigned.index)).to_numpy()]
+    bad = items[key].isin(over).to_numpy()
+    return _errors(items.index, bad, "assigned", "Total prisoners assigned for this quote exceed prisoners employed")
+
+
+QUOTE_CHECKS: List[Callable[[pd.DataFrame], List[pd.DataFrame]]] = [check_assigned_within_total, check_instructor_titles]
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+def validate_table(
+    df: pd.DataFrame,
+    schema: Dict[str, Rule],
+    *,
+    checks: Iterable[Callable[[pd.DataFrame], List[pd.DataFrame]]] = (),
+) -> pd.DataFrame:
+    """Row-level error report (columns row, column, error), sorted by row."""
+    parts: List[pd.DataFrame] = []
+    for col, rule in schema.items():
+        parts.extend(_check_column(df, col, rule))
+    for chk in checks:
+        parts.extend(chk(df))
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    return pd.concat(parts, ignore_index=True).sort_values("row", kind="stable").reset_index(drop=True)
+
+
+def split_valid(
+    df: pd.DataFrame,
+    schema: Dict[str, Rule],
+    *,
+    checks: Iterable[Callable[[pd.DataFrame], List[pd.DataFrame]]] = (),
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(rows with no errors, error report) — only the first frame should reach the calculators."""
+    errors = validate_table(df, schema, checks=checks)
+    return df[~df.index.isin(errors["row"])], errors
+
+
+def error_messages(errors: pd.DataFrame, label: str = "Row") -> List[str]:
+    """Format an error report the way the UI lists errors ("Line 3: ..."), 1-based positional rows."""
+    return [f"{label} {int(r) + 1}: {e}" for r, e in zip(errors["row"], errors["error"])]
@@ -0,0 +1,220 @@
+# workshop61.py
+# Joint pricing of every contract (Host and Production) that shares one workshop.
+#
+# The workshop's instructors and overheads are one pool. Each contract carries the share of it
+# matching the labour minutes it uses (prisoners x hours), instead of an equal 1/contracts split,
+# so the contracts' instructor and overhead lines add up to exactly the workshop's costs.
+#
+#   ws = WorkshopModel(region="National", workshop_hours=30, supervisor_salaries=[42000, 45000])
+#   ws.set_contract(HostContract("Laundry", num_prisoners=8, prisoner_salary=12))
+#   ws.set_contract(ProductionContract("Wiring", items=[...], prisoner_salary=14))
+#   ws.quotes()        # {name: (host_df, ctx) | production rows}
+#   ws.allocation()    # labour minutes, share and pooled costs per contract
+#
+# Changing one contract re-prices only that contract. If its labour changes, every share moves:
+# Host quotes are re-run (cheap) and production rows are re-blended from two cached evaluations,
+# since every figure in a production row is affine in the contract's pool share.
+# The model prices against one pinned Tariff snapshot (quotes and allocation always agree);
+# set_tariff() moves it to a reloaded tariff and re-prices every contract.
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+import host61
+from production61 import calculate_production_contractual
+from rules61 import FULL_TIME_HOURS, OVERHEAD_RATE
+from tariff61 import Tariff, current_tariff
+
+
+@dataclass
+class HostContract:
+    name: str
+    num_prisoners: int
+    prisoner_salary: float
+    employment_support: str = "None"
+    additional_benefits: bool = False
+
+    def labour_minutes(self, workshop_hours: float) -> float:
+        return max(0, int(self.num_prisoners)) * float(workshop_hours) * 60.0
+
+
+@dataclass
+class ProductionContract:
+    name: str
+    items: List[Dict]
+    prisoner_salary: float
+    output_pct: int = 100
+    pricing_mode: str = "as-is"
+    targets: Optional[List[int]] = None
+    employment_support: str = "None"
+    additional_benefits: bool = False
+    customer_type: str = "Commercial"
+    apply_vat: bool = True
+    vat_rate: float = 20.0
+
+    @property
+    def assigned(self) -> int:
+        return sum(max(0, int(it.get("assigned", 0))) for it in self.items)
+
+    def labour_minutes(self, workshop_hours: float) -> float:
+        return self.assigned * float(workshop_hours) * 60.0
+
+
+Contract = Union[HostContract, ProductionContract]
+
+
+def _blend(rows0: List[Dict], rows1: List[Dict], share: float) -> List[Dict]:
+    """Rows at pool share `share` from the rows at share 0 and 1 (numeric fields are affine in it)."""
+    out = []
+    for r0, r1 in zip(rows0, rows1):
+        row = {}
+        for k, v0 in r0.items():
+            v1 = r1[k]
+            if isinstance(v0, float) and isinstance(v1, float) and v0 != v1:
+                row[k] = v0 + share * (v1 - v0)
+            else:
+                row[k] = v0
+        out.append(row)
+    return out
+
+
+@dataclass
+class _Entry:
+    contract: Contract
+    labour: float
+    basis: Optional[Tuple[List[Dict], List[Dict]]] = None     # production rows at share 0 and 1
+    quote: object = None
+    quoted_share: Optional[float] = None
+
+
+@dataclass
+class WorkshopModel:
+    region: str
+    workshop_hours: float
+    supervisor_salaries: List[float] = field(default_factory=list)
+    customer_covers_supervisors: bool = False
+    tariff: Optional[Tariff] = None     # pinned snapshot (default: the tariff in force when the model is built)
+
+    def __post_init__(self):
+        self.tariff = self.tariff or current_tariff()
+        self._entries: Dict[str, _Entry] = {}
+        self._total_labour = 0.0
+
+    def set_tariff(self, tariff: Optional[Tariff] = None) -> None:
+        """Re-pin to `tariff` (default: current_tariff()); every cached quote is dropped if the version changes."""
+        tariff = tariff or current_tariff()
+        if tariff.version != self.tariff.version:
+            for e in self._entries.values():
+                e.basis, e.quote, e.quoted_share = None, None, None
+        self.tariff = tariff
+
+    # -------------------------------
+    # Contracts
+    # -------------------------------
+    def set_contract(self, contract: Contract) -> None:
+        """Add or replace a contract (by name). Only this contract is re-priced from scratch."""
+        old = self._entries.get(contract.name)
+        labour = contract.labour_minutes(self.workshop_hours)
+        self._total_labour += labour - (old.labour if old else 0.0)
+        self._entries[contract.name] = _Entry(contract, labour)
+
+    def remove_contract(self, name: str) -> None:
+        old = self._entries.pop(name)
+        self._total_labour -= old.labour
+        if not self._entries:
+            self._total_labour = 0.0
+
+    @property
+    def contracts(self) -> List[Contract]:
+        return [e.contract for e in self._entries.values()]
+
+    def share(self, name: str) -> float:
+        total = self._total_labour
+        return (self._entries[name].labour / total) if total > 0 else 0.0
+
+    # -------------------------------
+    # Pricing
+    # -------------------------------
+    def _host_quote(self, c: HostContract, share: float):
+        return host61.generate_host_quote(
+            workshop_hours=float(self.workshop_hours),
+            num_prisoners=int(c.num_prisoners),
+            prisoner_salary=float(c.prisoner_salary),
+            num_supervisors=len(self.supervisor_salaries),
+            customer_covers_supervisors=self.customer_covers_supervisors,
+            supervisor_salaries=list(self.supervisor_salaries),
+            region=self.region,
+            contracts=1,
+            employment_support=c.employment_support,
+            additional_benefits=c.additional_benefits,
+            pool_share=share,
+            tariff=self.tariff,
+        )
+
+    def _production_rows(self, c: ProductionContract, share: float) -> List[Dict]:
+        return calculate_production_contractual(
+            c.items, c.output_pct,
+            workshop_hours=float(self.workshop_hours),
+            prisoner_salary=float(c.prisoner_salary),
+            supervisor_salaries=list(self.supervisor_salaries),
+            customer_covers_supervisors=self.customer_covers_supervisors,
+            region=self.region,
+            customer_type=c.customer_type,
+            apply_vat=c.apply_vat,
+            vat_rate=c.vat_rate,
+            num_prisoners=c.assigned,
+            num_supervisors=len(self.supervisor_salaries),
+            pricing_mode=c.pricing_mode,
+            targets=c.targets,
+            employment_support=c.employment_support,
+            additional_benefits=c.additional_benefits,
+            pool_share=share,
+            tariff=self.tariff,
+        )
+
+    def quote(self, name: str):
+        """(host_df, ctx) for a Host contract, per-item rows for a Production contract."""
+        e = self._entries[name]
+        share = self.share(name)
+        if e.quote is not None and e.quoted_share == share:
+            return e.quote
+        if isinstance(e.contract, HostContract):
+            e.quote = self._host_quote(e.contract, share)
+        else:
+            if e.basis is None:
+                e.basis = (self._production_rows(e.contract, 0.0), self._production_rows(e.contract, 1.0))
+            e.quote = _blend(e.basis[0], e.basis[1], share)
+        e.quoted_share = share
+        return e.quote
+
+    def quotes(self) -> Dict[str, object]:
+        return {name: self.quote(name) for name in self._entries}
+
+    def pools_monthly(self) -> Dict[str, float]:
+        """The workshop's shared monthly instructor and overhead costs (before any split)."""
+        frac = (float(self.workshop_hours) / FULL_TIME_HOURS) if self.workshop_hours > 0 else 0.0
+        if self.customer_covers_supervisors:
+            instructor = 0.0
+            shadow = self.tariff.band3_shadow(self.region)
+            overheads = (shadow / 12.0) * frac * OVERHEAD_RATE
+        else:
+            instructor = sum(s / 12.0 for s in self.supervisor_salaries) * frac
+            overheads = instructor * OVERHEAD_RATE
+        return {"instructor": instructor, "overheads": overheads}
+
+    def allocation(self) -> pd.DataFrame:
+        """Labour minutes, share and allocated monthly instructor / overheads per contract (columns sum to the pools)."""
+        pools = self.pools_monthly()
+        rows = []
+        for name, e in self._entries.items():
+            s = self.share(name)
+            rows.append({
+                "Contract": name,
+                "Type": "Host" if isinstance(e.contract, HostContract) else "Production",
+                "Labour minutes (weekly)": e.labour,
+                "Share": s,
+                "Instructor cost (monthly £)": pools["instructor"] * s,
+                "Overheads (monthly £)": pools["overheads"] * s,
+            })
+        return pd.DataFrame(rows)